@@ -0,0 +1,207 @@
+"""Shipment analytics rollups
+Every shipment is recorded, in a local SQLite database (config.ANALYTICS_DB),
+as per-(HS code, unit) subtotals when it is saved with an invoice number,
+generated, or processed by the watch-folder daemon; the rollup tables are
+updated in the same transaction:
+
+    rollup_shipments  month × consignee × ports × currency → shipments, value
+    rollup_hs         month × consignee × HS code × unit × currency → qty, value, lines
+
+Values are also kept in the rate table's base currency so months and
+consignees invoiced in different currencies can be added up (a currency the
+table lacks adds zero there). Recording the same invoice again replaces its
+earlier contribution. Dashboards read only the rollups, whose size depends
+on the number of distinct groups, not on the number of shipments or item
+rows ever recorded.
+"""
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from model import ItemTable
+from rates import load_rates
+from validation import parse_date
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shipments (
+    id             INTEGER PRIMARY KEY,
+    key            TEXT UNIQUE NOT NULL,
+    month          TEXT NOT NULL,
+    invoice        TEXT,
+    consignee      TEXT,
+    port_loading   TEXT,
+    port_discharge TEXT,
+    currency       TEXT,
+    value          REAL,
+    value_base     REAL
+);
+CREATE TABLE IF NOT EXISTS shipment_hs (
+    shipment_id INTEGER NOT NULL,
+    hs          TEXT,
+    unit        TEXT,
+    qty         REAL,
+    value       REAL,
+    value_base  REAL,
+    lines       INTEGER
+);
+CREATE INDEX IF NOT EXISTS shipment_hs_shipment ON shipment_hs(shipment_id);
+CREATE TABLE IF NOT EXISTS rollup_shipments (
+    month TEXT, consignee TEXT, port_loading TEXT, port_discharge TEXT, currency TEXT,
+    shipments INTEGER, value REAL, value_base REAL,
+    PRIMARY KEY (month, consignee, port_loading, port_discharge, currency)
+);
+CREATE TABLE IF NOT EXISTS rollup_hs (
+    month TEXT, consignee TEXT, hs TEXT, unit TEXT, currency TEXT,
+    qty REAL, value REAL, value_base REAL, lines INTEGER,
+    PRIMARY KEY (month, consignee, hs, unit, currency)
+);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value);
+INSERT OR IGNORE INTO meta VALUES ('version', 0);
+"""
+
+_ADD_SHIPMENTS = """
+INSERT INTO rollup_shipments VALUES (?,?,?,?,?,?,?,?)
+ON CONFLICT DO UPDATE SET shipments  = shipments  + excluded.shipments,
+                          value      = value      + excluded.value,
+                          value_base = value_base + excluded.value_base
+"""
+_ADD_HS = """
+INSERT INTO rollup_hs VALUES (?,?,?,?,?,?,?,?,?)
+ON CONFLICT DO UPDATE SET qty        = qty        + excluded.qty,
+                          value      = value      + excluded.value,
+                          value_base = value_base + excluded.value_base,
+                          lines      = lines      + excluded.lines
+"""
+
+
+def hs_subtotals(items) -> list:
+    """[hs, unit, qty, value, lines] per HS code and unit, in order of first
+    appearance; factorize / bincount over a chunk of rows at a time."""
+    groups = {}
+    for chunk in ItemTable.from_records(items).chunks():
+        hs_codes, hs = pd.factorize(chunk.hs.astype(str))
+        unit_codes, units = pd.factorize(chunk.unit.astype(str))
+        codes, pairs = pd.factorize(hs_codes * len(units) + unit_codes)
+        hs, units = hs.tolist(), units.tolist()
+        sums = [np.bincount(codes, weights=w, minlength=len(pairs)).tolist()
+                for w in (chunk.qty, chunk.total, None)]
+        for pair, qty, value, lines in zip(pairs.tolist(), *sums):
+            g = groups.setdefault((hs[pair // len(units)], units[pair % len(units)]),
+                                  [0.0, 0.0, 0])
+            g[0] += qty
+            g[1] += value
+            g[2] += int(lines)
+    return [[hs, unit, *g] for (hs, unit), g in groups.items()]
+
+
+def shipment_facts(d: dict, table=None) -> dict:
+    """What one shipment contributes to the rollups: header fields plus
+    per-(HS code, unit) subtotals of its items."""
+    ship = d["shipment"]
+    items = ItemTable.from_records(d["items"])
+    month = f"{parse_date(ship.get('invoiceDate')) or date.today():%Y-%m}"
+    cur = ship.get("currency", "")
+    try:
+        table = table or load_rates()
+        rate = table.rate(cur, table.base)
+    except (OSError, ValueError, KeyError):
+        rate = None
+    # A currency missing from the rate table counts as zero in base-currency totals
+    rate = 0.0 if rate is None else rate
+
+    value = float(items.total.sum())
+    return {
+        "key":            f"{d['exporter'].get('name', '')}\x1f{ship.get('invoiceNumber', '')}",
+        "month":          month,
+        "invoice":        ship.get("invoiceNumber", ""),
+        "consignee":      d["consignee"].get("name", ""),
+        "port_loading":   ship.get("portLoading", ""),
+        "port_discharge": ship.get("portDischarge", ""),
+        "currency":       cur,
+        "value":          value,
+        "value_base":     value * rate,
+        "hs":             [(hs, unit, qty, total, total * rate, lines)
+                           for hs, unit, qty, total, lines in hs_subtotals(items)],
+    }
+
+
+class Analytics:
+    def __init__(self, path):
+        self.path = Path(path)
+        self._ready = False
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _connect(self):
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    with sqlite3.connect(self.path) as con:
+                        con.execute("PRAGMA journal_mode=WAL")
+                        con.executescript(_SCHEMA)
+                    self._ready = True
+        con = sqlite3.connect(self.path, timeout=30)
+        try:
+            yield con
+        finally:
+            con.close()
+
+    # — Write ————————————————————————————————————————————————
+    @staticmethod
+    def _apply(con, ship: tuple, hs_rows: list, sign: int):
+        """Add (sign=1) or take back (sign=-1) one shipment's contribution."""
+        month, consignee, pol, pod, cur, value, value_base = ship
+        con.execute(_ADD_SHIPMENTS, (month, consignee, pol, pod, cur,
+                                     sign, sign * value, sign * value_base))
+        con.executemany(_ADD_HS, [(month, consignee, hs, unit, cur, sign * qty, sign * val,
+                                   sign * vb, sign * lines)
+                                  for hs, unit, qty, val, vb, lines in hs_rows])
+
+    def record(self, facts: list):
+        """Add a batch of shipment_facts() in one transaction."""
+        if not facts:
+            return
+        with self._connect() as con, con:
+            con.execute("BEGIN IMMEDIATE")
+            for f in facts:
+                old = con.execute(
+                    "SELECT id, month, consignee, port_loading, port_discharge, currency, value, "
+                    "value_base FROM shipments WHERE key = ?", (f["key"],)).fetchone()
+                if old:
+                    rows = con.execute("SELECT hs, unit, qty, value, value_base, lines "
+                                       "FROM shipment_hs WHERE shipment_id = ?", (old[0],)).fetchall()
+                    self._apply(con, old[1:], rows, -1)
+                    con.execute("DELETE FROM shipment_hs WHERE shipment_id = ?", (old[0],))
+                    con.execute("DELETE FROM shipments WHERE id = ?", (old[0],))
+                head = (f["month"], f["consignee"], f["port_loading"], f["port_discharge"],
+                        f["currency"], f["value"], f["value_base"])
+                cur = con.execute(
+                    "INSERT INTO shipments (key, month, consignee, port_loading, port_discharge, "
+                    "currency, value, value_base, invoice) VALUES (?,?,?,?,?,?,?,?,?)",
+                    (f["key"], *head, f["invoice"]))
+                con.executemany("INSERT INTO shipment_hs VALUES (?,?,?,?,?,?,?)",
+                                [(cur.lastrowid, *row) for row in f["hs"]])
+                self._apply(con, head, f["hs"], 1)
+            con.execute("DELETE FROM rollup_shipments WHERE shipments <= 0")
+            con.execute("DELETE FROM rollup_hs WHERE lines <= 0")
+            con.execute("UPDATE meta SET value = value + 1 WHERE name = 'version'")
+
+    # — Read —————————————————————————————————————————————————
+    def version(self) -> int:
+        """Bumped by every record(); readers can cache rollups until it changes."""
+        with self._connect() as con:
+            return con.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()[0]
+
+    def rollups(self) -> tuple:
+        """(shipments rollup, HS rollup) as DataFrames."""
+        with self._connect() as con:
+            ships = pd.read_sql_query("SELECT * FROM rollup_shipments", con)
+            hs = pd.read_sql_query("SELECT * FROM rollup_hs", con)
+        return ships, hs
@@ -5,7 +5,24 @@ Converted from ExportDocGen.html
 import streamlit as st
 import pandas as pd
 from datetime import date
-import io
+import time
+
+import config
+from analytics import Analytics, shipment_facts
+from artifacts import ArtifactCache
+from compact import ENCODINGS, compress
+from documents import DOC_REGISTRY, HS_AGGREGATE_DEFAULT, build_full_html, export_csv, render_documents
+from i18n import LANGUAGES
+from itemfile import ItemFile, open_items
+from model import ItemTable
+from packing import apply_packing, sums as packing_sums, totals as packing_totals
+from rates import apply_reporting, convert, load_rates
+from reconcile import reconcile
+from revisions import RevisionStore, affected_documents, diff_data
+from search import SearchIndex, index_record
+from store import ContentStore
+from validation import validate
+from xlsx import export_xlsx
 
 # ── Page config ──────────────────────────────────────────────────────────────
 st.set_page_config(
@@ -14,933 +31,237 @@ st.set_page_config(
     layout="wide",
 )
 
-# ── CSS for generated document previews ──────────────────────────────────────
-DOC_CSS = """
-<style>
-  body { font-family:'Courier New',monospace; background:#f0f0f0; padding:10px; }
-  .document-preview {
-    background:white; color:black; padding:40px; border-radius:4px;
-    box-shadow:0 2px 8px rgba(0,0,0,.15); max-width:800px; margin:20px auto;
-    font-family:'Courier New',monospace; font-size:13px; line-height:1.5;
-  }
-  .doc-title {
-    font-size:22px; font-weight:bold; text-align:center; margin-bottom:20px;
-    text-transform:uppercase; border-bottom:2px solid #000; padding-bottom:10px;
-  }
-  .doc-subtitle { text-align:center; font-style:italic; margin-bottom:16px; color:#555; }
-  .doc-row { display:flex; justify-content:space-between; margin-bottom:8px;
-             flex-wrap:wrap; gap:8px; }
-  .doc-label { font-weight:bold; min-width:160px; display:inline-block; }
-  .doc-section { margin:15px 0; padding:12px 15px; background:#f8f8f8;
-                 border-left:3px solid #aaa; }
-  .doc-section-title { font-weight:bold; font-size:13px; margin-bottom:8px;
-                       text-decoration:underline; }
-  table { width:100%; border-collapse:collapse; margin:15px 0; }
-  th,td { border:1px solid #444; padding:6px 9px; text-align:left; font-size:12px; }
-  th { background:#e0e0e0; font-weight:bold; }
-  tfoot th { background:#f0f0f0; }
-  .doc-footer { margin-top:25px; border-top:2px solid #333; padding-top:15px; }
-  .signature-line {
-    display:inline-block; margin-top:40px; border-top:1px solid #333;
-    width:200px; text-align:center; padding-top:6px; font-size:11px;
-  }
-  .sigs { display:flex; justify-content:space-between; margin-top:30px; }
-  .page-divider { border:none; border-top:4px dashed #ccc; margin:30px 0; }
-  @media print {
-    body { background:white; padding:0; }
-    .document-preview { box-shadow:none; margin:0; padding:20px; }
-    .page-divider { page-break-after:always; border:none; }
-  }
-</style>
-"""
-
 # ── Session-state defaults ────────────────────────────────────────────────────
 _DEFAULTS = {
     "exp_name": "", "exp_addr": "", "exp_city": "",
     "exp_contact": "", "exp_email": "", "exp_iec": "", "exp_gst": "",
     "con_name": "", "con_addr": "", "con_city": "",
-    "con_contact": "", "con_email": "",
+    "con_contact": "", "con_email": "", "con_lang": "",
     "inv_number": "", "inv_date": date.today(), "po_number": "",
     "port_loading": "", "port_discharge": "", "country_origin": "",
     "incoterms": "", "payment_terms": "", "vessel": "",
     "pkg_type": "", "num_packages": "", "gross_wt": "", "net_wt": "",
-    "currency": "USD",
-    "generated_html": "",
-    "saved_data": None,
+    "currency": "USD", "reporting_currency": "",
+    # Handles into the artifact cache; the artifacts themselves live on disk
+    "generated_ref": "", "generated_data_ref": "", "generated_meta": None,
+    "generated_packed": None,   # {encoding: handle} of precompressed HTML
+    # Attached large item file (itemfile.py): only its path is kept in the session
+    "item_file": "",
 }
+_ARTIFACT_KEYS = ("generated_ref", "generated_data_ref", "generated_meta",
+                  "generated_packed")
 for k, v in _DEFAULTS.items():
     if k not in st.session_state:
         st.session_state[k] = v
 
+# "items" must be indexed, not read as an attribute: st.session_state.items is
+# the mapping's items() method.
 if "items" not in st.session_state:
-    st.session_state.items = pd.DataFrame({
+    st.session_state["items"] = pd.DataFrame({
         "Description": [""], "HS Code": [""],
         "Quantity": [0.0], "Unit": ["PCS"],
         "Unit Price": [0.0],
+        **{name: [0.0] for name in ItemTable.FRAME_PACKING},
     })
+    # Paged editor bookkeeping (see "Item table paging" below)
+    st.session_state.items_total = 0.0       # grand total of the committed table
+    st.session_state.items_packing = packing_sums(ItemTable())   # its packing sums
+    st.session_state.items_rev = 0           # bumped on commit to restart the grid
+    st.session_state.items_window = (0, 1)   # rows shown by the open page
+    st.session_state.items_editor_key = ""
+
+# ── Item table paging ─────────────────────────────────────────────────────────
+# The full table lives in st.session_state["items"]; the grid only ever shows
+# one page of it. While a page is open its slice is left untouched, so the
+# grid's cumulative edit state stays valid and each rerun costs O(page), not
+# O(rows). Edits are folded into the full table when the page changes or the
+# table is saved / loaded.
+ITEM_COLUMNS  = ["Description", "HS Code", "Quantity", "Unit", "Unit Price",
+                 *ItemTable.FRAME_PACKING]
+ITEM_DEFAULTS = {"Description": "", "HS Code": "", "Quantity": 0.0,
+                 "Unit": "PCS", "Unit Price": 0.0,
+                 **{name: 0.0 for name in ItemTable.FRAME_PACKING}}
+PAGE_SIZES    = [50, 100, 250, 500, 1000]
+PREVIEW_ROWS  = 1000   # rows of an attached item file shown read-only
+
+
+def row_total(df: pd.DataFrame) -> float:
+    return float((df["Quantity"].fillna(0) * df["Unit Price"].fillna(0)).sum())
+
+
+def row_packing(df: pd.DataFrame):
+    """Packing sums (packages, weights, volume) of the rows in df."""
+    return packing_sums(ItemTable.from_frame(df))
+
+
+def apply_grid_edits(base: pd.DataFrame, state) -> pd.DataFrame:
+    """base with a data_editor's cumulative edit state applied (as row deltas)."""
+    page = base.reset_index(drop=True)
+    if not state or not any(state.get(k) for k in ("edited_rows", "added_rows", "deleted_rows")):
+        return page
+    if state.get("added_rows"):
+        added = pd.DataFrame(state["added_rows"]).reindex(columns=ITEM_COLUMNS)
+        page = pd.concat([page, added.fillna(ITEM_DEFAULTS)], ignore_index=True)
+    else:
+        page = page.copy()
+    for pos, changes in state.get("edited_rows", {}).items():
+        if int(pos) >= len(page):
+            continue
+        for col, value in changes.items():
+            if col in ITEM_DEFAULTS:
+                page.iat[int(pos), page.columns.get_loc(col)] = (
+                    ITEM_DEFAULTS[col] if value is None else value)
+    if state.get("deleted_rows"):
+        # Positions count added rows too, as the grid applies deletions last
+        page = page.drop(index=[int(p) for p in state["deleted_rows"]])
+    return page.reset_index(drop=True)
+
+
+def _open_page():
+    """(base slice, edited slice) for the page currently shown in the grid."""
+    ss = st.session_state
+    start, stop = ss.items_window
+    base = ss["items"].iloc[start:stop]
+    return base, apply_grid_edits(base, ss.get(ss.items_editor_key))
+
 
-# ── Helpers ───────────────────────────────────────────────────────────────────
-def na(val):
-    return val if val else "N/A"
-
-
-def number_to_words(num: float) -> str:
-    if num == 0:
-        return "Zero"
-    ones  = ["","One","Two","Three","Four","Five","Six","Seven","Eight","Nine"]
-    teens = ["Ten","Eleven","Twelve","Thirteen","Fourteen","Fifteen",
-             "Sixteen","Seventeen","Eighteen","Nineteen"]
-    tens_w = ["","","Twenty","Thirty","Forty","Fifty",
-               "Sixty","Seventy","Eighty","Ninety"]
-    thousands = ["","Thousand","Million","Billion"]
-
-    def conv_h(n):
-        n = int(n)
-        if n == 0: return ""
-        if n < 10: return ones[n]
-        if n < 20: return teens[n - 10]
-        if n < 100:
-            return tens_w[n // 10] + (" " + ones[n % 10] if ones[n % 10] else "")
-        tail = conv_h(n % 100)
-        return ones[n // 100] + " Hundred" + (" " + tail if tail else "")
-
-    num, parts, i = int(num), [], 0
-    while num > 0:
-        if num % 1000:
-            chunk = conv_h(num % 1000)
-            if thousands[i]:
-                chunk += " " + thousands[i]
-            parts.insert(0, chunk)
-        num //= 1000
-        i += 1
-    return " ".join(parts).strip()
-
-
-def exp_block(exp: dict) -> str:
-    lines = [f"<div><strong>{exp['name']}</strong></div>"]
-    for f, label in [("address",""), ("city",""), ("contact","Tel: "),
-                     ("email","Email: "), ("iec","IEC: "), ("gst","GST: ")]:
-        if exp.get(f):
-            lines.append(f"<div>{label}{exp[f]}</div>")
-    return "\n".join(lines)
-
-
-def con_block(con: dict) -> str:
-    lines = [f"<div><strong>{con['name']}</strong></div>"]
-    for f, label in [("address",""), ("city",""),
-                     ("contact","Tel: "), ("email","Email: ")]:
-        if con.get(f):
-            lines.append(f"<div>{label}{con[f]}</div>")
-    return "\n".join(lines)
+def current_items() -> pd.DataFrame:
+    """The full item table including edits still pending on the open page."""
+    ss = st.session_state
+    base, page = _open_page()
+    if page.equals(base.reset_index(drop=True)):
+        return ss["items"]
+    start, stop = ss.items_window
+    full = ss["items"]
+    return pd.concat([full.iloc[:start], page, full.iloc[stop:]], ignore_index=True)
+
+
+def commit_items():
+    """Fold the open page's edits into the full table and restart the grid."""
+    ss = st.session_state
+    base, page = _open_page()
+    if not page.equals(base.reset_index(drop=True)):
+        ss.items_total += row_total(page) - row_total(base)
+        ss.items_packing = ss.items_packing + row_packing(page) - row_packing(base)
+        ss["items"] = current_items()
+    ss.items_rev += 1
+
+
+def set_items(df: pd.DataFrame):
+    """Replace the whole table (load / import); the only O(rows) total recompute."""
+    ss = st.session_state
+    df = df.reindex(columns=ITEM_COLUMNS).fillna(ITEM_DEFAULTS).reset_index(drop=True)
+    ss["items"] = df
+    ss.items_total = row_total(df)
+    ss.items_packing = row_packing(df)
+    ss.items_window = (0, 0)
+    ss.items_rev += 1
+    ss.items_page = 1
+
+
+# Widget key → (section, field) of the dict built by collect_data()
+FORM_FIELDS = {
+    "exp_name": ("exporter", "name"),     "exp_addr": ("exporter", "address"),
+    "exp_city": ("exporter", "city"),     "exp_contact": ("exporter", "contact"),
+    "exp_email": ("exporter", "email"),   "exp_iec": ("exporter", "iec"),
+    "exp_gst": ("exporter", "gst"),
+    "con_name": ("consignee", "name"),    "con_addr": ("consignee", "address"),
+    "con_city": ("consignee", "city"),    "con_contact": ("consignee", "contact"),
+    "con_email": ("consignee", "email"),  "con_lang": ("consignee", "language"),
+    "inv_number":     ("shipment", "invoiceNumber"),
+    "inv_date":       ("shipment", "invoiceDate"),
+    "po_number":      ("shipment", "poNumber"),
+    "port_loading":   ("shipment", "portLoading"),
+    "port_discharge": ("shipment", "portDischarge"),
+    "country_origin": ("shipment", "countryOrigin"),
+    "incoterms":      ("shipment", "incoterms"),
+    "payment_terms":  ("shipment", "paymentTerms"),
+    "vessel":         ("shipment", "vesselName"),
+    "pkg_type":       ("shipment", "packageType"),
+    "num_packages":   ("shipment", "numPackages"),
+    "gross_wt":       ("shipment", "grossWeight"),
+    "net_wt":         ("shipment", "netWeight"),
+    "currency":       ("shipment", "currency"),
+    "reporting_currency": ("shipment", "reportingCurrency"),
+}
 
 
 def collect_data() -> dict:
     """Gather all widget values into a structured dict."""
     ss = st.session_state
-    df: pd.DataFrame = ss.get("items_editor", ss.items).copy()
-    df["Total"] = df["Quantity"] * df["Unit Price"]
-    items = []
-    for _, row in df.iterrows():
-        if row["Description"] or row["Quantity"] or row["Unit Price"]:
-            items.append({
-                "desc":  str(row["Description"]),
-                "hs":    str(row["HS Code"]),
-                "qty":   row["Quantity"],
-                "unit":  str(row["Unit"]),
-                "price": round(float(row["Unit Price"]), 2),
-                "total": round(float(row["Total"]), 2),
-            })
-    return {
-        "exporter": {
-            "name": ss.exp_name, "address": ss.exp_addr, "city": ss.exp_city,
-            "contact": ss.exp_contact, "email": ss.exp_email,
-            "iec": ss.exp_iec, "gst": ss.exp_gst,
-        },
-        "consignee": {
-            "name": ss.con_name, "address": ss.con_addr, "city": ss.con_city,
-            "contact": ss.con_contact, "email": ss.con_email,
-        },
-        "shipment": {
-            "invoiceNumber": ss.inv_number,
-            "invoiceDate":   str(ss.inv_date),
-            "poNumber":      ss.po_number,
-            "portLoading":   ss.port_loading,
-            "portDischarge": ss.port_discharge,
-            "countryOrigin": ss.country_origin,
-            "incoterms":     ss.incoterms,
-            "paymentTerms":  ss.payment_terms,
-            "vesselName":    ss.vessel,
-            "packageType":   ss.pkg_type,
-            "numPackages":   ss.num_packages,
-            "grossWeight":   ss.gross_wt,
-            "netWeight":     ss.net_wt,
-            "currency":      ss.currency,
-        },
-        "items": items,
-    }
+    data = {"exporter": {}, "consignee": {}, "shipment": {}}
+    for key, (section, field) in FORM_FIELDS.items():
+        data[section][field] = ss[key]
+    data["shipment"]["invoiceDate"] = str(ss.inv_date)
+    data["items"] = (ItemFile(ss.item_file) if ss.item_file
+                     else ItemTable.from_frame(current_items()))
+    apply_reporting(data["shipment"])
+    apply_packing(data["shipment"], data["items"])
+    return data
+
+
+def restore_data(d: dict):
+    """Put a collect_data() dict back into the form; runs before the widgets exist."""
+    ss = st.session_state
+    for key, (section, field) in FORM_FIELDS.items():
+        ss[key] = d[section].get(field, _DEFAULTS[key])
+    try:
+        ss.inv_date = date.fromisoformat(str(ss.inv_date))
+    except ValueError:
+        ss.inv_date = date.today()
+    if isinstance(d["items"], ItemFile):
+        # Saved with an item file attached: attach it again, not its rows
+        set_items(ItemTable.from_records([]).to_frame())
+        ss.item_file = ss.item_file_path = str(d["items"].path)
+    else:
+        set_items(ItemTable.from_records(d["items"]).to_frame())
+        ss.item_file = ""
 
 
-# ── Document generators ───────────────────────────────────────────────────────
+# ── Stores ────────────────────────────────────────────────────────────────────
+@st.cache_resource
+def get_store() -> ContentStore:
+    return ContentStore(config.STORE_DIR, config.STORE_MAX_BYTES)
 
-def gen_commercial_invoice(d):
-    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
-    total = sum(it["total"] for it in items)
-    cur   = ship["currency"]
-    rows  = "".join(
-        f"<tr><td>{i}</td><td>{it['desc']}</td><td>{it['hs']}</td>"
-        f"<td>{it['qty']} {it['unit']}</td><td>{it['price']}</td><td>{it['total']}</td></tr>"
-        for i, it in enumerate(items, 1)
-    )
-    return f"""
-<div class="document-preview">
-  <div class="doc-title">Commercial Invoice</div>
-  <div class="doc-section"><div class="doc-section-title">Exporter / Shipper</div>{exp_block(exp)}</div>
-  <div class="doc-section"><div class="doc-section-title">Consignee / Buyer</div>{con_block(con)}</div>
-  <div class="doc-row">
-    <div><span class="doc-label">Invoice No:</span> {ship['invoiceNumber']}</div>
-    <div><span class="doc-label">Date:</span> {ship['invoiceDate']}</div>
-  </div>
-  <div class="doc-row">
-    <div><span class="doc-label">PO / Contract No:</span> {na(ship.get('poNumber'))}</div>
-    <div><span class="doc-label">Incoterms:</span> {na(ship.get('incoterms'))}</div>
-  </div>
-  <div class="doc-row">
-    <div><span class="doc-label">Port of Loading:</span> {na(ship.get('portLoading'))}</div>
-    <div><span class="doc-label">Port of Discharge:</span> {na(ship.get('portDischarge'))}</div>
-  </div>
-  <div class="doc-row">
-    <div><span class="doc-label">Country of Origin:</span> {na(ship.get('countryOrigin'))}</div>
-    <div><span class="doc-label">Payment Terms:</span> {na(ship.get('paymentTerms'))}</div>
-  </div>
-  <table>
-    <thead><tr><th>#</th><th>Description of Goods</th><th>HS Code</th>
-      <th>Quantity</th><th>Unit Price</th><th>Amount ({cur})</th></tr></thead>
-    <tbody>{rows}</tbody>
-    <tfoot><tr><th colspan="5" style="text-align:right">TOTAL:</th>
-      <th>{cur} {total:.2f}</th></tr></tfoot>
-  </table>
-  <div class="doc-footer">
-    <div><strong>Total in Words:</strong> {number_to_words(total)} {cur} Only</div>
-    <div style="margin-top:15px"><strong>Declaration:</strong> We declare that this invoice
-      shows the actual price of the goods described and that all particulars are true and correct.</div>
-    <div class="signature-line">Authorized Signature</div>
-  </div>
-</div>"""
-
-
-def gen_packing_list(d):
-    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
-    rows = "".join(
-        f"<tr><td>{i}</td><td>{it['desc']}</td><td>{it['qty']} {it['unit']}</td>"
-        f"<td>{na(ship.get('packageType'))}</td><td>{it['hs']}</td></tr>"
-        for i, it in enumerate(items, 1)
-    )
-    return f"""
-<div class="document-preview">
-  <div class="doc-title">Packing List</div>
-  <div class="doc-section"><div class="doc-section-title">Exporter / Shipper</div>{exp_block(exp)}</div>
-  <div class="doc-section"><div class="doc-section-title">Consignee</div>{con_block(con)}</div>
-  <div class="doc-row">
-    <div><span class="doc-label">Invoice No:</span> {ship['invoiceNumber']}</div>
-    <div><span class="doc-label">Date:</span> {ship['invoiceDate']}</div>
-  </div>
-  <div class="doc-row">
-    <div><span class="doc-label">Vessel / Flight:</span> {na(ship.get('vesselName'))}</div>
-    <div><span class="doc-label">No. of Packages:</span> {na(ship.get('numPackages'))}</div>
-  </div>
-  <div class="doc-row">
-    <div><span class="doc-label">Gross Weight:</span> {na(ship.get('grossWeight'))} KG</div>
-    <div><span class="doc-label">Net Weight:</span> {na(ship.get('netWeight'))} KG</div>
-  </div>
-  <table>
-    <thead><tr><th>#</th><th>Description</th><th>Quantity</th><th>Packing Type</th><th>HS Code</th></tr></thead>
-    <tbody>{rows}</tbody>
-  </table>
-  <div class="doc-footer">
-    <div><strong>Marks &amp; Numbers:</strong> {con['name']} / {na(ship.get('portDischarge'))}</div>
-    <div class="signature-line">Authorized Signature</div>
-  </div>
-</div>"""
-
-
-def gen_certificate_of_origin(d):
-    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
-    rows = "".join(
-        f"<tr><td>{i}</td><td>{it['desc']}</td><td>{it['qty']} {it['unit']}</td>"
-        f"<td>{na(ship.get('countryOrigin'))}</td></tr>"
-        for i, it in enumerate(items, 1)
-    )
-    return f"""
-<div class="document-preview">
-  <div class="doc-title">Certificate of Origin</div>
-  <div class="doc-row">
-    <div><span class="doc-label">Certificate No:</span> COO-{ship['invoiceNumber']}</div>
-    <div><span class="doc-label">Date:</span> {ship['invoiceDate']}</div>
-  </div>
-  <div class="doc-section"><div class="doc-section-title">Exporter</div>{exp_block(exp)}</div>
-  <div class="doc-section"><div class="doc-section-title">Consignee</div>{con_block(con)}</div>
-  <div class="doc-row">
-    <div><span class="doc-label">Invoice No:</span> {ship['invoiceNumber']}</div>
-    <div><span class="doc-label">Port of Discharge:</span> {na(ship.get('portDischarge'))}</div>
-  </div>
-  <table>
-    <thead><tr><th>#</th><th>Description of Goods</th><th>Quantity</th><th>Country of Origin</th></tr></thead>
-    <tbody>{rows}</tbody>
-  </table>
-  <div class="doc-footer">
-    <div style="margin-top:15px"><strong>Declaration:</strong> We hereby certify that the goods
-      described above originated in {na(ship.get('countryOrigin'))}.</div>
-    <div class="sigs">
-      <div class="signature-line">Exporter's Signature</div>
-      <div class="signature-line">Chamber of Commerce Stamp</div>
-    </div>
-  </div>
-</div>"""
-
-
-def gen_shipping_bill(d):
-    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
-    total = sum(it["total"] for it in items)
-    cur   = ship["currency"]
-    rows  = "".join(
-        f"<tr><td>{i}</td><td>{it['desc']}</td><td>{it['hs']}</td>"
-        f"<td>{it['qty']} {it['unit']}</td><td>{it['total']}</td></tr>"
-        for i, it in enumerate(items, 1)
-    )
-    return f"""
-<div class="document-preview">
-  <div class="doc-title">Shipping Bill</div>
-  <div class="doc-row">
-    <div><span class="doc-label">Shipping Bill No:</span> SB-{ship['invoiceNumber']}</div>
-    <div><span class="doc-label">Date:</span> {ship['invoiceDate']}</div>
-  </div>
-  <div class="doc-section">
-    <div class="doc-section-title">Exporter Details</div>{exp_block(exp)}
-  </div>
-  <div class="doc-row">
-    <div><span class="doc-label">Port of Loading:</span> {na(ship.get('portLoading'))}</div>
-    <div><span class="doc-label">Port of Discharge:</span> {na(ship.get('portDischarge'))}</div>
-  </div>
-  <div class="doc-row">
-    <div><span class="doc-label">Country of Destination:</span> {na(con.get('city'))}</div>
-    <div><span class="doc-label">Invoice Value:</span> {cur} {total:.2f}</div>
-  </div>
-  <table>
-    <thead><tr><th>#</th><th>Description</th><th>HS Code</th>
-      <th>Quantity</th><th>FOB Value ({cur})</th></tr></thead>
-    <tbody>{rows}</tbody>
-  </table>
-  <div class="doc-footer">
-    <div><strong>Total FOB Value:</strong> {cur} {total:.2f}</div>
-    <div class="signature-line">Customs Authorized Officer</div>
-  </div>
-</div>"""
-
-
-def gen_sli(d):
-    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
-    goods = "".join(f"<div>• {it['qty']} {it['unit']} of {it['desc']}</div>" for it in items)
-    return f"""
-<div class="document-preview">
-  <div class="doc-title">Shipper's Letter of Instruction (SLI)</div>
-  <div class="doc-row">
-    <div><span class="doc-label">Reference No:</span> SLI-{ship['invoiceNumber']}</div>
-    <div><span class="doc-label">Date:</span> {ship['invoiceDate']}</div>
-  </div>
-  <div class="doc-section">
-    <div class="doc-section-title">To: Freight Forwarder / Carrier</div>
-    <div>Please arrange shipment as per the following instructions:</div>
-  </div>
-  <div class="doc-section"><div class="doc-section-title">Shipper</div>{exp_block(exp)}</div>
-  <div class="doc-section"><div class="doc-section-title">Consignee</div>{con_block(con)}</div>
-  <div class="doc-row">
-    <div><span class="doc-label">Port of Loading:</span> {na(ship.get('portLoading'))}</div>
-    <div><span class="doc-label">Port of Discharge:</span> {na(ship.get('portDischarge'))}</div>
-  </div>
-  <div class="doc-row">
-    <div><span class="doc-label">Vessel / Flight:</span> {na(ship.get('vesselName'))}</div>
-    <div><span class="doc-label">No. of Packages:</span> {na(ship.get('numPackages'))}</div>
-  </div>
-  <div class="doc-row">
-    <div><span class="doc-label">Gross Weight:</span> {na(ship.get('grossWeight'))} KG</div>
-    <div><span class="doc-label">Incoterms:</span> {na(ship.get('incoterms'))}</div>
-  </div>
-  <div class="doc-section"><div class="doc-section-title">Description of Goods</div>{goods}</div>
-  <div class="doc-footer">
-    <div style="margin-top:15px"><strong>Special Instructions:</strong> Handle with care.
-      Notify consignee upon arrival.</div>
-    <div class="signature-line">Shipper's Signature</div>
-  </div>
-</div>"""
-
-
-def gen_proforma_invoice(d):
-    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
-    total = sum(it["total"] for it in items)
-    cur   = ship["currency"]
-    rows  = "".join(
-        f"<tr><td>{i}</td><td>{it['desc']}</td><td>{it['qty']} {it['unit']}</td>"
-        f"<td>{it['price']}</td><td>{it['total']}</td></tr>"
-        for i, it in enumerate(items, 1)
-    )
-    return f"""
-<div class="document-preview">
-  <div class="doc-title">Proforma Invoice</div>
-  <div class="doc-subtitle">(For Reference Only — Not a Tax Invoice)</div>
-  <div class="doc-section"><div class="doc-section-title">Seller</div>{exp_block(exp)}</div>
-  <div class="doc-section"><div class="doc-section-title">Buyer</div>{con_block(con)}</div>
-  <div class="doc-row">
-    <div><span class="doc-label">Proforma Invoice No:</span> PI-{ship['invoiceNumber']}</div>
-    <div><span class="doc-label">Date:</span> {ship['invoiceDate']}</div>
-  </div>
-  <div class="doc-row">
-    <div><span class="doc-label">Incoterms:</span> {na(ship.get('incoterms'))}</div>
-    <div><span class="doc-label">Payment Terms:</span> {na(ship.get('paymentTerms'))}</div>
-  </div>
-  <table>
-    <thead><tr><th>#</th><th>Description</th><th>Quantity</th>
-      <th>Unit Price ({cur})</th><th>Amount ({cur})</th></tr></thead>
-    <tbody>{rows}</tbody>
-    <tfoot><tr><th colspan="4" style="text-align:right">TOTAL:</th>
-      <th>{cur} {total:.2f}</th></tr></tfoot>
-  </table>
-  <div class="doc-footer">
-    <div style="margin-top:15px"><strong>Validity:</strong> This proforma invoice is valid
-      for 30 days from the date of issue.</div>
-    <div style="margin-top:10px"><strong>Note:</strong> This is a preliminary invoice for
-      quotation purposes only. Final commercial invoice will be issued upon shipment.</div>
-    <div class="signature-line">Authorized Signature</div>
-  </div>
-</div>"""
-
-
-def gen_bill_of_lading(d):
-    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
-    goods = "".join(f"<div>• {it['qty']} {it['unit']} — {it['desc']}</div>" for it in items)
-    return f"""
-<div class="document-preview">
-  <div class="doc-title">Bill of Lading (B/L)</div>
-  <div class="doc-subtitle">Non-Negotiable Copy</div>
-  <div class="doc-row">
-    <div><span class="doc-label">B/L No:</span> BL-{ship['invoiceNumber']}</div>
-    <div><span class="doc-label">Date:</span> {ship['invoiceDate']}</div>
-  </div>
-  <div class="doc-section"><div class="doc-section-title">Shipper</div>{exp_block(exp)}</div>
-  <div class="doc-section"><div class="doc-section-title">Consignee</div>{con_block(con)}</div>
-  <div class="doc-row">
-    <div><span class="doc-label">Vessel:</span> {na(ship.get('vesselName'))}</div>
-    <div><span class="doc-label">Port of Loading:</span> {na(ship.get('portLoading'))}</div>
-  </div>
-  <div class="doc-row">
-    <div><span class="doc-label">Port of Discharge:</span> {na(ship.get('portDischarge'))}</div>
-    <div><span class="doc-label">No. of Packages:</span> {na(ship.get('numPackages'))}</div>
-  </div>
-  <div class="doc-row">
-    <div><span class="doc-label">Gross Weight:</span> {na(ship.get('grossWeight'))} KG</div>
-    <div><span class="doc-label">Net Weight:</span> {na(ship.get('netWeight'))} KG</div>
-  </div>
-  <div class="doc-section"><div class="doc-section-title">Description of Goods</div>{goods}</div>
-  <div class="doc-footer">
-    <div><strong>Freight Terms:</strong> {na(ship.get('incoterms'))}</div>
-    <div><strong>Container Type:</strong> {na(ship.get('packageType'))}</div>
-    <div class="signature-line">Carrier's Signature &amp; Stamp</div>
-  </div>
-</div>"""
-
-
-def gen_air_waybill(d):
-    import random
-    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
-    goods = "".join(f"<div>• {it['qty']} {it['unit']} — {it['desc']}</div>" for it in items)
-    awb_no = random.randint(10000000, 99999999)
-    return f"""
-<div class="document-preview">
-  <div class="doc-title">Air Waybill (AWB)</div>
-  <div class="doc-subtitle">Non-Negotiable</div>
-  <div class="doc-row">
-    <div><span class="doc-label">AWB No:</span> {awb_no}</div>
-    <div><span class="doc-label">Date:</span> {ship['invoiceDate']}</div>
-  </div>
-  <div class="doc-section"><div class="doc-section-title">Shipper / Consignor</div>{exp_block(exp)}</div>
-  <div class="doc-section"><div class="doc-section-title">Consignee</div>{con_block(con)}</div>
-  <div class="doc-row">
-    <div><span class="doc-label">Airport of Departure:</span> {na(ship.get('portLoading'))}</div>
-    <div><span class="doc-label">Airport of Destination:</span> {na(ship.get('portDischarge'))}</div>
-  </div>
-  <div class="doc-row">
-    <div><span class="doc-label">Flight:</span> {na(ship.get('vesselName'))}</div>
-    <div><span class="doc-label">No. of Pieces:</span> {na(ship.get('numPackages'))}</div>
-  </div>
-  <div class="doc-row">
-    <div><span class="doc-label">Gross Weight:</span> {na(ship.get('grossWeight'))} KG</div>
-    <div><span class="doc-label">Chargeable Weight:</span> {na(ship.get('grossWeight'))} KG</div>
-  </div>
-  <div class="doc-section">
-    <div class="doc-section-title">Nature and Quantity of Goods</div>{goods}
-  </div>
-  <div class="doc-footer">
-    <div style="margin-top:15px"><strong>Handling Information:</strong> Handle with care.</div>
-    <div class="signature-line">Airline Agent Signature</div>
-  </div>
-</div>"""
-
-
-def gen_insurance_certificate(d):
-    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
-    total = sum(it["total"] for it in items)
-    insured = round(total * 1.1, 2)
-    cur = ship["currency"]
-    goods = "".join(f"<div>• {it['desc']}</div>" for it in items)
-    return f"""
-<div class="document-preview">
-  <div class="doc-title">Certificate of Insurance</div>
-  <div class="doc-row">
-    <div><span class="doc-label">Certificate No:</span> INS-{ship['invoiceNumber']}</div>
-    <div><span class="doc-label">Date:</span> {ship['invoiceDate']}</div>
-  </div>
-  <div class="doc-section">
-    <div class="doc-section-title">Assured / Insured</div>{con_block(con)}
-  </div>
-  <div class="doc-row">
-    <div><span class="doc-label">Invoice No:</span> {ship['invoiceNumber']}</div>
-    <div><span class="doc-label">Vessel / Flight:</span> {na(ship.get('vesselName'))}</div>
-  </div>
-  <div class="doc-row">
-    <div><span class="doc-label">From:</span> {na(ship.get('portLoading'))}</div>
-    <div><span class="doc-label">To:</span> {na(ship.get('portDischarge'))}</div>
-  </div>
-  <div class="doc-section"><div class="doc-section-title">Description of Goods</div>{goods}</div>
-  <div class="doc-row">
-    <div><span class="doc-label">Sum Insured:</span> {cur} {insured}</div>
-    <div><span class="doc-label">Basis:</span> 110% of Invoice Value</div>
-  </div>
-  <div class="doc-section">
-    <div class="doc-section-title">Coverage</div>
-    <div>• All risks of physical loss or damage from external causes</div>
-    <div>• War, strikes, riots and civil commotion risks</div>
-    <div>• Total loss and general average</div>
-  </div>
-  <div class="doc-footer">
-    <div style="margin-top:15px"><strong>Terms:</strong> Institute Cargo Clauses (A)</div>
-    <div class="signature-line">Insurance Co. Authorized Signature</div>
-  </div>
-</div>"""
-
-
-def gen_inspection_certificate(d):
-    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
-    goods = "".join(f"<div>• {it['qty']} {it['unit']} of {it['desc']}</div>" for it in items)
-    return f"""
-<div class="document-preview">
-  <div class="doc-title">Inspection Certificate</div>
-  <div class="doc-row">
-    <div><span class="doc-label">Certificate No:</span> IC-{ship['invoiceNumber']}</div>
-    <div><span class="doc-label">Date:</span> {ship['invoiceDate']}</div>
-  </div>
-  <div class="doc-section"><div class="doc-section-title">Exporter</div>{exp_block(exp)}</div>
-  <div class="doc-section"><div class="doc-section-title">Buyer / Consignee</div>{con_block(con)}</div>
-  <div class="doc-row">
-    <div><span class="doc-label">Invoice No:</span> {ship['invoiceNumber']}</div>
-    <div><span class="doc-label">PO No:</span> {na(ship.get('poNumber'))}</div>
-  </div>
-  <div class="doc-section">
-    <div class="doc-section-title">Description of Goods Inspected</div>{goods}
-  </div>
-  <div class="doc-section">
-    <div class="doc-section-title">Inspection Results</div>
-    <div>✓ Quality conforms to purchase order specifications</div>
-    <div>✓ Quantity verified and matches shipping documents</div>
-    <div>✓ Packaging is suitable for international transport</div>
-    <div>✓ Goods are in good condition and fit for shipment</div>
-  </div>
-  <div class="doc-footer">
-    <div style="margin-top:15px"><strong>Declaration:</strong> We hereby certify that the goods
-      have been inspected and found to be in accordance with the specifications.</div>
-    <div class="sigs">
-      <div class="signature-line">Inspector's Signature</div>
-      <div class="signature-line">Company Stamp</div>
-    </div>
-  </div>
-</div>"""
-
-
-def gen_phytosanitary(d):
-    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
-    goods = "".join(f"<div>• {it['qty']} {it['unit']} of {it['desc']}</div>" for it in items)
-    return f"""
-<div class="document-preview">
-  <div class="doc-title">Phytosanitary Certificate</div>
-  <div class="doc-subtitle">Plant Protection Organization</div>
-  <div class="doc-row">
-    <div><span class="doc-label">Certificate No:</span> PC-{ship['invoiceNumber']}</div>
-    <div><span class="doc-label">Date:</span> {ship['invoiceDate']}</div>
-  </div>
-  <div class="doc-section"><div class="doc-section-title">Exporter</div>{exp_block(exp)}</div>
-  <div class="doc-section"><div class="doc-section-title">Consignee</div>{con_block(con)}</div>
-  <div class="doc-row">
-    <div><span class="doc-label">Port of Entry:</span> {na(ship.get('portDischarge'))}</div>
-    <div><span class="doc-label">Country of Origin:</span> {na(ship.get('countryOrigin'))}</div>
-  </div>
-  <div class="doc-section"><div class="doc-section-title">Description of Consignment</div>{goods}</div>
-  <div class="doc-section">
-    <div class="doc-section-title">Phytosanitary Declaration</div>
-    <div>This is to certify that the plants, plant products, or other regulated articles described
-      herein have been inspected and/or tested according to appropriate official procedures and are
-      considered to be free from quarantine pests and practically free from other injurious pests.</div>
-  </div>
-  <div class="doc-section">
-    <div class="doc-section-title">Treatment</div>
-    <div>✓ Inspection conducted on: {ship['invoiceDate']}</div>
-    <div>✓ No quarantine pests detected</div>
-    <div>✓ Meets phytosanitary import requirements</div>
-  </div>
-  <div class="doc-footer">
-    <div class="sigs">
-      <div class="signature-line">Plant Protection Officer</div>
-      <div class="signature-line">Official Stamp</div>
-    </div>
-  </div>
-</div>"""
-
-
-def gen_fumigation(d):
-    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
-    goods = "".join(f"<div>• {it['desc']}</div>" for it in items)
-    return f"""
-<div class="document-preview">
-  <div class="doc-title">Fumigation Certificate</div>
-  <div class="doc-subtitle">Pest Control Treatment Certificate</div>
-  <div class="doc-row">
-    <div><span class="doc-label">Certificate No:</span> FC-{ship['invoiceNumber']}</div>
-    <div><span class="doc-label">Date:</span> {ship['invoiceDate']}</div>
-  </div>
-  <div class="doc-section"><div class="doc-section-title">Exporter</div>{exp_block(exp)}</div>
-  <div class="doc-section"><div class="doc-section-title">Consignee</div>{con_block(con)}</div>
-  <div class="doc-row">
-    <div><span class="doc-label">Container No:</span> CONT-{ship['invoiceNumber']}</div>
-    <div><span class="doc-label">No. of Packages:</span> {na(ship.get('numPackages'))}</div>
-  </div>
-  <div class="doc-section"><div class="doc-section-title">Description of Goods</div>{goods}</div>
-  <div class="doc-section">
-    <div class="doc-section-title">Fumigation Details</div>
-    <div><span class="doc-label">Fumigant Used:</span> Methyl Bromide / Aluminum Phosphide</div>
-    <div><span class="doc-label">Dosage:</span> As per ISPM 15 standards</div>
-    <div><span class="doc-label">Treatment Duration:</span> 24 hours</div>
-    <div><span class="doc-label">Temperature:</span> 25°C</div>
-    <div><span class="doc-label">Treatment Date:</span> {ship['invoiceDate']}</div>
-  </div>
-  <div class="doc-footer">
-    <div style="margin-top:15px"><strong>Certification:</strong> We hereby certify that the
-      above-mentioned consignment and wooden packaging material have been fumigated according to
-      ISPM-15 standards and are free from pests.</div>
-    <div class="sigs">
-      <div class="signature-line">Licensed Fumigation Agency</div>
-      <div class="signature-line">License No. &amp; Stamp</div>
-    </div>
-  </div>
-</div>"""
-
-
-def gen_health_certificate(d):
-    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
-    goods = "".join(f"<div>• {it['qty']} {it['unit']} of {it['desc']}</div>" for it in items)
-    return f"""
-<div class="document-preview">
-  <div class="doc-title">Health Certificate</div>
-  <div class="doc-subtitle">For Export of Food Products</div>
-  <div class="doc-row">
-    <div><span class="doc-label">Certificate No:</span> HC-{ship['invoiceNumber']}</div>
-    <div><span class="doc-label">Date:</span> {ship['invoiceDate']}</div>
-  </div>
-  <div class="doc-section">
-    <div class="doc-section-title">Exporter / Manufacturer</div>{exp_block(exp)}
-  </div>
-  <div class="doc-section">
-    <div class="doc-section-title">Importer / Consignee</div>{con_block(con)}
-  </div>
-  <div class="doc-section"><div class="doc-section-title">Description of Products</div>{goods}</div>
-  <div class="doc-section">
-    <div class="doc-section-title">Health Declaration</div>
-    <div>✓ The products have been prepared under hygienic conditions</div>
-    <div>✓ Raw materials used are of good quality and fit for human consumption</div>
-    <div>✓ Products comply with food safety standards and regulations</div>
-    <div>✓ No harmful substances or contaminants detected</div>
-    <div>✓ Storage and transportation meet sanitary requirements</div>
-  </div>
-  <div class="doc-footer">
-    <div style="margin-top:15px"><strong>Validity:</strong> This certificate is valid for
-      6 months from date of issue.</div>
-    <div class="sigs">
-      <div class="signature-line">Health Authority Officer</div>
-      <div class="signature-line">Official Seal</div>
-    </div>
-  </div>
-</div>"""
-
-
-def gen_bill_of_exchange(d):
-    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
-    total = sum(it["total"] for it in items)
-    cur   = ship["currency"]
-    return f"""
-<div class="document-preview">
-  <div class="doc-title">Bill of Exchange / Draft</div>
-  <div class="doc-row">
-    <div><span class="doc-label">Draft No:</span> BE-{ship['invoiceNumber']}</div>
-    <div><span class="doc-label">Date:</span> {ship['invoiceDate']}</div>
-  </div>
-  <div class="doc-section" style="padding:20px">
-    <div style="font-size:18px;margin-bottom:12px">
-      <strong>Amount:</strong> {cur} {total:.2f}</div>
-    <div style="font-size:16px">
-      <strong>In Words:</strong> {number_to_words(total)} {cur} Only</div>
-  </div>
-  <div class="doc-section">
-    <div>At <strong>{na(ship.get('paymentTerms'))}</strong> of this FIRST Bill of Exchange
-      (Second of the same tenor and date being unpaid)</div>
-    <div style="margin-top:12px">Pay to the order of <strong>{exp['name']}</strong></div>
-    <div style="margin-top:12px">The sum of <strong>{cur} {total:.2f}</strong></div>
-  </div>
-  <div class="doc-section">
-    <div class="doc-section-title">To (Drawee)</div>{con_block(con)}
-  </div>
-  <div class="doc-section">
-    <div class="doc-section-title">For</div>
-    <div>Value received as per Invoice No. {ship['invoiceNumber']}</div>
-    <div>dated {ship['invoiceDate']}</div>
-  </div>
-  <div class="doc-footer">
-    <div style="text-align:right;margin-top:30px">
-      <div><strong>{exp['name']}</strong></div>
-      <div class="signature-line">Drawer's Signature</div>
-    </div>
-  </div>
-</div>"""
-
-
-def gen_letter_of_credit(d):
-    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
-    total = sum(it["total"] for it in items)
-    cur   = ship["currency"]
-    goods = "".join(f"<div>• {it['qty']} {it['unit']} of {it['desc']}</div>" for it in items)
-    return f"""
-<div class="document-preview">
-  <div class="doc-title">Letter of Credit (L/C)</div>
-  <div class="doc-subtitle">Irrevocable Documentary Credit</div>
-  <div class="doc-row">
-    <div><span class="doc-label">L/C No:</span> LC-{ship['invoiceNumber']}</div>
-    <div><span class="doc-label">Date of Issue:</span> {ship['invoiceDate']}</div>
-  </div>
-  <div class="doc-section">
-    <div class="doc-section-title">Applicant (Buyer)</div>{con_block(con)}
-  </div>
-  <div class="doc-section">
-    <div class="doc-section-title">Beneficiary (Seller)</div>{exp_block(exp)}
-  </div>
-  <div class="doc-row">
-    <div><span class="doc-label">Amount:</span> {cur} {total:.2f}</div>
-    <div><span class="doc-label">Expiry Date:</span> 90 days from issue</div>
-  </div>
-  <div class="doc-section"><div class="doc-section-title">Description of Goods</div>{goods}</div>
-  <div class="doc-section">
-    <div class="doc-section-title">Shipment Details</div>
-    <div><span class="doc-label">From:</span> {na(ship.get('portLoading'))}</div>
-    <div><span class="doc-label">To:</span> {na(ship.get('portDischarge'))}</div>
-    <div><span class="doc-label">Incoterms:</span> {na(ship.get('incoterms'))}</div>
-    <div><span class="doc-label">Latest Shipment:</span> 60 days from L/C date</div>
-  </div>
-  <div class="doc-section">
-    <div class="doc-section-title">Documents Required</div>
-    <div>• Commercial Invoice (3 originals)</div>
-    <div>• Packing List (2 copies)</div>
-    <div>• Bill of Lading (full set)</div>
-    <div>• Certificate of Origin</div>
-    <div>• Insurance Certificate</div>
-  </div>
-  <div class="doc-footer">
-    <div style="margin-top:15px"><strong>Special Conditions:</strong> This credit is subject to
-      Uniform Customs and Practice for Documentary Credits (UCP 600).</div>
-    <div class="signature-line">Issuing Bank Authorized Signature</div>
-  </div>
-</div>"""
-
-
-def gen_export_license(d):
-    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
-    goods = "".join(
-        f"<div>• {it['qty']} {it['unit']} of {it['desc']} (HS Code: {it['hs']})</div>"
-        for it in items
-    )
-    return f"""
-<div class="document-preview">
-  <div class="doc-title">Export License</div>
-  <div class="doc-row">
-    <div><span class="doc-label">License No:</span> EL-{ship['invoiceNumber']}</div>
-    <div><span class="doc-label">Date of Issue:</span> {ship['invoiceDate']}</div>
-  </div>
-  <div class="doc-section">
-    <div class="doc-section-title">Exporter Details</div>{exp_block(exp)}
-  </div>
-  <div class="doc-section">
-    <div class="doc-section-title">Consignee Details</div>{con_block(con)}
-  </div>
-  <div class="doc-row">
-    <div><span class="doc-label">Country of Destination:</span> {na(con.get('city'))}</div>
-    <div><span class="doc-label">Port of Export:</span> {na(ship.get('portLoading'))}</div>
-  </div>
-  <div class="doc-section"><div class="doc-section-title">Description of Goods</div>{goods}</div>
-  <div class="doc-section">
-    <div class="doc-section-title">License Conditions</div>
-    <div>✓ This license is valid for single shipment only</div>
-    <div>✓ Shipment must be completed within 6 months</div>
-    <div>✓ Goods must be exported as per approved specifications</div>
-    <div>✓ Any amendments require prior approval</div>
-  </div>
-  <div class="doc-footer">
-    <div><strong>Validity:</strong> 6 months from date of issue</div>
-    <div style="margin-top:10px"><strong>Note:</strong> This license is issued subject to the
-      provisions of the Foreign Trade Policy.</div>
-    <div class="signature-line">Licensing Authority Signature &amp; Seal</div>
-  </div>
-</div>"""
-
-
-def gen_dangerous_goods(d):
-    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
-    rows = "".join(
-        f"<tr><td>UN####</td><td>{it['desc']}</td><td>-</td><td>-</td>"
-        f"<td>{it['qty']} {it['unit']}</td></tr>"
-        for it in items
-    )
-    return f"""
-<div class="document-preview">
-  <div class="doc-title">Dangerous Goods Declaration</div>
-  <div class="doc-subtitle">IMDG / IATA Dangerous Goods Transport Document</div>
-  <div class="doc-row">
-    <div><span class="doc-label">DGD No:</span> DGD-{ship['invoiceNumber']}</div>
-    <div><span class="doc-label">Date:</span> {ship['invoiceDate']}</div>
-  </div>
-  <div class="doc-section"><div class="doc-section-title">Shipper</div>{exp_block(exp)}</div>
-  <div class="doc-section"><div class="doc-section-title">Consignee</div>{con_block(con)}</div>
-  <div class="doc-row">
-    <div><span class="doc-label">Vessel / Flight:</span> {na(ship.get('vesselName'))}</div>
-    <div><span class="doc-label">Port of Loading:</span> {na(ship.get('portLoading'))}</div>
-  </div>
-  <table>
-    <thead><tr><th>UN No.</th><th>Proper Shipping Name</th><th>Class</th>
-      <th>Packing Group</th><th>Quantity</th></tr></thead>
-    <tbody>{rows}</tbody>
-  </table>
-  <div class="doc-section">
-    <div class="doc-section-title">Additional Handling Information</div>
-    <div>• Package type: {na(ship.get('packageType'))}</div>
-    <div>• Emergency response: Contact shipper immediately</div>
-    <div>• Special precautions: Handle with care</div>
-  </div>
-  <div class="doc-footer">
-    <div style="margin-top:15px"><strong>Shipper's Declaration:</strong> I hereby declare that
-      the contents of this consignment are fully and accurately described above and are classified,
-      packaged, marked and labeled, and are in proper condition for transport according to applicable
-      regulations.</div>
-    <div class="signature-line">Shipper's Signature &amp; Date</div>
-  </div>
-</div>"""
-
-
-def gen_free_sale(d):
-    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
-    goods = "".join(f"<div>• {it['desc']}</div>" for it in items)
-    return f"""
-<div class="document-preview">
-  <div class="doc-title">Certificate of Free Sale</div>
-  <div class="doc-row">
-    <div><span class="doc-label">Certificate No:</span> CFS-{ship['invoiceNumber']}</div>
-    <div><span class="doc-label">Date:</span> {ship['invoiceDate']}</div>
-  </div>
-  <div class="doc-section">
-    <div class="doc-section-title">Manufacturer / Exporter</div>{exp_block(exp)}
-  </div>
-  <div class="doc-section">
-    <div class="doc-section-title">Importer / Buyer</div>{con_block(con)}
-  </div>
-  <div class="doc-section"><div class="doc-section-title">Product Details</div>{goods}</div>
-  <div class="doc-section">
-    <div class="doc-section-title">Certification</div>
-    <div style="line-height:1.8">
-      This is to certify that the products listed above are manufactured by
-      <strong>{exp['name']}</strong> and are freely sold and distributed in
-      {na(ship.get('countryOrigin'))} without any restrictions. The products comply with all
-      applicable regulations and standards for sale and distribution in the country of manufacture.
-    </div>
-  </div>
-  <div class="doc-section">
-    <div class="doc-section-title">Regulatory Compliance</div>
-    <div>✓ Products meet national quality standards</div>
-    <div>✓ Manufacturing facility is licensed and registered</div>
-    <div>✓ Products are in compliance with health and safety regulations</div>
-    <div>✓ No restrictions on sale or distribution in country of origin</div>
-  </div>
-  <div class="doc-footer">
-    <div style="margin-top:15px"><strong>Validity:</strong> 12 months from date of issue</div>
-    <div class="sigs">
-      <div class="signature-line">Regulatory Authority Signature</div>
-      <div class="signature-line">Official Seal</div>
-    </div>
-  </div>
-</div>"""
-
-
-# Map key → (label, generator_fn, default_checked)
-DOC_REGISTRY = [
-    ("commercial_invoice",      "Commercial Invoice",              gen_commercial_invoice,    True),
-    ("packing_list",            "Packing List",                    gen_packing_list,          True),
-    ("certificate_origin",      "Certificate of Origin",           gen_certificate_of_origin, False),
-    ("shipping_bill",           "Shipping Bill",                   gen_shipping_bill,         False),
-    ("sli",                     "Shipper's Letter of Instruction", gen_sli,                   False),
-    ("proforma",                "Proforma Invoice",                gen_proforma_invoice,      False),
-    ("bill_lading",             "Bill of Lading (B/L)",            gen_bill_of_lading,        False),
-    ("air_waybill",             "Air Waybill (AWB)",               gen_air_waybill,           False),
-    ("insurance_certificate",   "Insurance Certificate",           gen_insurance_certificate, False),
-    ("inspection_certificate",  "Inspection Certificate",          gen_inspection_certificate,False),
-    ("phytosanitary",           "Phytosanitary Certificate",       gen_phytosanitary,         False),
-    ("fumigation",              "Fumigation Certificate",          gen_fumigation,            False),
-    ("health_certificate",      "Health Certificate",              gen_health_certificate,    False),
-    ("bill_exchange",           "Bill of Exchange / Draft",        gen_bill_of_exchange,      False),
-    ("letter_credit",           "Letter of Credit (L/C)",          gen_letter_of_credit,      False),
-    ("export_license",          "Export License",                  gen_export_license,        False),
-    ("dangerous_goods",         "Dangerous Goods Declaration",     gen_dangerous_goods,       False),
-    ("free_sale",               "Certificate of Free Sale",        gen_free_sale,             False),
-]
-
-
-def build_full_html(docs_html: str) -> str:
-    return f"""<!DOCTYPE html>
-<html lang="en"><head><meta charset="UTF-8">
-<title>Export Documents</title>{DOC_CSS}</head>
-<body>{docs_html}</body></html>"""
-
-
-def export_csv(d: dict) -> str:
-    lines = ["EXPORTER INFORMATION"]
-    for k, v in d["exporter"].items():
-        lines.append(f"{k},{v}")
-    lines += ["", "CONSIGNEE INFORMATION"]
-    for k, v in d["consignee"].items():
-        lines.append(f"{k},{v}")
-    lines += ["", "SHIPMENT DETAILS"]
-    for k, v in d["shipment"].items():
-        lines.append(f"{k},{v}")
-    lines += ["", "ITEMS", "Description,HS Code,Quantity,Unit,Unit Price,Total"]
-    for it in d["items"]:
-        lines.append(f"{it['desc']},{it['hs']},{it['qty']},{it['unit']},{it['price']},{it['total']}")
-    return "\n".join(lines)
+
+@st.cache_resource
+def get_artifacts() -> ArtifactCache:
+    return ArtifactCache(config.ARTIFACT_DIR, config.ARTIFACT_TTL, config.ARTIFACT_MAX_BYTES)
+
+
+@st.cache_resource
+def get_index() -> SearchIndex:
+    return SearchIndex(config.SEARCH_DB)
+
+
+@st.cache_resource
+def get_analytics() -> Analytics:
+    return Analytics(config.ANALYTICS_DB)
+
+
+@st.cache_resource
+def get_revisions() -> RevisionStore:
+    return RevisionStore(config.REVISIONS_DB)
+
+
+@st.cache_data(max_entries=4)
+def item_file_totals(path: str, digest: str) -> tuple:
+    # (grand total, packing sums) of an attached item file; one chunked pass per file content
+    f = ItemFile(path)
+    return float(f.total.sum()), packing_sums(f)
+
+
+@st.cache_data(max_entries=2)
+def load_rollups(version: int) -> tuple:
+    # Keyed on the rollup version, so reruns reuse the frames until something is recorded
+    return get_analytics().rollups()
 
 
 # ── UI ────────────────────────────────────────────────────────────────────────
 st.title("📤 Export Document Generator")
 st.caption("Create professional export documents from a single dataset • Eliminate data re-entry")
 
-tab1, tab2 = st.tabs(["📋 Master Data", "📄 Generate Documents"])
+tab1, tab2, tab3, tab4 = st.tabs(["📋 Master Data", "📄 Generate Documents", "🔎 Search", "📊 Analytics"])
 
 # ════════════════════════════════════════════════════════════
 # TAB 1 — MASTER DATA
@@ -967,9 +288,12 @@ with tab1:
     c1.text_input("Company Name *",   key="con_name",    placeholder="XYZ Imports Inc.")
     c2.text_input("Address *",        key="con_addr",    placeholder="456 Import Avenue")
     c3.text_input("City & Country *", key="con_city",    placeholder="New York, USA")
-    c4, c5 = st.columns(2)
+    c4, c5, c6 = st.columns(3)
     c4.text_input("Contact Number",   key="con_contact", placeholder="+1 234-567-8900")
     c5.text_input("Email",            key="con_email",   placeholder="buyer@imports.com")
+    c6.selectbox("Document Language", [""] + [c for c in LANGUAGES if c != "en"], key="con_lang",
+                 format_func=lambda c: f"English + {LANGUAGES[c]}" if c else "English only",
+                 help="Labels on the generated documents are printed in English and this language.")
 
     st.divider()
 
@@ -1026,8 +350,14 @@ with tab1:
         "INR": "INR — Indian Rupee",
         "CNY": "CNY — Chinese Yuan",
     }
-    st.selectbox("Currency", list(CURRENCIES.keys()),
+    c1, c2, _ = st.columns([1, 1, 2])
+    c1.selectbox("Currency", list(CURRENCIES.keys()),
                  format_func=lambda x: CURRENCIES[x], key="currency")
+    c2.selectbox("Reporting Currency (optional)", [""] + list(CURRENCIES.keys()),
+                 format_func=lambda x: CURRENCIES.get(x, "None — invoice currency only"),
+                 key="reporting_currency",
+                 help="Adds converted totals to the Commercial Invoice and Shipping Bill, "
+                      "using the local exchange-rate table.")
 
     st.divider()
 
@@ -1035,54 +365,249 @@ with tab1:
     st.markdown("### 📦 Items / Products")
     st.info("💡 Add all items here. Data syncs automatically across all generated documents.")
 
-    edited = st.data_editor(
-        st.session_state.items,
-        key="items_editor",
-        num_rows="dynamic",
-        use_container_width=True,
-        column_config={
-            "Description": st.column_config.TextColumn("Description of Goods", width="large"),
-            "HS Code":     st.column_config.TextColumn("HS Code",   width="small"),
-            "Quantity":    st.column_config.NumberColumn("Quantity", min_value=0, format="%.2f"),
-            "Unit":        st.column_config.SelectboxColumn(
-                               "Unit", options=["PCS","KGS","MTR","SET","BOX","ROLL","PAIR"]),
-            "Unit Price":  st.column_config.NumberColumn("Unit Price", min_value=0, format="%.4f"),
-        },
-    )
-    # Keep a calculated copy in session_state (used by collect_data)
-    if edited is not None:
-        calc = edited.copy()
-        calc["Total"] = calc["Quantity"] * calc["Unit Price"]
-        st.session_state.items = calc
-        # Grand total summary
-        grand_total = calc["Total"].sum()
-        st.metric(f"Grand Total ({st.session_state.currency})", f"{grand_total:,.2f}")
+    ss = st.session_state
+
+    # Bulk line data (per-container lists and the like) is attached as a file and
+    # read in chunks through a memory map instead of being loaded into the editor
+    def attach_item_file():
+        path = ss.get("item_file_path", "").strip()
+        try:
+            f = open_items(path)
+        except (OSError, ValueError, KeyError, pd.errors.ParserError) as e:
+            ss.items_notice = ("error", f"Could not read item file {path!r}: {e}")
+            return
+        commit_items()
+        ss.item_file = str(f.path)
+        ss.items_notice = ("success", f"Attached {len(f):,} item rows from {path}.")
+
+    def detach_item_file():
+        ss.item_file = ""
+
+    with st.expander("🗄️ Large item file", expanded=bool(ss.item_file)):
+        st.caption("A CSV file on the server with one header row and one row per item — columns "
+                   "Description, HS Code, Quantity, Unit, Unit Price and optionally Total and the "
+                   "packing columns of the table below — or a converted item directory. While "
+                   "attached, its rows replace the table below.")
+        f1, f2, f3 = st.columns([4, 1, 1])
+        f1.text_input("Item file path", key="item_file_path", placeholder="/data/lines.csv",
+                      label_visibility="collapsed")
+        f2.button("📎 Attach", on_click=attach_item_file)
+        f3.button("✖️ Detach", on_click=detach_item_file, disabled=not ss.item_file)
+        notice = ss.pop("items_notice", None)
+        if notice:
+            getattr(st, notice[0])(notice[1])
+
+    grand_total = packed = None
+    if ss.item_file:
+        try:
+            item_file = ItemFile(ss.item_file)
+        except (OSError, ValueError) as e:
+            st.warning(f"The attached item file can no longer be read and was detached: {e}")
+            ss.item_file = ""
+    if ss.item_file:
+        st.caption(f"Showing the first {min(PREVIEW_ROWS, len(item_file)):,} of "
+                   f"{len(item_file):,} rows of the attached item file (read-only).")
+        st.dataframe(item_file.take(slice(0, PREVIEW_ROWS)).to_frame(),
+                     hide_index=True, use_container_width=True)
+        grand_total, packed = item_file_totals(ss.item_file, item_file.digest())
+    else:
+        n_rows = len(ss["items"])
+        p1, p2, p3 = st.columns([1, 1, 4])
+        page_size = p1.selectbox("Rows per page", PAGE_SIZES, index=1,
+                                 key="items_page_size", on_change=commit_items)
+        n_pages = max(1, -(-n_rows // page_size))
+        if ss.get("items_page", 1) > n_pages:
+            ss.items_page = n_pages
+        page_no = p2.number_input("Page", min_value=1, max_value=n_pages, step=1,
+                                  key="items_page", on_change=commit_items)
+        start, stop = (page_no - 1) * page_size, min(page_no * page_size, n_rows)
+        p3.caption(f"Rows {start + 1 if n_rows else 0}–{stop} of {n_rows}. "
+                   "Rows added here are inserted after this page.")
+
+        ss.items_window = (start, stop)
+        ss.items_editor_key = f"items_editor_{ss.items_rev}_{page_no}_{page_size}"
+        base = ss["items"].iloc[start:stop]
+        edited = st.data_editor(
+            base,
+            key=ss.items_editor_key,
+            num_rows="dynamic",
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                "Description": st.column_config.TextColumn("Description of Goods", width="large"),
+                "HS Code":     st.column_config.TextColumn("HS Code",   width="small"),
+                "Quantity":    st.column_config.NumberColumn("Quantity", min_value=0, format="%.2f"),
+                "Unit":        st.column_config.SelectboxColumn(
+                                   "Unit", options=["PCS","KGS","MTR","SET","BOX","ROLL","PAIR"]),
+                "Unit Price":  st.column_config.NumberColumn("Unit Price", min_value=0, format="%.4f"),
+                "Net Wt":      st.column_config.NumberColumn("Net kg/unit", min_value=0, format="%.3f"),
+                "Gross Wt":    st.column_config.NumberColumn("Gross kg/unit", min_value=0, format="%.3f"),
+                "Units/Pkg":   st.column_config.NumberColumn("Units/pkg", min_value=0, format="%g"),
+                "Length":      st.column_config.NumberColumn("Pkg L (cm)", min_value=0, format="%g"),
+                "Width":       st.column_config.NumberColumn("Pkg W (cm)", min_value=0, format="%g"),
+                "Height":      st.column_config.NumberColumn("Pkg H (cm)", min_value=0, format="%g"),
+            },
+        )
+        if edited is not None:
+            # Maintained from the committed table's figures plus this page's delta
+            grand_total = ss.items_total - row_total(base) + row_total(edited)
+            packed = ss.items_packing - row_packing(base) + row_packing(edited)
+
+    if grand_total is not None:
+        m1, m2, _ = st.columns([1, 1, 2])
+        m1.metric(f"Grand Total ({st.session_state.currency})", f"{grand_total:,.2f}")
+        rcur = st.session_state.reporting_currency
+        if rcur and rcur != st.session_state.currency:
+            try:
+                table = load_rates()
+                rate = table.rate(st.session_state.currency, rcur)
+            except (OSError, ValueError, KeyError):
+                table, rate = None, None
+            if rate is not None:
+                m2.metric(f"Grand Total ({rcur})", f"{convert(grand_total, rate):,.2f}",
+                          help=f"Rate table {table.version}. The documents total the line amounts "
+                               "converted and rounded one by one, which can differ by a few cents.")
+            else:
+                m2.warning(f"No exchange rate for {st.session_state.currency} → {rcur}.")
+
+        # Packing totals; they fill in the package and weight fields
+        if packed.any():
+            pt = packing_totals(packed)
+            k1, k2, k3, k4, k5 = st.columns(5)
+            k1.metric("Packages", f"{pt.packages:,}")
+            k2.metric("Net Weight (kg)", f"{pt.net:,.2f}")
+            k3.metric("Gross Weight (kg)", f"{pt.gross:,.2f}")
+            k4.metric("Volume (m³)", f"{pt.volume:,.3f}")
+            k5.metric("Chargeable Weight (kg)", f"{pt.chargeable:,.2f}",
+                      help=f"The greater of gross and volumetric weight ({pt.volumetric:,.2f} kg)")
+            st.caption("Calculated from the items' packing data. These figures replace the "
+                       "packages and weights entered above in every generated document.")
 
     st.divider()
 
     # — Save / Load ———————————————————————————————————————————
-    b1, b2, _ = st.columns([1, 1, 4])
-    if b1.button("💾 Save Form Data"):
-        st.session_state.saved_data = {
-            k: st.session_state[k]
-            for k in _DEFAULTS
-            if k not in ("generated_html", "saved_data")
-        }
-        st.session_state.saved_data["items"] = st.session_state.items.copy()
-        st.success("Form data saved! You can load it anytime.")
-
-    if b2.button("📂 Load Saved Data"):
-        if st.session_state.saved_data:
-            sd = st.session_state.saved_data
-            for k in _DEFAULTS:
-                if k in sd:
-                    st.session_state[k] = sd[k]
-            if "items" in sd:
-                st.session_state.items = sd["items"]
-            st.success("Saved data loaded!")
-            st.rerun()
-        else:
-            st.warning("No saved data found. Please save first.")
+    # Every save is a revision (revisions.py); unchanged item rows are stored once.
+    # Save / load run as callbacks: widget keys can only be set before the widgets exist
+    def save_form():
+        commit_items()
+        data = collect_data()
+        rev, created = get_revisions().save(data)
+        if created and data["shipment"].get("invoiceNumber"):
+            # Recorded per invoice, so saving it again replaces its contribution
+            get_analytics().record([shipment_facts(data)])
+        st.session_state.rev_pick = rev
+        st.session_state.form_notice = (
+            ("success", f"Form data saved as revision #{rev}.") if created
+            else ("info", f"No changes since revision #{rev}."))
+
+    def load_form():
+        rev = st.session_state.get("rev_pick")
+        try:
+            restore_data(get_revisions().get(rev))
+        except KeyError:
+            st.session_state.form_notice = ("warning", "No saved data found. Please save first.")
+            return
+        except (OSError, ValueError) as e:
+            st.session_state.form_notice = (
+                "error", f"Revision #{rev} was saved with an item file that is gone or has changed: {e}")
+            return
+        st.session_state.form_notice = ("success", f"Revision #{rev} loaded!")
+
+    history = get_revisions().history()
+    revs = {r["id"]: r for r in history}
+
+    def rev_label(rev) -> str:
+        r = revs[rev]
+        return (f"#{rev} · {r['invoice'] or '(no invoice no.)'} · {r['consignee'] or '—'} · "
+                f"{r['saved'][:16].replace('T', ' ')} UTC · {r['items']} item(s)")
+
+    if st.session_state.get("rev_pick") not in revs:
+        st.session_state.pop("rev_pick", None)
+    b1, b2, b3 = st.columns([1, 1, 4])
+    b1.button("💾 Save Form Data", on_click=save_form)
+    b2.button("📂 Load Saved Data", on_click=load_form, disabled=not revs)
+    b3.selectbox("Revision", list(revs), format_func=rev_label, key="rev_pick",
+                 label_visibility="collapsed", placeholder="No saved revisions yet")
+    notice = st.session_state.pop("form_notice", None)
+    if notice:
+        getattr(st, notice[0])(notice[1])
+
+    if len(revs) > 1:
+        with st.expander("🕘 Compare revisions"):
+            r1, r2 = st.columns(2)
+            old = r1.selectbox("From", list(revs), index=1, format_func=rev_label, key="rev_old")
+            new = r2.selectbox("To", list(revs), index=0, format_func=rev_label, key="rev_new")
+            change = get_revisions().diff(old, new)
+            if change.empty:
+                st.info("These revisions are identical.")
+            else:
+                if change.fields:
+                    st.markdown("**Changed fields**")
+                    st.dataframe(pd.DataFrame(
+                        [(name, str(a), str(b)) for name, (a, b) in change.fields.items()],
+                        columns=["Field", "Before", "After"]), hide_index=True, use_container_width=True)
+                if change.edited:
+                    st.markdown(f"**Edited items** ({len(change.edited)})")
+                    st.dataframe(pd.DataFrame(
+                        [(i, j, col, str(a), str(b))
+                         for i, j, cols in change.edited for col, (a, b) in cols.items()],
+                        columns=["Row (before)", "Row (after)", "Column", "Before", "After"]),
+                        hide_index=True, use_container_width=True)
+                if change.reordered:
+                    st.markdown("**Item order changed**")
+                for title, rows in [("Added items", change.added), ("Removed items", change.removed)]:
+                    if rows:
+                        st.markdown(f"**{title}** ({len(rows)})")
+                        st.dataframe(pd.DataFrame([dict(row, row=n) for n, row in rows]),
+                                     hide_index=True, use_container_width=True)
+                labels_by_key = {key: label for key, label, _, _ in DOC_REGISTRY}
+                docs = affected_documents(change, list(labels_by_key), HS_AGGREGATE_DEFAULT)
+                st.caption("Documents affected: "
+                           + (", ".join(labels_by_key[k] for k in docs) or "none"))
+
+    # — Templates —————————————————————————————————————————————
+    # A repeat order starts from a template: parties, terms and items carry over,
+    # the invoice number and date do not. Clones share the template's item table.
+    def save_template():
+        commit_items()
+        name = st.session_state.get("tpl_name", "").strip()
+        if not name:
+            st.session_state.form_notice = ("warning", "Enter a template name first.")
+            return
+        get_revisions().save_template(name, collect_data())
+        st.session_state.tpl_pick = name
+        st.session_state.form_notice = ("success", f"Template “{name}” saved.")
+
+    def new_from_template():
+        name = st.session_state.get("tpl_pick")
+        try:
+            d = get_revisions().clone(
+                name, {"shipment": {"invoiceNumber": "", "invoiceDate": str(date.today())}})
+        except KeyError:
+            st.session_state.form_notice = ("warning", "No such template.")
+            return
+        except (OSError, ValueError) as e:
+            st.session_state.form_notice = (
+                "error", f"Template “{name}” uses an item file that is gone or has changed: {e}")
+            return
+        restore_data(d)
+        st.session_state.form_notice = (
+            "success", f"New invoice started from template “{name}”. Enter its invoice number.")
+
+    with st.expander("📑 Templates"):
+        templates = {t["name"]: t for t in get_revisions().templates()}
+        if st.session_state.get("tpl_pick") not in templates:
+            st.session_state.pop("tpl_pick", None)
+        t1, t2 = st.columns([4, 1])
+        t1.text_input("Template name", key="tpl_name", placeholder="e.g. Acme monthly order")
+        t2.button("📌 Save as Template", on_click=save_template)
+        t3, t4 = st.columns([4, 1])
+        t3.selectbox("Template", list(templates), key="tpl_pick",
+                     placeholder="No templates yet",
+                     format_func=lambda n: (f"{n} · {templates[n]['consignee'] or '—'} · "
+                                            f"{templates[n]['items']} item(s)"))
+        t4.button("🆕 New Invoice from Template", on_click=new_from_template,
+                  disabled=not templates)
 
     st.info("➡️ Switch to the **Generate Documents** tab when ready.")
 
@@ -1100,53 +625,107 @@ with tab2:
     for i, (key, label, _, default) in enumerate(DOC_REGISTRY):
         selected[key] = cols[i % 3].checkbox(label, value=default, key=f"doc_{key}")
 
+    doc_labels = {key: label for key, label, _, _ in DOC_REGISTRY}
+    aggregate = st.multiselect(
+        "Group items by HS code in",
+        list(doc_labels), default=HS_AGGREGATE_DEFAULT,
+        format_func=doc_labels.get, key="hs_aggregate",
+        help="These documents list one row per HS code and unit with summed quantities "
+             "and values, instead of one row per item.",
+    )
+
+    compact = st.checkbox(
+        "🗜️ Compact output", key="compact_output",
+        help="Moves repeated inline styles into classes and strips whitespace; "
+             "also offers precompressed downloads.",
+    )
+
     st.divider()
 
     if st.button("🚀 Generate Selected Documents", type="primary", use_container_width=True):
         data = collect_data()
+        keys = [key for key, *_ in DOC_REGISTRY if selected.get(key)]
 
         # Validation
-        if not data["exporter"]["name"] or not data["consignee"]["name"] or not data["shipment"]["invoiceNumber"]:
-            st.error("Please fill in required fields: Exporter Name, Consignee Name, and Invoice Number.")
-            st.stop()
-        if not data["items"]:
-            st.error("Please add at least one item in the Master Data tab.")
+        report = validate(data, docs=keys)
+        for issue in report.warnings:
+            st.warning(issue.message)
+        if not report.ok:
+            st.error("Please fix the following in the Master Data tab:\n\n"
+                     + "\n".join(f"- {issue.message}" for issue in report.errors))
             st.stop()
 
-        # Build combined HTML
-        docs_html = ""
-        first = True
-        for key, label, gen_fn, _ in DOC_REGISTRY:
-            if selected.get(key):
-                if not first:
-                    docs_html += '<hr class="page-divider">'
-                docs_html += gen_fn(data)
-                first = False
+        # Build combined HTML; after an earlier generation only the documents the
+        # changes affect are rendered again
+        previous = get_artifacts().get_object(st.session_state.generated_data_ref)
+        changed = keys
+        if previous is not None:
+            before = set((st.session_state.generated_meta or {}).get("aggregate", ()))
+            changed = affected_documents(diff_data(previous, data), keys, aggregate)
+            changed += [k for k in keys if k not in changed and (k in aggregate) != (k in before)]
+        docs_html = (render_documents(data, keys, aggregate, get_store(), previous, changed)
+                     if keys else "")
 
         if not docs_html:
             st.warning("No documents selected.")
         else:
-            st.session_state.generated_html = build_full_html(docs_html)
-            st.session_state.generated_data = data
+            recon = reconcile(data, keys, docs_html)
+            if not recon.ok:
+                st.error("These documents disagree with the Master Data — do not file them:\n\n"
+                         + "\n".join(f"- {doc_labels.get(m.document, m.document)}: {m.figure} reads "
+                                      f"{m.found or 'nothing'!r}, expected {m.expected!r}"
+                                      for m in recon.mismatches))
+            artifacts = get_artifacts()
+            artifacts.drop(st.session_state.generated_ref, st.session_state.generated_data_ref,
+                           *(st.session_state.generated_packed or {}).values())
+            full_html = build_full_html(docs_html, compact=compact).encode()
+            st.session_state.generated_ref = artifacts.put(full_html)
+            st.session_state.generated_packed = (
+                {enc: artifacts.put(compress(full_html, enc)) for enc in ENCODINGS}
+                if compact else None
+            )
+            st.session_state.generated_data_ref = artifacts.put_object(data)
+            st.session_state.generated_meta = {
+                "invoiceNumber": data["shipment"].get("invoiceNumber", ""),
+                "exporter":      data["exporter"].get("name", ""),
+                "consignee":     data["consignee"].get("name", ""),
+                "aggregate":     list(aggregate),
+            }
+            get_index().add([index_record(data, keys, source="app")])
+            get_analytics().record([shipment_facts(data)])
             st.success(f"Generated {sum(selected.values())} document(s) successfully!")
+            if previous is not None:
+                st.caption(f"Rendered {len(changed)} of {len(keys)} document(s) again; the others "
+                           "are unchanged since the last generation.")
 
     # ── Preview & export ─────────────────────────────────────
-    if st.session_state.generated_html:
-        data = st.session_state.get("generated_data", {})
+    html = get_artifacts().read(st.session_state.generated_ref)
+    if st.session_state.generated_ref and html is None:
+        st.session_state.generated_ref = st.session_state.generated_data_ref = ""
+        st.session_state.generated_packed = None
+        st.info("The generated documents have expired. Please generate them again.")
+    if html is not None:
+        artifacts = get_artifacts()
+        data_ref = st.session_state.generated_data_ref
+        meta = st.session_state.generated_meta or {}
 
         # Action buttons row
-        col_dl1, col_dl2, col_email = st.columns(3)
+        col_dl1, col_dl2, col_xl, col_email = st.columns(4)
 
+        # Downloads are read from the artifact cache only when clicked
         col_dl1.download_button(
             "⬇️ Download as HTML",
-            data=st.session_state.generated_html,
+            data=artifacts.reader(st.session_state.generated_ref),
             file_name="export-documents.html",
             mime="text/html",
             use_container_width=True,
         )
 
-        if data:
-            csv_bytes = export_csv(data).encode()
+        if data_ref:
+            def csv_bytes(ref=data_ref) -> bytes:
+                data = artifacts.get_object(ref)
+                return export_csv(data).encode() if data else b""
+
             col_dl2.download_button(
                 "📊 Download as CSV",
                 data=csv_bytes,
@@ -1155,9 +734,22 @@ with tab2:
                 use_container_width=True,
             )
 
-            inv_no = data["shipment"].get("invoiceNumber", "")
-            exp_name = data["exporter"].get("name", "")
-            con_name = data["consignee"].get("name", "")
+            def xlsx_bytes(ref=data_ref) -> bytes:
+                data = artifacts.get_object(ref)
+                return export_xlsx(data) if data else b""
+
+            col_xl.download_button(
+                "📗 Download as XLSX",
+                data=xlsx_bytes,
+                file_name="invoice-packing-list.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                help="Commercial invoice and packing list, one sheet each",
+                use_container_width=True,
+            )
+
+            inv_no = meta.get("invoiceNumber", "")
+            exp_name = meta.get("exporter", "")
+            con_name = meta.get("consignee", "")
             mailto = (
                 f"mailto:?subject=Export Documents - Invoice {inv_no}"
                 f"&body=Dear Partner,%0D%0A%0D%0APlease find the export documents "
@@ -1166,8 +758,120 @@ with tab2:
             )
             col_email.link_button("📧 Email Documents", mailto, use_container_width=True)
 
+        packed = st.session_state.generated_packed or {}
+        if packed:
+            mimes = {"gzip": "application/gzip", "br": "application/x-brotli"}
+            for col, (enc, ref) in zip(st.columns(len(packed) + 1), packed.items()):
+                col.download_button(
+                    f"🗜️ Download as HTML{ENCODINGS[enc]}",
+                    data=artifacts.reader(ref),
+                    file_name=f"export-documents.html{ENCODINGS[enc]}",
+                    mime=mimes[enc],
+                    use_container_width=True,
+                )
+
         st.caption("💡 To print or save as PDF: download the HTML file and open it in a browser, then use **Ctrl+P → Save as PDF**.")
 
         st.divider()
         st.markdown("#### Preview")
-        st.components.v1.html(st.session_state.generated_html, height=900, scrolling=True)
+        st.components.v1.html(html.decode(), height=900, scrolling=True)
+
+
+# ════════════════════════════════════════════════════════════
+# TAB 3 — SEARCH
+# ════════════════════════════════════════════════════════════
+with tab3:
+    st.markdown("### 🔎 Search Generated Documents")
+    st.caption("Every generation is indexed: invoice number, parties, documents, HS codes "
+               "and item descriptions. Scope a word with `consignee:`, `exporter:`, `invoice:`, "
+               "`documents:`, `hs:` or `items:`, e.g. `consignee:acme hs:8471`.")
+
+    q1, q2, q3 = st.columns([3, 1, 1])
+    query = q1.text_input("Search", key="search_query", placeholder="consignee:acme hs:8471")
+    date_from = q2.date_input("Invoice date from", value=None, key="search_from")
+    date_to = q3.date_input("Invoice date to", value=None, key="search_to")
+
+    index = get_index()
+    t0 = time.perf_counter()
+    hits = index.search(query, date_from, date_to)
+    elapsed = (time.perf_counter() - t0) * 1000
+    if hits:
+        frame = pd.DataFrame(hits, columns=SearchIndex.COLUMNS)
+        frame["documents"] = frame["documents"].map(
+            lambda keys: ", ".join(doc_labels.get(k, k) for k in keys.split(",") if k))
+        st.caption(f"{len(hits)} match(es), newest first · {elapsed:.0f} ms")
+        st.dataframe(frame, hide_index=True, use_container_width=True)
+    elif query or date_from or date_to:
+        st.info("No generated documents match.")
+    else:
+        st.info("Nothing has been generated yet.")
+
+
+# ════════════════════════════════════════════════════════════
+# TAB 4 — ANALYTICS
+# ════════════════════════════════════════════════════════════
+with tab4:
+    st.markdown("### 📊 Shipment Analytics")
+    try:
+        base = load_rates().base
+    except (OSError, ValueError, KeyError):
+        base = "base currency"
+    st.caption(f"Totals over every generated shipment, in {base}. Each invoice counts once; "
+               "generating it again replaces its earlier figures.")
+
+    ships, by_hs = load_rollups(get_analytics().version())
+    if ships.empty:
+        st.info("Nothing has been generated yet.")
+    else:
+        months = sorted(ships["month"].unique())
+        a1, a2 = st.columns([2, 3])
+        first, last = (a1.select_slider("Months", options=months, value=(months[0], months[-1]),
+                                        key="an_months")
+                       if len(months) > 1 else (months[0], months[0]))
+        consignees = a2.multiselect("Consignees", sorted(ships["consignee"].unique()),
+                                    key="an_consignees")
+
+        def _pick(frame):
+            keep = frame["month"].between(first, last)
+            if consignees:
+                keep &= frame["consignee"].isin(consignees)
+            return frame[keep]
+
+        ships, by_hs = _pick(ships), _pick(by_hs)
+        m1, m2, m3 = st.columns(3)
+        m1.metric("Shipments", f"{int(ships['shipments'].sum()):,}")
+        m2.metric(f"Value ({base})", f"{ships['value_base'].sum():,.2f}")
+        m3.metric("Item lines", f"{int(by_hs['lines'].sum()):,}")
+
+        c1, c2 = st.columns(2)
+        with c1:
+            st.markdown("**Value by month**")
+            st.bar_chart(ships.groupby("month")["value_base"].sum())
+            st.markdown("**Top consignees**")
+            st.bar_chart(ships.groupby("consignee")["value_base"].sum().nlargest(15))
+        with c2:
+            st.markdown("**Value by HS chapter**")
+            chapter = by_hs["hs"].str.replace(r"\D", "", regex=True).str[:2].replace("", "—")
+            st.bar_chart(by_hs.groupby(chapter)["value_base"].sum())
+            st.markdown("**Port pairs**")
+            lanes = (ships.groupby(["port_loading", "port_discharge"], as_index=False)
+                     [["shipments", "value_base"]].sum()
+                     .sort_values("value_base", ascending=False))
+            st.dataframe(lanes, hide_index=True, use_container_width=True)
+
+        st.markdown("#### Drill-down")
+        d1, d2 = st.columns(2)
+        who = d1.selectbox("Consignee → HS codes", sorted(by_hs["consignee"].unique()),
+                           index=None, key="an_drill_consignee")
+        if who:
+            d1.dataframe(by_hs[by_hs["consignee"] == who]
+                         .groupby(["hs", "unit"], as_index=False)[["qty", "value_base", "lines"]].sum()
+                         .sort_values("value_base", ascending=False),
+                         hide_index=True, use_container_width=True)
+        code = d2.selectbox("HS code → consignees by month", sorted(by_hs["hs"].unique()),
+                            index=None, key="an_drill_hs")
+        if code:
+            d2.dataframe(by_hs[by_hs["hs"] == code]
+                         .pivot_table(index="consignee", columns="month", values="value_base",
+                                      aggfunc="sum", fill_value=0),
+                         use_container_width=True)
@@ -0,0 +1,102 @@
+"""Disk-backed artifact cache
+Generated documents, the data they were built from and saved form snapshots
+are spilled to files under DATA_DIR/artifacts; sessions keep only the short
+handle strings. Artifacts expire after a TTL (refreshed on every read) and
+the least recently used are evicted once the directory passes a size cap.
+"""
+
+import os
+import pickle
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from store import _write_atomic
+
+_HANDLE = re.compile(r"^[0-9a-f]{32}$")
+
+
+class ArtifactCache:
+    # Expired files are swept at most this often (seconds)
+    SWEEP_EVERY = 60
+
+    def __init__(self, root, ttl: float, max_bytes: int):
+        self.root = Path(root)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+
+    def path(self, handle: str) -> Path:
+        if not _HANDLE.match(handle or ""):
+            raise ValueError(f"invalid artifact handle {handle!r}")
+        return self.root / handle[:2] / handle
+
+    # — Write ————————————————————————————————————————————————
+    def put(self, data: bytes) -> str:
+        handle = uuid.uuid4().hex
+        _write_atomic(self.path(handle), data)
+        self.sweep()
+        return handle
+
+    def put_object(self, obj) -> str:
+        return self.put(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def drop(self, *handles):
+        for handle in handles:
+            if handle:
+                self.path(handle).unlink(missing_ok=True)
+
+    # — Read —————————————————————————————————————————————————
+    def read(self, handle: str):
+        """Artifact bytes, or None once it has expired or been evicted."""
+        if not handle:
+            return None
+        path = self.path(handle)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return data
+
+    def get_object(self, handle: str):
+        """Unpickled artifact, or None once it has expired — or once an item file
+        it refers to has been removed or changed."""
+        data = self.read(handle)
+        if data is None:
+            return None
+        try:
+            return pickle.loads(data)
+        except (OSError, ValueError):
+            return None
+
+    def reader(self, handle: str):
+        """Zero-argument callable returning the artifact, for deferred downloads."""
+        return lambda: self.read(handle) or b""
+
+    # — Eviction —————————————————————————————————————————————
+    def sweep(self, force: bool = False):
+        now = time.time()
+        with self._lock:
+            if not force and now - self._last_sweep < self.SWEEP_EVERY:
+                return
+            self._last_sweep = now
+        live = []
+        for p in self.root.glob("*/*"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            if now - st.st_mtime > self.ttl:
+                p.unlink(missing_ok=True)
+            else:
+                live.append((st.st_mtime, st.st_size, p))
+        size = sum(s for _, s, _ in live)
+        for _, nbytes, p in sorted(live):
+            if size <= self.max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            size -= nbytes
@@ -0,0 +1,91 @@
+"""Barcodes for document identifiers
+Code128 symbols are drawn natively; QR codes use the optional `segno`
+package and are unavailable without it. Both come out as inline SVG, and
+each is memoized by value, so the documents of one shipment (and every
+later render of them) share one drawing per identifier.
+"""
+
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+try:
+    import segno
+except ImportError:
+    segno = None
+
+# Bar/space module widths of Code128 symbols 0-106 (103-105 are the start codes)
+_PATTERNS = (
+    "212222 222122 222221 121223 121322 131222 122213 122312 132212 221213 "
+    "221312 231212 112232 122132 122231 113222 123122 123221 223211 221132 "
+    "221231 213212 223112 312131 311222 321122 321221 312212 322112 322211 "
+    "212123 212321 232121 111323 131123 131321 112313 132113 132311 211313 "
+    "231113 231311 112133 112331 132131 113123 113321 133121 313121 211331 "
+    "231131 213113 213311 213131 311123 311321 331121 312113 312311 332111 "
+    "314111 221411 431111 111224 111422 121124 121421 141122 141221 112214 "
+    "112412 122114 122411 142112 142211 241211 221114 413111 241112 134111 "
+    "111242 121142 121241 114212 124112 124211 411212 421112 421211 212141 "
+    "214121 412121 111143 111341 131141 114113 114311 411113 411311 113141 "
+    "114131 311141 411131 211412 211214 211232"
+).split()
+_STOP = "2331112"
+_START_B, _START_C, _CODE_B, _CODE_C = 104, 105, 100, 99
+
+# Quiet zone on either side of the symbol, in modules
+_QUIET = 10
+
+
+def _code128_values(value: str) -> list:
+    """Symbol values (start code through check digit) for value.
+
+    Runs of four or more digits are packed two per symbol in code set C;
+    everything else uses code set B.
+    """
+    if not value or any(not 32 <= ord(ch) < 127 for ch in value):
+        raise ValueError(f"Code128 cannot encode {value!r}")
+    codes, i, cset = [], 0, None
+    while i < len(value):
+        run = 0
+        while i + run < len(value) and value[i + run].isdigit():
+            run += 1
+        if run >= 4 and run % 2 == 0:
+            if cset != "C":
+                codes.append(_START_C if cset is None else _CODE_C)
+                cset = "C"
+            codes += [int(value[j:j + 2]) for j in range(i, i + run, 2)]
+            i += run
+            continue
+        # Other characters, and the first digit of an odd run, use code set B
+        if cset != "B":
+            codes.append(_START_B if cset is None else _CODE_B)
+            cset = "B"
+        codes.append(ord(value[i]) - 32)
+        i += 1
+    check = (codes[0] + sum(pos * c for pos, c in enumerate(codes[1:], 1))) % 103
+    return codes + [check]
+
+
+@lru_cache(maxsize=2048)
+def code128_svg(value: str, height: int = 40, module: float = 1.4) -> str:
+    """Inline SVG of a Code128 barcode with the text printed beneath it."""
+    widths = "".join(_PATTERNS[c] for c in _code128_values(value)) + _STOP
+    x, bars = _QUIET, []
+    for n, w in enumerate(widths):
+        w = int(w)
+        if n % 2 == 0:
+            bars.append(f'<rect x="{x}" width="{w}" height="{height}"/>')
+        x += w
+    total = x + _QUIET
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" class="barcode" role="img" '
+            f'aria-label="{escape(value)}" width="{total * module:g}" height="{(height + 14) * module:g}" '
+            f'viewBox="0 0 {total} {height + 14}" shape-rendering="crispEdges">'
+            f'<rect width="{total}" height="{height + 14}" fill="#fff"/><g fill="#000">{"".join(bars)}</g>'
+            f'<text x="{total / 2:g}" y="{height + 11}" text-anchor="middle" '
+            f'font-family="monospace" font-size="10">{escape(value)}</text></svg>')
+
+
+@lru_cache(maxsize=512)
+def qr_svg(value: str, scale: int = 3) -> str:
+    """Inline SVG of a QR code, or "" when segno is not installed."""
+    if segno is None:
+        return ""
+    return segno.make(value, error="m").svg_inline(scale=scale)
@@ -0,0 +1,74 @@
+"""Compact output mode
+Hoists repeated inline style="" attributes into generated classes, minifies
+CSS and markup whitespace, and precompresses the result for download.
+gzip is always available; brotli is used when the optional `brotli` package
+is installed.
+"""
+
+import gzip
+import re
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENCODINGS = {"gzip": ".gz"}
+if brotli is not None:
+    ENCODINGS["br"] = ".br"
+
+_TAG_WITH_STYLE = re.compile(r'<[a-zA-Z][^>]*\sstyle="[^"]*"[^>]*>')
+_STYLE_ATTR     = re.compile(r'\sstyle="([^"]*)"')
+_CLASS_ATTR     = re.compile(r'\sclass="([^"]*)"')
+
+
+def _norm_style(style: str) -> str:
+    decls = [d.strip() for d in style.split(";") if d.strip()]
+    return ";".join(re.sub(r"\s*:\s*", ":", d) for d in decls)
+
+
+def hoist_styles(html: str, prefix: str = "s") -> tuple:
+    """(html, css): every distinct inline style becomes one class rule.
+
+    The rules must be emitted after the base stylesheet so that they win
+    against single-class rules, as the inline styles did.
+    """
+    classes = {}
+
+    def repl(m):
+        tag = m.group(0)
+        style = _norm_style(_STYLE_ATTR.search(tag).group(1))
+        tag = _STYLE_ATTR.sub("", tag, count=1)
+        if not style:
+            return tag
+        name = classes.setdefault(style, f"{prefix}{len(classes)}")
+        if _CLASS_ATTR.search(tag):
+            return _CLASS_ATTR.sub(lambda c: f' class="{c.group(1)} {name}"', tag, count=1)
+        return tag[:-1].rstrip("/").rstrip() + f' class="{name}"' + (" />" if tag.endswith("/>") else ">")
+
+    html = _TAG_WITH_STYLE.sub(repl, html)
+    css = "".join(f".{name}{{{style}}}" for style, name in classes.items())
+    return html, css
+
+
+def minify_css(css: str) -> str:
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};:,>])\s*", r"\1", css)
+    return css.replace(";}", "}").strip()
+
+
+def minify_html(html: str) -> str:
+    # Indentation between tags (whitespace containing a newline) is dropped;
+    # any other run of whitespace is kept as a single space.
+    html = re.sub(r">\s*\n\s*<", "><", html)
+    html = re.sub(r"\s*\n\s*", " ", html)
+    return re.sub(r"[ \t]{2,}", " ", html).strip()
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(data, quality=11)
+    raise ValueError(f"unsupported encoding {encoding!r}")
@@ -0,0 +1,37 @@
+"""Shared settings for ExportDocGen
+Everything the app keeps on local disk lives under DATA_DIR.
+"""
+
+import os
+from pathlib import Path
+
+DATA_DIR = Path(os.environ.get("EXPORTDOCGEN_HOME", ".exportdocgen"))
+
+# Output store (rendered fragments and full documents)
+STORE_DIR       = DATA_DIR / "store"
+STORE_MAX_BYTES = int(os.environ.get("EXPORTDOCGEN_STORE_MB", "256")) * 1024 * 1024
+
+# Exchange-rate table used for reporting-currency conversion
+RATES_FILE = Path(os.environ.get("EXPORTDOCGEN_RATES", Path(__file__).parent / "rates.json"))
+
+# Per-session artifacts (generated HTML and the data it was built from)
+ARTIFACT_DIR       = DATA_DIR / "artifacts"
+ARTIFACT_TTL       = float(os.environ.get("EXPORTDOCGEN_ARTIFACT_TTL_H", "12")) * 3600
+ARTIFACT_MAX_BYTES = int(os.environ.get("EXPORTDOCGEN_ARTIFACT_MB", "1024")) * 1024 * 1024
+
+# Full-text index of generated documents
+SEARCH_DB = DATA_DIR / "search.sqlite3"
+
+# Shipment analytics rollups
+ANALYTICS_DB = DATA_DIR / "analytics.sqlite3"
+
+# Saved shipment revisions
+REVISIONS_DB = DATA_DIR / "revisions.sqlite3"
+
+# CSV item files converted to memory-mapped columns (itemfile.py); safe to clear,
+# a file is converted again when next opened
+ITEMS_DIR = DATA_DIR / "items"
+
+# Watch-folder daemon (watcher.py)
+WATCH_SETTLE  = float(os.environ.get("EXPORTDOCGEN_WATCH_SETTLE", "2"))
+WATCH_WORKERS = int(os.environ.get("EXPORTDOCGEN_WATCH_WORKERS", os.cpu_count() or 2))
@@ -0,0 +1,1078 @@
+"""Export document templates
+Every generator takes the shipment dict built by the app (exporter,
+consignee, shipment, items) and returns one document as an HTML fragment.
+Nothing here depends on Streamlit, so the same rendering path serves the
+web app and the watch-folder daemon.
+"""
+
+import hashlib
+import sys
+from functools import lru_cache
+from pathlib import Path
+
+import barcodes
+import i18n
+import model
+import packing
+import rates
+from compact import hoist_styles, minify_css, minify_html
+from i18n import labels
+from model import ItemTable
+from rates import convert
+from store import ContentStore, key_for
+
+
+# ── CSS for generated document previews ──────────────────────────────────────
+DOC_CSS = """
+<style>
+  body { font-family:'Courier New',monospace; background:#f0f0f0; padding:10px; }
+  .document-preview {
+    background:white; color:black; padding:40px; border-radius:4px;
+    box-shadow:0 2px 8px rgba(0,0,0,.15); max-width:800px; margin:20px auto;
+    font-family:'Courier New',monospace; font-size:13px; line-height:1.5;
+  }
+  .doc-title {
+    font-size:22px; font-weight:bold; text-align:center; margin-bottom:20px;
+    text-transform:uppercase; border-bottom:2px solid #000; padding-bottom:10px;
+  }
+  .doc-subtitle { text-align:center; font-style:italic; margin-bottom:16px; color:#555; }
+  .doc-row { display:flex; justify-content:space-between; margin-bottom:8px;
+             flex-wrap:wrap; gap:8px; }
+  .doc-label { font-weight:bold; min-width:160px; display:inline-block; }
+  .doc-section { margin:15px 0; padding:12px 15px; background:#f8f8f8;
+                 border-left:3px solid #aaa; }
+  .doc-section-title { font-weight:bold; font-size:13px; margin-bottom:8px;
+                       text-decoration:underline; }
+  table { width:100%; border-collapse:collapse; margin:15px 0; }
+  th,td { border:1px solid #444; padding:6px 9px; text-align:left; font-size:12px; }
+  th { background:#e0e0e0; font-weight:bold; }
+  tfoot th { background:#f0f0f0; }
+  .doc-footer { margin-top:25px; border-top:2px solid #333; padding-top:15px; }
+  .signature-line {
+    display:inline-block; margin-top:40px; border-top:1px solid #333;
+    width:200px; text-align:center; padding-top:6px; font-size:11px;
+  }
+  .sigs { display:flex; justify-content:space-between; margin-top:30px; }
+  .page-divider { border:none; border-top:4px dashed #ccc; margin:30px 0; }
+  .doc-barcode { text-align:right; margin:-4px 0 12px; }
+  @media print {
+    body { background:white; padding:0; }
+    .document-preview { box-shadow:none; margin:0; padding:20px; }
+    .page-divider { page-break-after:always; border:none; }
+  }
+</style>
+"""
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+def na(val):
+    return val if val else "N/A"
+
+
+def number_to_words(num: float) -> str:
+    if num == 0:
+        return "Zero"
+    ones  = ["","One","Two","Three","Four","Five","Six","Seven","Eight","Nine"]
+    teens = ["Ten","Eleven","Twelve","Thirteen","Fourteen","Fifteen",
+             "Sixteen","Seventeen","Eighteen","Nineteen"]
+    tens_w = ["","","Twenty","Thirty","Forty","Fifty",
+               "Sixty","Seventy","Eighty","Ninety"]
+    thousands = ["","Thousand","Million","Billion"]
+
+    def conv_h(n):
+        n = int(n)
+        if n == 0: return ""
+        if n < 10: return ones[n]
+        if n < 20: return teens[n - 10]
+        if n < 100:
+            return tens_w[n // 10] + (" " + ones[n % 10] if ones[n % 10] else "")
+        tail = conv_h(n % 100)
+        return ones[n // 100] + " Hundred" + (" " + tail if tail else "")
+
+    num, parts, i = int(num), [], 0
+    while num > 0:
+        if num % 1000:
+            chunk = conv_h(num % 1000)
+            if thousands[i]:
+                chunk += " " + thousands[i]
+            parts.insert(0, chunk)
+        num //= 1000
+        i += 1
+    return " ".join(parts).strip()
+
+
+# ── Fragment cache ────────────────────────────────────────────────────────────
+# A batch has one exporter and a few hundred consignees between thousands of
+# documents, and some sections never change but for the label language. Such
+# fragments are rendered once per process and reused, keyed by the values they
+# are rendered from; the least recently used are evicted first.
+FRAGMENT_CACHE_SIZE = 1024
+
+EXP_LINES = (("address", ""), ("city", ""), ("contact", "Tel: "),
+             ("email", "Email: "), ("iec", "IEC: "), ("gst", "GST: "))
+CON_LINES = (("address", ""), ("city", ""), ("contact", "Tel: "), ("email", "Email: "))
+
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def _party_block(name: str, lines: tuple) -> str:
+    # lines: (label, value) pairs; empty values are left out
+    return "\n".join([f"<div><strong>{name}</strong></div>",
+                      *(f"<div>{label}{value}</div>" for label, value in lines if value)])
+
+
+def exp_block(exp: dict) -> str:
+    return _party_block(exp["name"], tuple((label, exp.get(f)) for f, label in EXP_LINES))
+
+
+def con_block(con: dict) -> str:
+    return _party_block(con["name"], tuple((label, con.get(f)) for f, label in CON_LINES))
+
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def insurance_coverage(lang: str) -> str:
+    t = labels(lang)
+    return f"""<div class="doc-section">
+    <div class="doc-section-title">{t['coverage']}</div>
+    <div>• All risks of physical loss or damage from external causes</div>
+    <div>• War, strikes, riots and civil commotion risks</div>
+    <div>• Total loss and general average</div>
+  </div>"""
+
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def _phytosanitary_parts(lang: str) -> tuple:
+    # The fixed text either side of the inspection date, so shipments on
+    # different dates share one cached entry per language
+    t = labels(lang)
+    return tuple(f"""<div class="doc-section">
+    <div class="doc-section-title">{t['phytosanitary_declaration']}</div>
+    <div>{t['phytosanitary_declaration_text']}</div>
+  </div>
+  <div class="doc-section">
+    <div class="doc-section-title">{t['treatment']}</div>
+    <div>✓ Inspection conducted on: \0</div>
+    <div>✓ No quarantine pests detected</div>
+    <div>✓ Meets phytosanitary import requirements</div>
+  </div>""".split("\0"))
+
+
+def phytosanitary_checklist(lang: str, inspected: str) -> str:
+    """The declaration and treatment checklist of a phytosanitary certificate."""
+    head, tail = _phytosanitary_parts(lang)
+    return f"{head}{inspected}{tail}"
+
+
+_FRAGMENTS = (_party_block, insurance_coverage, _phytosanitary_parts)
+
+
+def fragment_cache_info() -> dict:
+    """Hits, misses and cached fragments of this process, over all fragment kinds."""
+    infos = [fn.cache_info() for fn in _FRAGMENTS]
+    return {"hits": sum(i.hits for i in infos), "misses": sum(i.misses for i in infos),
+            "size": sum(i.currsize for i in infos)}
+
+
+def barcode(value: str, qr: str = "") -> str:
+    """Scannable block for a document identifier: a QR code of `qr` when
+    given and segno is installed, otherwise a Code128 of `value`."""
+    svg = barcodes.qr_svg(qr) if qr else ""
+    try:
+        svg = svg or barcodes.code128_svg(value)
+    except ValueError:
+        return ""
+    return f'<div class="doc-barcode">{svg}</div>'
+
+
+def awb_number(invoice_number: str) -> str:
+    """Eight-digit AWB serial, stable for an invoice so its barcode is too."""
+    return str(int(hashlib.sha256(invoice_number.encode()).hexdigest(), 16) % 90000000 + 10000000)
+
+
+def reporting_totals(d: dict):
+    """Item totals converted to the reporting currency, or None when none is set."""
+    ship = d["shipment"]
+    if not ship.get("reportingCurrency") or not ship.get("reportingRate"):
+        return None
+    return convert(ItemTable.from_records(d["items"]).total, ship["reportingRate"])
+
+
+def reporting_note(d: dict, rep) -> str:
+    # The reporting total is the sum of the rounded line amounts (rep), so it
+    # adds up with the column printed above it
+    ship = d["shipment"]
+    rcur, rate = ship["reportingCurrency"], ship["reportingRate"]
+    return (f"{rcur} {rep.sum():.2f} at 1 {ship['currency']} = {rate:.4f} {rcur} "
+            f"(rate table {ship['rateVersion']})")
+
+
+# ── Document generators ───────────────────────────────────────────────────────
+
+def gen_commercial_invoice(d):
+    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
+    t = labels(con.get("language"))
+    total = sum(it["total"] for it in items)
+    cur   = ship["currency"]
+    rep   = reporting_totals(d)
+    extra = [f"<td>{v:.2f}</td>" for v in rep] if rep is not None else [""] * len(items)
+    rows  = "".join(
+        f"<tr><td>{i}</td><td>{it['desc']}</td><td>{it['hs']}</td>"
+        f"<td>{it['qty']} {it['unit']}</td><td>{it['price']}</td><td>{it['total']}</td>{x}</tr>"
+        for i, (it, x) in enumerate(zip(items, extra), 1)
+    )
+    rep_th   = f"<th>{t['amount']} ({ship['reportingCurrency']})</th>" if rep is not None else ""
+    rep_foot = (f"<th>{ship['reportingCurrency']} {rep.sum():.2f}</th>"
+                if rep is not None else "")
+    rep_note = (f'<div style="margin-top:15px"><strong>{t["reporting_currency"]}:</strong> '
+                f'{reporting_note(d, rep)}</div>' if rep is not None else "")
+    return f"""
+<div class="document-preview">
+  <div class="doc-title">{t['commercial_invoice']}</div>
+  <div class="doc-section"><div class="doc-section-title">{t['exporter_shipper']}</div>{exp_block(exp)}</div>
+  <div class="doc-section"><div class="doc-section-title">{t['consignee_buyer']}</div>{con_block(con)}</div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['invoice_no']}:</span> {ship['invoiceNumber']}</div>
+    <div><span class="doc-label">{t['date']}:</span> {ship['invoiceDate']}</div>
+  </div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['po_contract_no']}:</span> {na(ship.get('poNumber'))}</div>
+    <div><span class="doc-label">{t['incoterms']}:</span> {na(ship.get('incoterms'))}</div>
+  </div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['port_of_loading']}:</span> {na(ship.get('portLoading'))}</div>
+    <div><span class="doc-label">{t['port_of_discharge']}:</span> {na(ship.get('portDischarge'))}</div>
+  </div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['country_of_origin']}:</span> {na(ship.get('countryOrigin'))}</div>
+    <div><span class="doc-label">{t['payment_terms']}:</span> {na(ship.get('paymentTerms'))}</div>
+  </div>
+  <table>
+    <thead><tr><th>{t['num']}</th><th>{t['description_of_goods']}</th><th>{t['hs_code']}</th>
+      <th>{t['quantity']}</th><th>{t['unit_price']}</th><th>{t['amount']} ({cur})</th>{rep_th}</tr></thead>
+    <tbody>{rows}</tbody>
+    <tfoot><tr><th colspan="5" style="text-align:right">{t['total']}:</th>
+      <th>{cur} {total:.2f}</th>{rep_foot}</tr></tfoot>
+  </table>
+  <div class="doc-footer">
+    <div><strong>{t['total_in_words']}:</strong> {number_to_words(total)} {cur} {t['only']}</div>{rep_note}
+    <div style="margin-top:15px"><strong>{t['declaration']}:</strong>
+      {t['invoice_declaration_text']}</div>
+    <div class="signature-line">{t['authorized_signature']}</div>
+  </div>
+</div>"""
+
+
+def gen_packing_list(d):
+    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
+    t = labels(con.get("language"))
+    # Line weights, when the items carry unit weights
+    _, net, gross, _ = packing.sums(items)
+    weighed = bool(net or gross)
+    rows = "".join(
+        f"<tr><td>{i}</td><td>{it['desc']}</td><td>{it['qty']} {it['unit']}</td>"
+        f"<td>{na(ship.get('packageType'))}</td><td>{it['hs']}</td>"
+        + (f"<td>{it['qty'] * it['net_wt']:.2f}</td><td>{it['qty'] * it['gross_wt']:.2f}</td>"
+           if weighed else "") + "</tr>"
+        for i, it in enumerate(items, 1)
+    )
+    wt_th   = (f"<th>{t['net_weight']} (KG)</th><th>{t['gross_weight']} (KG)</th>"
+               if weighed else "")
+    wt_foot = (f'<tfoot><tr><th colspan="5" style="text-align:right">{t["total"]}</th>'
+               f"<th>{net:.2f}</th><th>{gross:.2f}</th></tr></tfoot>"
+               if weighed else "")
+    return f"""
+<div class="document-preview">
+  <div class="doc-title">{t['packing_list']}</div>
+  <div class="doc-section"><div class="doc-section-title">{t['exporter_shipper']}</div>{exp_block(exp)}</div>
+  <div class="doc-section"><div class="doc-section-title">{t['consignee']}</div>{con_block(con)}</div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['invoice_no']}:</span> {ship['invoiceNumber']}</div>
+    <div><span class="doc-label">{t['date']}:</span> {ship['invoiceDate']}</div>
+  </div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['vessel_flight']}:</span> {na(ship.get('vesselName'))}</div>
+    <div><span class="doc-label">{t['no_of_packages']}:</span> {na(ship.get('numPackages'))}</div>
+  </div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['gross_weight']}:</span> {na(ship.get('grossWeight'))} KG</div>
+    <div><span class="doc-label">{t['net_weight']}:</span> {na(ship.get('netWeight'))} KG</div>
+  </div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['volume']}:</span> {na(ship.get('volume'))} CBM</div>
+  </div>
+  <table>
+    <thead><tr><th>{t['num']}</th><th>{t['description']}</th><th>{t['quantity']}</th><th>{t['packing_type']}</th><th>{t['hs_code']}</th>{wt_th}</tr></thead>
+    <tbody>{rows}</tbody>{wt_foot}
+  </table>
+  <div class="doc-footer">
+    <div><strong>{t['marks_and_numbers']}:</strong> {con['name']} / {na(ship.get('portDischarge'))}</div>
+    <div class="signature-line">{t['authorized_signature']}</div>
+  </div>
+</div>"""
+
+
+def gen_certificate_of_origin(d):
+    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
+    t = labels(con.get("language"))
+    rows = "".join(
+        f"<tr><td>{i}</td><td>{it['desc']}</td><td>{it['qty']} {it['unit']}</td>"
+        f"<td>{na(ship.get('countryOrigin'))}</td></tr>"
+        for i, it in enumerate(items, 1)
+    )
+    return f"""
+<div class="document-preview">
+  <div class="doc-title">{t['certificate_of_origin']}</div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['certificate_no']}:</span> COO-{ship['invoiceNumber']}</div>
+    <div><span class="doc-label">{t['date']}:</span> {ship['invoiceDate']}</div>
+  </div>
+  {barcode(f"COO-{ship['invoiceNumber']}",
+           qr=f"COO-{ship['invoiceNumber']}|{ship['invoiceDate']}|{exp['name']}|{na(ship.get('countryOrigin'))}")}
+  <div class="doc-section"><div class="doc-section-title">{t['exporter']}</div>{exp_block(exp)}</div>
+  <div class="doc-section"><div class="doc-section-title">{t['consignee']}</div>{con_block(con)}</div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['invoice_no']}:</span> {ship['invoiceNumber']}</div>
+    <div><span class="doc-label">{t['port_of_discharge']}:</span> {na(ship.get('portDischarge'))}</div>
+  </div>
+  <table>
+    <thead><tr><th>{t['num']}</th><th>{t['description_of_goods']}</th><th>{t['quantity']}</th><th>{t['country_of_origin']}</th></tr></thead>
+    <tbody>{rows}</tbody>
+  </table>
+  <div class="doc-footer">
+    <div style="margin-top:15px"><strong>{t['declaration']}:</strong>
+      {t['origin_declaration_text'].format(country=na(ship.get('countryOrigin')))}</div>
+    <div class="sigs">
+      <div class="signature-line">{t['exporters_signature']}</div>
+      <div class="signature-line">{t['chamber_of_commerce_stamp']}</div>
+    </div>
+  </div>
+</div>"""
+
+
+def gen_shipping_bill(d):
+    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
+    t = labels(con.get("language"))
+    total = sum(it["total"] for it in items)
+    cur   = ship["currency"]
+    rep   = reporting_totals(d)
+    extra = [f"<td>{v:.2f}</td>" for v in rep] if rep is not None else [""] * len(items)
+    rows  = "".join(
+        f"<tr><td>{i}</td><td>{it['desc']}</td><td>{it['hs']}</td>"
+        f"<td>{it['qty']} {it['unit']}</td><td>{it['total']}</td>{x}</tr>"
+        for i, (it, x) in enumerate(zip(items, extra), 1)
+    )
+    rep_th  = f"<th>{t['fob_value']} ({ship['reportingCurrency']})</th>" if rep is not None else ""
+    rep_val = f" / {reporting_note(d, rep)}" if rep is not None else ""
+    return f"""
+<div class="document-preview">
+  <div class="doc-title">{t['shipping_bill']}</div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['shipping_bill_no']}:</span> SB-{ship['invoiceNumber']}</div>
+    <div><span class="doc-label">{t['date']}:</span> {ship['invoiceDate']}</div>
+  </div>
+  <div class="doc-section">
+    <div class="doc-section-title">{t['exporter_details']}</div>{exp_block(exp)}
+  </div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['port_of_loading']}:</span> {na(ship.get('portLoading'))}</div>
+    <div><span class="doc-label">{t['port_of_discharge']}:</span> {na(ship.get('portDischarge'))}</div>
+  </div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['country_of_destination']}:</span> {na(con.get('city'))}</div>
+    <div><span class="doc-label">{t['invoice_value']}:</span> {cur} {total:.2f}</div>
+  </div>
+  <table>
+    <thead><tr><th>{t['num']}</th><th>{t['description']}</th><th>{t['hs_code']}</th>
+      <th>{t['quantity']}</th><th>{t['fob_value']} ({cur})</th>{rep_th}</tr></thead>
+    <tbody>{rows}</tbody>
+  </table>
+  <div class="doc-footer">
+    <div><strong>{t['total_fob_value']}:</strong> {cur} {total:.2f}{rep_val}</div>
+    <div class="signature-line">{t['customs_authorized_officer']}</div>
+  </div>
+</div>"""
+
+
+def gen_sli(d):
+    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
+    t = labels(con.get("language"))
+    goods = "".join(f"<div>• {it['qty']} {it['unit']} of {it['desc']}</div>" for it in items)
+    return f"""
+<div class="document-preview">
+  <div class="doc-title">{t['shippers_letter_of_instruction_sli']}</div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['reference_no']}:</span> SLI-{ship['invoiceNumber']}</div>
+    <div><span class="doc-label">{t['date']}:</span> {ship['invoiceDate']}</div>
+  </div>
+  <div class="doc-section">
+    <div class="doc-section-title">{t['to_freight_forwarder_carrier']}</div>
+    <div>Please arrange shipment as per the following instructions:</div>
+  </div>
+  <div class="doc-section"><div class="doc-section-title">{t['shipper']}</div>{exp_block(exp)}</div>
+  <div class="doc-section"><div class="doc-section-title">{t['consignee']}</div>{con_block(con)}</div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['port_of_loading']}:</span> {na(ship.get('portLoading'))}</div>
+    <div><span class="doc-label">{t['port_of_discharge']}:</span> {na(ship.get('portDischarge'))}</div>
+  </div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['vessel_flight']}:</span> {na(ship.get('vesselName'))}</div>
+    <div><span class="doc-label">{t['no_of_packages']}:</span> {na(ship.get('numPackages'))}</div>
+  </div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['gross_weight']}:</span> {na(ship.get('grossWeight'))} KG</div>
+    <div><span class="doc-label">{t['incoterms']}:</span> {na(ship.get('incoterms'))}</div>
+  </div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['volume']}:</span> {na(ship.get('volume'))} CBM</div>
+    <div><span class="doc-label">{t['chargeable_weight']}:</span> {na(ship.get('chargeableWeight') or ship.get('grossWeight'))} KG</div>
+  </div>
+  <div class="doc-section"><div class="doc-section-title">{t['description_of_goods']}</div>{goods}</div>
+  <div class="doc-footer">
+    <div style="margin-top:15px"><strong>{t['special_instructions']}:</strong> Handle with care.
+      Notify consignee upon arrival.</div>
+    <div class="signature-line">{t['shippers_signature']}</div>
+  </div>
+</div>"""
+
+
+def gen_proforma_invoice(d):
+    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
+    t = labels(con.get("language"))
+    total = sum(it["total"] for it in items)
+    cur   = ship["currency"]
+    rows  = "".join(
+        f"<tr><td>{i}</td><td>{it['desc']}</td><td>{it['qty']} {it['unit']}</td>"
+        f"<td>{it['price']}</td><td>{it['total']}</td></tr>"
+        for i, it in enumerate(items, 1)
+    )
+    return f"""
+<div class="document-preview">
+  <div class="doc-title">{t['proforma_invoice']}</div>
+  <div class="doc-subtitle">{t['for_reference_only_not_a_tax_invoice']}</div>
+  <div class="doc-section"><div class="doc-section-title">{t['seller']}</div>{exp_block(exp)}</div>
+  <div class="doc-section"><div class="doc-section-title">{t['buyer']}</div>{con_block(con)}</div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['proforma_invoice_no']}:</span> PI-{ship['invoiceNumber']}</div>
+    <div><span class="doc-label">{t['date']}:</span> {ship['invoiceDate']}</div>
+  </div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['incoterms']}:</span> {na(ship.get('incoterms'))}</div>
+    <div><span class="doc-label">{t['payment_terms']}:</span> {na(ship.get('paymentTerms'))}</div>
+  </div>
+  <table>
+    <thead><tr><th>{t['num']}</th><th>{t['description']}</th><th>{t['quantity']}</th>
+      <th>{t['unit_price']} ({cur})</th><th>{t['amount']} ({cur})</th></tr></thead>
+    <tbody>{rows}</tbody>
+    <tfoot><tr><th colspan="4" style="text-align:right">{t['total']}:</th>
+      <th>{cur} {total:.2f}</th></tr></tfoot>
+  </table>
+  <div class="doc-footer">
+    <div style="margin-top:15px"><strong>{t['validity']}:</strong> This proforma invoice is valid
+      for 30 days from the date of issue.</div>
+    <div style="margin-top:10px"><strong>{t['note']}:</strong> This is a preliminary invoice for
+      quotation purposes only. Final commercial invoice will be issued upon shipment.</div>
+    <div class="signature-line">{t['authorized_signature']}</div>
+  </div>
+</div>"""
+
+
+def gen_bill_of_lading(d):
+    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
+    t = labels(con.get("language"))
+    goods = "".join(f"<div>• {it['qty']} {it['unit']} — {it['desc']}</div>" for it in items)
+    return f"""
+<div class="document-preview">
+  <div class="doc-title">{t['bill_of_lading_b_l']}</div>
+  <div class="doc-subtitle">{t['non_negotiable_copy']}</div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['b_l_no']}:</span> BL-{ship['invoiceNumber']}</div>
+    <div><span class="doc-label">{t['date']}:</span> {ship['invoiceDate']}</div>
+  </div>
+  {barcode(f"BL-{ship['invoiceNumber']}")}
+  <div class="doc-section"><div class="doc-section-title">{t['shipper']}</div>{exp_block(exp)}</div>
+  <div class="doc-section"><div class="doc-section-title">{t['consignee']}</div>{con_block(con)}</div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['vessel']}:</span> {na(ship.get('vesselName'))}</div>
+    <div><span class="doc-label">{t['port_of_loading']}:</span> {na(ship.get('portLoading'))}</div>
+  </div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['port_of_discharge']}:</span> {na(ship.get('portDischarge'))}</div>
+    <div><span class="doc-label">{t['no_of_packages']}:</span> {na(ship.get('numPackages'))}</div>
+  </div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['gross_weight']}:</span> {na(ship.get('grossWeight'))} KG</div>
+    <div><span class="doc-label">{t['net_weight']}:</span> {na(ship.get('netWeight'))} KG</div>
+  </div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['volume']}:</span> {na(ship.get('volume'))} CBM</div>
+  </div>
+  <div class="doc-section"><div class="doc-section-title">{t['description_of_goods']}</div>{goods}</div>
+  <div class="doc-footer">
+    <div><strong>{t['freight_terms']}:</strong> {na(ship.get('incoterms'))}</div>
+    <div><strong>{t['container_type']}:</strong> {na(ship.get('packageType'))}</div>
+    <div class="signature-line">{t['carriers_signature_and_stamp']}</div>
+  </div>
+</div>"""
+
+
+def gen_air_waybill(d):
+    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
+    t = labels(con.get("language"))
+    goods = "".join(f"<div>• {it['qty']} {it['unit']} — {it['desc']}</div>" for it in items)
+    awb_no = awb_number(ship['invoiceNumber'])
+    return f"""
+<div class="document-preview">
+  <div class="doc-title">{t['air_waybill_awb']}</div>
+  <div class="doc-subtitle">{t['non_negotiable']}</div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['awb_no']}:</span> {awb_no}</div>
+    <div><span class="doc-label">{t['date']}:</span> {ship['invoiceDate']}</div>
+  </div>
+  {barcode(awb_no)}
+  <div class="doc-section"><div class="doc-section-title">{t['shipper_consignor']}</div>{exp_block(exp)}</div>
+  <div class="doc-section"><div class="doc-section-title">{t['consignee']}</div>{con_block(con)}</div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['airport_of_departure']}:</span> {na(ship.get('portLoading'))}</div>
+    <div><span class="doc-label">{t['airport_of_destination']}:</span> {na(ship.get('portDischarge'))}</div>
+  </div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['flight']}:</span> {na(ship.get('vesselName'))}</div>
+    <div><span class="doc-label">{t['no_of_pieces']}:</span> {na(ship.get('numPackages'))}</div>
+  </div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['gross_weight']}:</span> {na(ship.get('grossWeight'))} KG</div>
+    <div><span class="doc-label">{t['chargeable_weight']}:</span> {na(ship.get('chargeableWeight') or ship.get('grossWeight'))} KG</div>
+  </div>
+  <div class="doc-section">
+    <div class="doc-section-title">{t['nature_and_quantity_of_goods']}</div>{goods}
+  </div>
+  <div class="doc-footer">
+    <div style="margin-top:15px"><strong>{t['handling_information']}:</strong> Handle with care.</div>
+    <div class="signature-line">{t['airline_agent_signature']}</div>
+  </div>
+</div>"""
+
+
+def gen_insurance_certificate(d):
+    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
+    t = labels(con.get("language"))
+    total = sum(it["total"] for it in items)
+    insured = round(total * 1.1, 2)
+    cur = ship["currency"]
+    goods = "".join(f"<div>• {it['desc']}</div>" for it in items)
+    return f"""
+<div class="document-preview">
+  <div class="doc-title">{t['certificate_of_insurance']}</div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['certificate_no']}:</span> INS-{ship['invoiceNumber']}</div>
+    <div><span class="doc-label">{t['date']}:</span> {ship['invoiceDate']}</div>
+  </div>
+  <div class="doc-section">
+    <div class="doc-section-title">{t['assured_insured']}</div>{con_block(con)}
+  </div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['invoice_no']}:</span> {ship['invoiceNumber']}</div>
+    <div><span class="doc-label">{t['vessel_flight']}:</span> {na(ship.get('vesselName'))}</div>
+  </div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['from']}:</span> {na(ship.get('portLoading'))}</div>
+    <div><span class="doc-label">{t['to']}:</span> {na(ship.get('portDischarge'))}</div>
+  </div>
+  <div class="doc-section"><div class="doc-section-title">{t['description_of_goods']}</div>{goods}</div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['sum_insured']}:</span> {cur} {insured}</div>
+    <div><span class="doc-label">{t['basis']}:</span> 110% of Invoice Value</div>
+  </div>
+  {insurance_coverage(con.get("language"))}
+  <div class="doc-footer">
+    <div style="margin-top:15px"><strong>{t['terms']}:</strong> Institute Cargo Clauses (A)</div>
+    <div class="signature-line">{t['insurance_co_authorized_signature']}</div>
+  </div>
+</div>"""
+
+
+def gen_inspection_certificate(d):
+    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
+    t = labels(con.get("language"))
+    goods = "".join(f"<div>• {it['qty']} {it['unit']} of {it['desc']}</div>" for it in items)
+    return f"""
+<div class="document-preview">
+  <div class="doc-title">{t['inspection_certificate']}</div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['certificate_no']}:</span> IC-{ship['invoiceNumber']}</div>
+    <div><span class="doc-label">{t['date']}:</span> {ship['invoiceDate']}</div>
+  </div>
+  <div class="doc-section"><div class="doc-section-title">{t['exporter']}</div>{exp_block(exp)}</div>
+  <div class="doc-section"><div class="doc-section-title">{t['buyer_consignee']}</div>{con_block(con)}</div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['invoice_no']}:</span> {ship['invoiceNumber']}</div>
+    <div><span class="doc-label">{t['po_no']}:</span> {na(ship.get('poNumber'))}</div>
+  </div>
+  <div class="doc-section">
+    <div class="doc-section-title">{t['description_of_goods_inspected']}</div>{goods}
+  </div>
+  <div class="doc-section">
+    <div class="doc-section-title">{t['inspection_results']}</div>
+    <div>✓ Quality conforms to purchase order specifications</div>
+    <div>✓ Quantity verified and matches shipping documents</div>
+    <div>✓ Packaging is suitable for international transport</div>
+    <div>✓ Goods are in good condition and fit for shipment</div>
+  </div>
+  <div class="doc-footer">
+    <div style="margin-top:15px"><strong>{t['declaration']}:</strong>
+      {t['inspection_declaration_text']}</div>
+    <div class="sigs">
+      <div class="signature-line">{t['inspectors_signature']}</div>
+      <div class="signature-line">{t['company_stamp']}</div>
+    </div>
+  </div>
+</div>"""
+
+
+def gen_phytosanitary(d):
+    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
+    t = labels(con.get("language"))
+    goods = "".join(f"<div>• {it['qty']} {it['unit']} of {it['desc']}</div>" for it in items)
+    return f"""
+<div class="document-preview">
+  <div class="doc-title">{t['phytosanitary_certificate']}</div>
+  <div class="doc-subtitle">{t['plant_protection_organization']}</div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['certificate_no']}:</span> PC-{ship['invoiceNumber']}</div>
+    <div><span class="doc-label">{t['date']}:</span> {ship['invoiceDate']}</div>
+  </div>
+  <div class="doc-section"><div class="doc-section-title">{t['exporter']}</div>{exp_block(exp)}</div>
+  <div class="doc-section"><div class="doc-section-title">{t['consignee']}</div>{con_block(con)}</div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['port_of_entry']}:</span> {na(ship.get('portDischarge'))}</div>
+    <div><span class="doc-label">{t['country_of_origin']}:</span> {na(ship.get('countryOrigin'))}</div>
+  </div>
+  <div class="doc-section"><div class="doc-section-title">{t['description_of_consignment']}</div>{goods}</div>
+  {phytosanitary_checklist(con.get("language"), ship['invoiceDate'])}
+  <div class="doc-footer">
+    <div class="sigs">
+      <div class="signature-line">{t['plant_protection_officer']}</div>
+      <div class="signature-line">{t['official_stamp']}</div>
+    </div>
+  </div>
+</div>"""
+
+
+def gen_fumigation(d):
+    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
+    t = labels(con.get("language"))
+    goods = "".join(f"<div>• {it['desc']}</div>" for it in items)
+    return f"""
+<div class="document-preview">
+  <div class="doc-title">{t['fumigation_certificate']}</div>
+  <div class="doc-subtitle">{t['pest_control_treatment_certificate']}</div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['certificate_no']}:</span> FC-{ship['invoiceNumber']}</div>
+    <div><span class="doc-label">{t['date']}:</span> {ship['invoiceDate']}</div>
+  </div>
+  <div class="doc-section"><div class="doc-section-title">{t['exporter']}</div>{exp_block(exp)}</div>
+  <div class="doc-section"><div class="doc-section-title">{t['consignee']}</div>{con_block(con)}</div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['container_no']}:</span> CONT-{ship['invoiceNumber']}</div>
+    <div><span class="doc-label">{t['no_of_packages']}:</span> {na(ship.get('numPackages'))}</div>
+  </div>
+  <div class="doc-section"><div class="doc-section-title">{t['description_of_goods']}</div>{goods}</div>
+  <div class="doc-section">
+    <div class="doc-section-title">{t['fumigation_details']}</div>
+    <div><span class="doc-label">{t['fumigant_used']}:</span> Methyl Bromide / Aluminum Phosphide</div>
+    <div><span class="doc-label">{t['dosage']}:</span> As per ISPM 15 standards</div>
+    <div><span class="doc-label">{t['treatment_duration']}:</span> 24 hours</div>
+    <div><span class="doc-label">{t['temperature']}:</span> 25°C</div>
+    <div><span class="doc-label">{t['treatment_date']}:</span> {ship['invoiceDate']}</div>
+  </div>
+  <div class="doc-footer">
+    <div style="margin-top:15px"><strong>{t['certification']}:</strong>
+      {t['fumigation_certification_text']}</div>
+    <div class="sigs">
+      <div class="signature-line">{t['licensed_fumigation_agency']}</div>
+      <div class="signature-line">{t['license_no_and_stamp']}</div>
+    </div>
+  </div>
+</div>"""
+
+
+def gen_health_certificate(d):
+    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
+    t = labels(con.get("language"))
+    goods = "".join(f"<div>• {it['qty']} {it['unit']} of {it['desc']}</div>" for it in items)
+    return f"""
+<div class="document-preview">
+  <div class="doc-title">{t['health_certificate']}</div>
+  <div class="doc-subtitle">{t['for_export_of_food_products']}</div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['certificate_no']}:</span> HC-{ship['invoiceNumber']}</div>
+    <div><span class="doc-label">{t['date']}:</span> {ship['invoiceDate']}</div>
+  </div>
+  <div class="doc-section">
+    <div class="doc-section-title">{t['exporter_manufacturer']}</div>{exp_block(exp)}
+  </div>
+  <div class="doc-section">
+    <div class="doc-section-title">{t['importer_consignee']}</div>{con_block(con)}
+  </div>
+  <div class="doc-section"><div class="doc-section-title">{t['description_of_products']}</div>{goods}</div>
+  <div class="doc-section">
+    <div class="doc-section-title">{t['health_declaration']}</div>
+    <div>✓ The products have been prepared under hygienic conditions</div>
+    <div>✓ Raw materials used are of good quality and fit for human consumption</div>
+    <div>✓ Products comply with food safety standards and regulations</div>
+    <div>✓ No harmful substances or contaminants detected</div>
+    <div>✓ Storage and transportation meet sanitary requirements</div>
+  </div>
+  <div class="doc-footer">
+    <div style="margin-top:15px"><strong>{t['validity']}:</strong> This certificate is valid for
+      6 months from date of issue.</div>
+    <div class="sigs">
+      <div class="signature-line">{t['health_authority_officer']}</div>
+      <div class="signature-line">{t['official_seal']}</div>
+    </div>
+  </div>
+</div>"""
+
+
+def gen_bill_of_exchange(d):
+    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
+    t = labels(con.get("language"))
+    total = sum(it["total"] for it in items)
+    cur   = ship["currency"]
+    return f"""
+<div class="document-preview">
+  <div class="doc-title">{t['bill_of_exchange_draft']}</div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['draft_no']}:</span> BE-{ship['invoiceNumber']}</div>
+    <div><span class="doc-label">{t['date']}:</span> {ship['invoiceDate']}</div>
+  </div>
+  <div class="doc-section" style="padding:20px">
+    <div style="font-size:18px;margin-bottom:12px">
+      <strong>{t['amount']}:</strong> {cur} {total:.2f}</div>
+    <div style="font-size:16px">
+      <strong>{t['in_words']}:</strong> {number_to_words(total)} {cur} {t['only']}</div>
+  </div>
+  <div class="doc-section">
+    <div>At <strong>{na(ship.get('paymentTerms'))}</strong> of this FIRST Bill of Exchange
+      (Second of the same tenor and date being unpaid)</div>
+    <div style="margin-top:12px">Pay to the order of <strong>{exp['name']}</strong></div>
+    <div style="margin-top:12px">The sum of <strong>{cur} {total:.2f}</strong></div>
+  </div>
+  <div class="doc-section">
+    <div class="doc-section-title">{t['to_drawee']}</div>{con_block(con)}
+  </div>
+  <div class="doc-section">
+    <div class="doc-section-title">{t['for']}</div>
+    <div>Value received as per Invoice No. {ship['invoiceNumber']}</div>
+    <div>dated {ship['invoiceDate']}</div>
+  </div>
+  <div class="doc-footer">
+    <div style="text-align:right;margin-top:30px">
+      <div><strong>{exp['name']}</strong></div>
+      <div class="signature-line">{t['drawers_signature']}</div>
+    </div>
+  </div>
+</div>"""
+
+
+def gen_letter_of_credit(d):
+    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
+    t = labels(con.get("language"))
+    total = sum(it["total"] for it in items)
+    cur   = ship["currency"]
+    goods = "".join(f"<div>• {it['qty']} {it['unit']} of {it['desc']}</div>" for it in items)
+    return f"""
+<div class="document-preview">
+  <div class="doc-title">{t['letter_of_credit_l_c']}</div>
+  <div class="doc-subtitle">{t['irrevocable_documentary_credit']}</div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['l_c_no']}:</span> LC-{ship['invoiceNumber']}</div>
+    <div><span class="doc-label">{t['date_of_issue']}:</span> {ship['invoiceDate']}</div>
+  </div>
+  <div class="doc-section">
+    <div class="doc-section-title">{t['applicant_buyer']}</div>{con_block(con)}
+  </div>
+  <div class="doc-section">
+    <div class="doc-section-title">{t['beneficiary_seller']}</div>{exp_block(exp)}
+  </div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['amount']}:</span> {cur} {total:.2f}</div>
+    <div><span class="doc-label">{t['expiry_date']}:</span> 90 days from issue</div>
+  </div>
+  <div class="doc-section"><div class="doc-section-title">{t['description_of_goods']}</div>{goods}</div>
+  <div class="doc-section">
+    <div class="doc-section-title">{t['shipment_details']}</div>
+    <div><span class="doc-label">{t['from']}:</span> {na(ship.get('portLoading'))}</div>
+    <div><span class="doc-label">{t['to']}:</span> {na(ship.get('portDischarge'))}</div>
+    <div><span class="doc-label">{t['incoterms']}:</span> {na(ship.get('incoterms'))}</div>
+    <div><span class="doc-label">{t['latest_shipment']}:</span> 60 days from L/C date</div>
+  </div>
+  <div class="doc-section">
+    <div class="doc-section-title">{t['documents_required']}</div>
+    <div>• Commercial Invoice (3 originals)</div>
+    <div>• Packing List (2 copies)</div>
+    <div>• Bill of Lading (full set)</div>
+    <div>• Certificate of Origin</div>
+    <div>• Insurance Certificate</div>
+  </div>
+  <div class="doc-footer">
+    <div style="margin-top:15px"><strong>{t['special_conditions']}:</strong> This credit is subject to
+      Uniform Customs and Practice for Documentary Credits (UCP 600).</div>
+    <div class="signature-line">{t['issuing_bank_authorized_signature']}</div>
+  </div>
+</div>"""
+
+
+def gen_export_license(d):
+    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
+    t = labels(con.get("language"))
+    goods = "".join(
+        f"<div>• {it['qty']} {it['unit']} of {it['desc']} (HS Code: {it['hs']})</div>"
+        for it in items
+    )
+    return f"""
+<div class="document-preview">
+  <div class="doc-title">{t['export_license']}</div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['license_no']}:</span> EL-{ship['invoiceNumber']}</div>
+    <div><span class="doc-label">{t['date_of_issue']}:</span> {ship['invoiceDate']}</div>
+  </div>
+  <div class="doc-section">
+    <div class="doc-section-title">{t['exporter_details']}</div>{exp_block(exp)}
+  </div>
+  <div class="doc-section">
+    <div class="doc-section-title">{t['consignee_details']}</div>{con_block(con)}
+  </div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['country_of_destination']}:</span> {na(con.get('city'))}</div>
+    <div><span class="doc-label">{t['port_of_export']}:</span> {na(ship.get('portLoading'))}</div>
+  </div>
+  <div class="doc-section"><div class="doc-section-title">{t['description_of_goods']}</div>{goods}</div>
+  <div class="doc-section">
+    <div class="doc-section-title">{t['license_conditions']}</div>
+    <div>✓ This license is valid for single shipment only</div>
+    <div>✓ Shipment must be completed within 6 months</div>
+    <div>✓ Goods must be exported as per approved specifications</div>
+    <div>✓ Any amendments require prior approval</div>
+  </div>
+  <div class="doc-footer">
+    <div><strong>{t['validity']}:</strong> 6 months from date of issue</div>
+    <div style="margin-top:10px"><strong>{t['note']}:</strong> This license is issued subject to the
+      provisions of the Foreign Trade Policy.</div>
+    <div class="signature-line">{t['licensing_authority_signature_and_seal']}</div>
+  </div>
+</div>"""
+
+
+def gen_dangerous_goods(d):
+    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
+    t = labels(con.get("language"))
+    rows = "".join(
+        f"<tr><td>UN####</td><td>{it['desc']}</td><td>-</td><td>-</td>"
+        f"<td>{it['qty']} {it['unit']}</td></tr>"
+        for it in items
+    )
+    return f"""
+<div class="document-preview">
+  <div class="doc-title">{t['dangerous_goods_declaration']}</div>
+  <div class="doc-subtitle">{t['imdg_iata_dangerous_goods_transport_document']}</div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['dgd_no']}:</span> DGD-{ship['invoiceNumber']}</div>
+    <div><span class="doc-label">{t['date']}:</span> {ship['invoiceDate']}</div>
+  </div>
+  <div class="doc-section"><div class="doc-section-title">{t['shipper']}</div>{exp_block(exp)}</div>
+  <div class="doc-section"><div class="doc-section-title">{t['consignee']}</div>{con_block(con)}</div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['vessel_flight']}:</span> {na(ship.get('vesselName'))}</div>
+    <div><span class="doc-label">{t['port_of_loading']}:</span> {na(ship.get('portLoading'))}</div>
+  </div>
+  <table>
+    <thead><tr><th>{t['un_no']}</th><th>{t['proper_shipping_name']}</th><th>{t['class']}</th>
+      <th>{t['packing_group']}</th><th>{t['quantity']}</th></tr></thead>
+    <tbody>{rows}</tbody>
+  </table>
+  <div class="doc-section">
+    <div class="doc-section-title">{t['additional_handling_information']}</div>
+    <div>• Package type: {na(ship.get('packageType'))}</div>
+    <div>• Emergency response: Contact shipper immediately</div>
+    <div>• Special precautions: Handle with care</div>
+  </div>
+  <div class="doc-footer">
+    <div style="margin-top:15px"><strong>{t['shippers_declaration']}:</strong>
+      {t['dangerous_goods_declaration_text']}</div>
+    <div class="signature-line">{t['shippers_signature_and_date']}</div>
+  </div>
+</div>"""
+
+
+def gen_free_sale(d):
+    exp, con, ship, items = d["exporter"], d["consignee"], d["shipment"], d["items"]
+    t = labels(con.get("language"))
+    goods = "".join(f"<div>• {it['desc']}</div>" for it in items)
+    return f"""
+<div class="document-preview">
+  <div class="doc-title">{t['certificate_of_free_sale']}</div>
+  <div class="doc-row">
+    <div><span class="doc-label">{t['certificate_no']}:</span> CFS-{ship['invoiceNumber']}</div>
+    <div><span class="doc-label">{t['date']}:</span> {ship['invoiceDate']}</div>
+  </div>
+  <div class="doc-section">
+    <div class="doc-section-title">{t['manufacturer_exporter']}</div>{exp_block(exp)}
+  </div>
+  <div class="doc-section">
+    <div class="doc-section-title">{t['importer_buyer']}</div>{con_block(con)}
+  </div>
+  <div class="doc-section"><div class="doc-section-title">{t['product_details']}</div>{goods}</div>
+  <div class="doc-section">
+    <div class="doc-section-title">{t['certification']}</div>
+    <div style="line-height:1.8">
+      {t['free_sale_certification_text'].format(exporter=f"<strong>{exp['name']}</strong>",
+                                                 country=na(ship.get('countryOrigin')))}
+    </div>
+  </div>
+  <div class="doc-section">
+    <div class="doc-section-title">{t['regulatory_compliance']}</div>
+    <div>✓ Products meet national quality standards</div>
+    <div>✓ Manufacturing facility is licensed and registered</div>
+    <div>✓ Products are in compliance with health and safety regulations</div>
+    <div>✓ No restrictions on sale or distribution in country of origin</div>
+  </div>
+  <div class="doc-footer">
+    <div style="margin-top:15px"><strong>{t['validity']}:</strong> 12 months from date of issue</div>
+    <div class="sigs">
+      <div class="signature-line">{t['regulatory_authority_signature']}</div>
+      <div class="signature-line">{t['official_seal']}</div>
+    </div>
+  </div>
+</div>"""
+
+
+# Map key → (label, generator_fn, default_checked)
+DOC_REGISTRY = [
+    ("commercial_invoice",      "Commercial Invoice",              gen_commercial_invoice,    True),
+    ("packing_list",            "Packing List",                    gen_packing_list,          True),
+    ("certificate_origin",      "Certificate of Origin",           gen_certificate_of_origin, False),
+    ("shipping_bill",           "Shipping Bill",                   gen_shipping_bill,         False),
+    ("sli",                     "Shipper's Letter of Instruction", gen_sli,                   False),
+    ("proforma",                "Proforma Invoice",                gen_proforma_invoice,      False),
+    ("bill_lading",             "Bill of Lading (B/L)",            gen_bill_of_lading,        False),
+    ("air_waybill",             "Air Waybill (AWB)",               gen_air_waybill,           False),
+    ("insurance_certificate",   "Insurance Certificate",           gen_insurance_certificate, False),
+    ("inspection_certificate",  "Inspection Certificate",          gen_inspection_certificate,False),
+    ("phytosanitary",           "Phytosanitary Certificate",       gen_phytosanitary,         False),
+    ("fumigation",              "Fumigation Certificate",          gen_fumigation,            False),
+    ("health_certificate",      "Health Certificate",              gen_health_certificate,    False),
+    ("bill_exchange",           "Bill of Exchange / Draft",        gen_bill_of_exchange,      False),
+    ("letter_credit",           "Letter of Credit (L/C)",          gen_letter_of_credit,      False),
+    ("export_license",          "Export License",                  gen_export_license,        False),
+    ("dangerous_goods",         "Dangerous Goods Declaration",     gen_dangerous_goods,       False),
+    ("free_sale",               "Certificate of Free Sale",        gen_free_sale,             False),
+]
+
+# Customs documents list one row per HS code unless the user opts out
+HS_AGGREGATE_DEFAULT = ["certificate_origin", "shipping_bill", "export_license"]
+
+
+PAGE_DIVIDER = '<hr class="page-divider">'
+
+# Fingerprint of the modules the rendered HTML depends on (templates, barcodes,
+# HS grouping, packing figures, currency conversion) and of the label catalogs:
+# any edit invalidates previously stored output
+_RENDER_SALT = hashlib.sha256(
+    b"".join(Path(m.__file__).read_bytes() for m in (sys.modules[__name__], barcodes, model,
+                                                      packing, rates))
+    + i18n.DIGEST.encode()).hexdigest()[:16]
+
+
+def render_documents(d: dict, keys: list, aggregate=(), store: ContentStore = None,
+                     previous: dict = None, changed=()) -> str:
+    """Selected documents joined by page dividers, served from the output store when possible.
+
+    Documents whose key is in `aggregate` list items grouped by HS code and unit.
+    Without a store every document is rendered afresh. With `previous`, the
+    data of an earlier render of the same documents, only the documents in
+    `changed` are rendered; the others are copied from that render's output
+    (see revisions.affected_documents). Copies are only stored for later
+    partial renders, never under the keys fresh renders are served from: a
+    copy is only as right as the diff that allowed it.
+    """
+    if store is None:
+        gens = {key: gen_fn for key, _, gen_fn, _ in DOC_REGISTRY}
+        grouped = dict(d, items=ItemTable.from_records(d["items"]).aggregate_hs()) if aggregate else d
+        return PAGE_DIVIDER.join(gens[k](grouped if k in aggregate else d) for k in keys)
+
+    aggregate = sorted(set(aggregate) & set(keys))
+    bundle = key_for("bundle", _RENDER_SALT, keys, aggregate, d)
+    cached = store.lookup(bundle)
+    if cached is not None:
+        return cached.decode()
+
+    gens = {key: gen_fn for key, _, gen_fn, _ in DOC_REGISTRY}
+    grouped = grouped_before = None
+    refs, chunks, copied = [], [], False
+    for key in keys:
+        doc = d
+        if key in aggregate:
+            if grouped is None:
+                grouped = dict(d, items=ItemTable.from_records(d["items"]).aggregate_hs())
+            doc = grouped
+        if chunks:
+            refs.append(store.put(PAGE_DIVIDER.encode()))
+            chunks.append(PAGE_DIVIDER.encode())
+        doc_key = key_for("doc", _RENDER_SALT, key, doc)
+        html = None
+        if previous is not None and key not in changed:
+            before = previous
+            if key in aggregate:
+                if grouped_before is None:
+                    grouped_before = dict(
+                        previous, items=ItemTable.from_records(previous["items"]).aggregate_hs())
+                before = grouped_before
+            before_key = key_for("doc", _RENDER_SALT, key, before)
+            html = store.lookup(before_key)
+            if html is None:
+                html = store.lookup(key_for("copy", before_key))
+        if html is not None:
+            copied = True
+            digest = store.put(html)
+            store.link(key_for("copy", doc_key), [digest])
+        else:
+            digest, html = store.fetch(doc_key, lambda: gens[key](doc).encode())
+        refs.append(digest)
+        chunks.append(html)
+    if not copied:
+        store.link(bundle, refs)
+    return b"".join(chunks).decode()
+
+
+_DOC_CSS_MIN = minify_css(DOC_CSS.replace("<style>", "").replace("</style>", ""))
+
+
+def build_full_html(docs_html: str, compact: bool = False) -> str:
+    if not compact:
+        return f"""<!DOCTYPE html>
+<html lang="en"><head><meta charset="UTF-8">
+<title>Export Documents</title>{DOC_CSS}</head>
+<body>{docs_html}</body></html>"""
+    body, style_classes = hoist_styles(docs_html)
+    return minify_html(
+        '<!DOCTYPE html><html lang="en"><head><meta charset="UTF-8">'
+        f"<title>Export Documents</title><style>{_DOC_CSS_MIN}{style_classes}</style></head>"
+        f"<body>{body}</body></html>"
+    )
+
+
+def export_csv(d: dict) -> str:
+    lines = ["EXPORTER INFORMATION"]
+    for k, v in d["exporter"].items():
+        lines.append(f"{k},{v}")
+    lines += ["", "CONSIGNEE INFORMATION"]
+    for k, v in d["consignee"].items():
+        lines.append(f"{k},{v}")
+    lines += ["", "SHIPMENT DETAILS"]
+    for k, v in d["shipment"].items():
+        lines.append(f"{k},{v}")
+    lines += ["", "ITEMS", "Description,HS Code,Quantity,Unit,Unit Price,Total,"
+              "Net Wt/Unit,Gross Wt/Unit,Units/Pkg,Length,Width,Height"]
+    for it in ItemTable.from_records(d["items"]):
+        lines.append(f"{it['desc']},{it['hs']},{it['qty']},{it['unit']},{it['price']},{it['total']},"
+                     + ",".join(f"{it[c]:g}" for c in ItemTable.PACKING))
+    return "\n".join(lines)
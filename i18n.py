@@ -0,0 +1,54 @@
+"""Translation catalogs for document labels
+locales/<code>.json holds {"language": name, "labels": {label id: text}};
+en.json is the base every other catalog falls back to. All catalogs are read
+once, at import. For each language the finished label table (English and
+translation side by side, already HTML-escaped) is built the first time it
+is asked for and then reused, so a bilingual render costs the same
+dictionary lookups as an English one.
+"""
+
+import hashlib
+import html
+import json
+from functools import lru_cache
+from pathlib import Path
+
+LOCALE_DIR = Path(__file__).with_name("locales")
+BASE = "en"
+SEPARATOR = " / "
+
+
+def _read_catalogs(root: Path) -> dict:
+    catalogs = {}
+    for path in sorted(root.glob("*.json")):
+        with open(path, encoding="utf-8") as f:
+            catalogs[path.stem] = json.load(f)
+    return catalogs
+
+
+CATALOGS = _read_catalogs(LOCALE_DIR)
+
+# Language code → display name, for the consignee language picker
+LANGUAGES = {code: cat["language"] for code, cat in CATALOGS.items()}
+
+# Changes whenever any catalog does; part of the render fingerprint
+DIGEST = hashlib.sha256(json.dumps(CATALOGS, sort_keys=True).encode()).hexdigest()[:16]
+
+
+@lru_cache(maxsize=None)
+def labels(lang: str = "") -> dict:
+    """Label id → HTML for documents addressed to a consignee reading `lang`.
+
+    Labels are bilingual ("Port of Loading / Puerto de carga") for any
+    language other than English, and English alone where a catalog has no
+    translation or the translation reads the same.
+    """
+    base = CATALOGS[BASE]["labels"]
+    other = CATALOGS.get(lang or BASE, {}).get("labels", {}) if lang != BASE else {}
+    table = {}
+    for key, english in base.items():
+        local = other.get(key, "")
+        same = not local or local.casefold() == english.casefold()
+        text = english if same else english + SEPARATOR + local
+        table[key] = html.escape(text, quote=False)
+    return table
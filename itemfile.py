@@ -0,0 +1,307 @@
+"""Memory-mapped item tables
+Bulk shipments (per-container line data and the like) can carry millions of
+item rows. Such tables are kept on disk as one directory of column files and
+read through numpy memmaps, never loaded whole:
+
+    <name>.items/
+        meta.json        {"format": 1, "rows": n, "digest": ...}
+        qty.f8 ...       numeric columns: n little-endian float64 values
+        desc.txt         text columns: the UTF-8 values, each followed by NUL,
+        desc.off         and n + 1 int64 offsets into them
+
+An ItemFile hands out its rows as ItemTable chunks of CHUNK_ROWS rows (text
+decoded for that chunk, numbers as views of the map), and everything that
+accepts an item table loops over chunks(), so totals, validation and
+rendering hold one chunk of items at a time however large the file.
+Rendered documents themselves still grow with the number of rows.
+
+    python itemfile.py convert lines.csv lines.items
+    python itemfile.py info lines.items
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import config
+from model import ItemTable
+
+FORMAT = 1
+CHUNK_ROWS = 65536
+NUMBERS = ItemTable.NUMERIC + ItemTable.PACKING
+
+# CSV header → column: the dict schema's names, the item editor's and those of
+# export_csv()'s ITEMS section (whose other sections are not read)
+CSV_NAMES = {
+    **{c: c for c in ItemTable.COLUMNS},
+    "Description": "desc", "HS Code": "hs", "Unit": "unit", "Quantity": "qty",
+    "Unit Price": "price", "Total": "total",
+    **ItemTable.FRAME_PACKING,
+    "Net Wt/Unit": "net_wt", "Gross Wt/Unit": "gross_wt",
+}
+
+
+class ItemFileWriter:
+    """Builds an item file from ItemTable chunks appended in order.
+
+    The directory appears under its final name only once close() has
+    written it completely.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.rows = 0
+        self._tmp = self.path.with_name(f".tmp-{self.path.name}-{os.getpid()}")
+        shutil.rmtree(self._tmp, ignore_errors=True)
+        self._tmp.mkdir(parents=True)
+        self._files, self._hashes = {}, {}
+        for name in [f"{c}.f8" for c in NUMBERS] + [f"{c}.{ext}" for c in ItemTable.TEXT
+                                                    for ext in ("txt", "off")]:
+            self._files[name] = open(self._tmp / name, "wb")
+            self._hashes[name] = hashlib.sha256()
+        self._ends = dict.fromkeys(ItemTable.TEXT, 0)
+        for c in ItemTable.TEXT:
+            self._write(f"{c}.off", np.zeros(1, dtype="<i8").tobytes())
+
+    def _write(self, name: str, data: bytes):
+        self._files[name].write(data)
+        self._hashes[name].update(data)
+
+    def append(self, table: ItemTable):
+        for c in NUMBERS:
+            self._write(f"{c}.f8", getattr(table, c).astype("<f8").tobytes())
+        for c in ItemTable.TEXT:
+            values = [str(v) for v in getattr(table, c)]
+            data = ("\0".join(values) + "\0").encode() if values else b""
+            if len(data) == sum(map(len, values)) + len(values):
+                sizes = np.fromiter(map(len, values), np.int64, len(values)) + 1
+            else:   # not all ASCII: sizes in bytes
+                sizes = np.fromiter((len(v.encode()) + 1 for v in values), np.int64, len(values))
+            ends = self._ends[c] + np.cumsum(sizes)
+            self._write(f"{c}.txt", data)
+            self._write(f"{c}.off", ends.astype("<i8").tobytes())
+            if len(ends):
+                self._ends[c] = int(ends[-1])
+        self.rows += len(table)
+
+    def close(self) -> "ItemFile":
+        for f in self._files.values():
+            f.close()
+        digest = hashlib.sha256(
+            "".join(f"{name}:{h.hexdigest()}\n" for name, h in sorted(self._hashes.items()))
+            .encode()).hexdigest()
+        with open(self._tmp / "meta.json", "w", encoding="utf-8") as f:
+            json.dump({"format": FORMAT, "rows": self.rows, "digest": digest}, f)
+        if self.path.exists():
+            shutil.rmtree(self.path)
+        try:
+            os.replace(self._tmp, self.path)
+        except OSError:
+            # Written meanwhile by another process converting the same file
+            if not (self.path / "meta.json").exists():
+                raise
+            shutil.rmtree(self._tmp, ignore_errors=True)
+        return ItemFile(self.path)
+
+    def abort(self):
+        for f in self._files.values():
+            f.close()
+        shutil.rmtree(self._tmp, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *_):
+        if exc_type is not None:
+            self.abort()
+
+
+class ItemFile:
+    """A read-only, memory-mapped item table. Numeric columns are attributes
+    (memmaps) as on ItemTable; text is read through chunks() or take(). Given a
+    digest, a file whose content has since changed is refused with ValueError."""
+
+    def __init__(self, path, digest: str = None):
+        self.path = Path(path)
+        with open(self.path / "meta.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != FORMAT:
+            raise ValueError(f"{self.path}: unsupported item file format {meta.get('format')!r}")
+        self.rows = meta["rows"]
+        self._digest = meta["digest"]
+        if digest is not None and digest != self._digest:
+            raise ValueError(f"{self.path}: item file has changed since it was referenced")
+        self._maps = {}
+
+    def _map(self, name: str, dtype) -> np.ndarray:
+        if name not in self._maps:
+            file = self.path / name
+            # Empty files cannot be mapped
+            self._maps[name] = (np.memmap(file, dtype=dtype, mode="r") if file.stat().st_size
+                                else np.zeros(0, dtype=dtype))
+        return self._maps[name]
+
+    def __getattr__(self, name):
+        if name in NUMBERS:
+            return self._map(f"{name}.f8", "<f8")
+        raise AttributeError(name)
+
+    # — Pickling: only the path and digest travel (artifact cache, worker
+    # processes); unpickling fails if the file has gone or changed since ————
+    def __getstate__(self):
+        return {"path": str(self.path), "digest": self._digest}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state.get("digest"))
+
+    # — Reading ——————————————————————————————————————————————
+    def _text(self, column: str, start: int, stop: int) -> np.ndarray:
+        off = self._map(f"{column}.off", "<i8")[start:stop + 1]
+        n = max(len(off) - 1, 0)
+        out = np.empty(n, dtype=object)
+        if not n:
+            return out
+        raw = self._map(f"{column}.txt", np.uint8)[off[0]:off[-1]].tobytes()
+        values = raw.decode().split("\0")[:-1]
+        if len(values) != n:
+            # Some value contains NUL itself; the offsets are authoritative
+            ends = (off - off[0]).tolist()
+            values = [raw[a:b - 1].decode() for a, b in zip(ends, ends[1:])]
+        out[:] = values
+        return out
+
+    def take(self, index) -> ItemTable:
+        """Rows selected by a slice (with step 1) as an in-memory ItemTable."""
+        if not isinstance(index, slice) or index.step not in (None, 1):
+            raise TypeError("ItemFile: only contiguous slices can be taken")
+        start, stop, _ = index.indices(self.rows)
+        stop = max(start, stop)
+        return ItemTable(**{c: self._text(c, start, stop) for c in ItemTable.TEXT},
+                         **{c: getattr(self, c)[start:stop] for c in NUMBERS})
+
+    def chunks(self, rows: int = None):
+        rows = rows or CHUNK_ROWS
+        for start in range(0, self.rows, rows):
+            yield self.take(slice(start, start + rows))
+
+    def __len__(self):
+        return self.rows
+
+    def __iter__(self):
+        for chunk in self.chunks():
+            yield from chunk
+
+    def __getitem__(self, i):
+        if isinstance(i, (int, np.integer)):
+            i = int(i) + self.rows if i < 0 else int(i)
+            if not 0 <= i < self.rows:
+                raise IndexError(i)
+            return self.take(slice(i, i + 1))[0]
+        return self.take(i)
+
+    def to_records(self) -> list:
+        return list(self)
+
+    def digest(self) -> str:
+        """Content hash, worked out when the file was written."""
+        return self._digest
+
+    def row_digests(self) -> np.ndarray:
+        return np.concatenate([c.row_digests() for c in self.chunks()] or [np.empty(0, "V16")])
+
+    def aggregate_hs(self) -> ItemTable:
+        """As ItemTable.aggregate_hs(), a chunk at a time; only the groups are held."""
+        parts = []
+        for n, chunk in enumerate(self.chunks()):
+            key = pd.Series(chunk.hs.astype(str)) + "\x1f" + chunk.unit.astype(str)
+            codes, uniques = pd.factorize(key)
+            first = np.full(len(uniques), len(chunk), dtype=np.int64)
+            np.minimum.at(first, codes, np.arange(len(chunk)))
+            sums = {name: np.bincount(codes, weights=w, minlength=len(uniques))
+                    for name, w in [("qty", chunk.qty), ("total", chunk.total),
+                                    ("net", chunk.qty * chunk.net_wt),
+                                    ("gross", chunk.qty * chunk.gross_wt)]}
+            parts.append(pd.DataFrame({
+                "key": uniques, "desc": chunk.desc[first], "hs": chunk.hs[first],
+                "unit": chunk.unit[first], "count": np.bincount(codes), **sums}))
+        if not parts:
+            return ItemTable()
+        g = (pd.concat(parts, ignore_index=True)
+             .groupby("key", sort=False)
+             .agg(desc=("desc", "first"), hs=("hs", "first"), unit=("unit", "first"),
+                  count=("count", "sum"), qty=("qty", "sum"), total=("total", "sum"),
+                  net=("net", "sum"), gross=("gross", "sum")))
+        qty, total = g["qty"].to_numpy(), np.round(g["total"].to_numpy(), 2)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            price = np.where(qty != 0, np.round(total / qty, 2), 0.0)
+            net = np.where(qty != 0, g["net"].to_numpy() / qty, 0.0)
+            gross = np.where(qty != 0, g["gross"].to_numpy() / qty, 0.0)
+        desc = [d if c == 1 else f"{d} (+{c - 1} more)"
+                for d, c in zip(g["desc"].tolist(), g["count"].tolist())]
+        return ItemTable(desc=desc, hs=g["hs"].to_numpy(dtype=object),
+                         unit=g["unit"].to_numpy(dtype=object), qty=qty, price=price,
+                         total=total, net_wt=net, gross_wt=gross)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory the file holds outside the page cache: none."""
+        return 0
+
+    def __repr__(self):
+        return f"ItemFile({str(self.path)!r}, {self.rows} rows)"
+
+
+# ── Conversion ────────────────────────────────────────────────────────────────
+def convert_csv(src, dst, chunk_rows: int = CHUNK_ROWS) -> ItemFile:
+    """Write the item rows of CSV file src as the item file dst, a chunk at a time."""
+    header = pd.read_csv(src, nrows=0, skipinitialspace=True).columns
+    names = {name: CSV_NAMES.get(name.strip(), name.strip()) for name in header}
+    # Text is read as text; numbers are left to the parser ("1,234.50" included)
+    text = {name: str for name, c in names.items() if c not in NUMBERS}
+    with ItemFileWriter(dst) as writer:
+        for frame in pd.read_csv(src, chunksize=chunk_rows, dtype=text, thousands=",",
+                                 keep_default_na=False, skipinitialspace=True):
+            frame = frame.rename(columns=names)
+            columns = {c: frame[c].to_numpy(dtype=object) if c in frame
+                       else np.full(len(frame), "", dtype=object) for c in ItemTable.TEXT}
+            for c in NUMBERS:
+                if c not in frame:
+                    continue
+                values = frame[c]
+                if not pd.api.types.is_numeric_dtype(values):
+                    # Blanks or stray text in the column: those cells count as 0
+                    values = pd.to_numeric(values.astype(str).str.replace(",", ""),
+                                           errors="coerce")
+                columns[c] = values.fillna(0).to_numpy(dtype=np.float64)
+            writer.append(ItemTable(**columns))
+        return writer.close()
+
+
+def open_items(path, cache_dir=None) -> ItemFile:
+    """An ItemFile for path: an item file directory as it is, or a CSV file
+    converted once into cache_dir (keyed by the file's path, size and mtime)."""
+    path = Path(path)
+    if (path / "meta.json").exists():
+        return ItemFile(path)
+    st = path.stat()
+    key = hashlib.sha256(f"{path.resolve()}\x1f{st.st_size}\x1f{st.st_mtime_ns}".encode())
+    dst = Path(cache_dir or config.ITEMS_DIR) / f"{key.hexdigest()[:24]}.items"
+    if (dst / "meta.json").exists():
+        return ItemFile(dst)
+    return convert_csv(path, dst)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "convert":
+        f = convert_csv(sys.argv[2], sys.argv[3])
+    elif len(sys.argv) == 3 and sys.argv[1] == "info":
+        f = ItemFile(sys.argv[2])
+    else:
+        sys.exit(__doc__.rsplit("\n\n", 1)[-1])
+    print(f"{f.path}: {len(f)} rows, value {float(f.total.sum()):,.2f}, digest {f.digest()[:16]}")
@@ -0,0 +1,245 @@
+"""Concurrent-session load test for the Streamlit app
+Starts app.py under `streamlit run` (or targets a running instance with
+--url/--pid) and drives many simulated operator sessions against it with a
+headless websocket client speaking Streamlit's own protobuf protocol. Each
+session fills in the Master Data tab, edits the item grid and clicks
+Generate, exactly as a browser would: every widget change is one rerun.
+
+For each concurrency level it reports p50/p99 rerun latency, the server's
+resident memory and the server CPU time spent per session.
+
+    python loadtest.py --levels 1,5,10,25,50 --items 200 --edits 5
+
+Server metrics are read from /proc and are only available on Linux.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+from streamlit.proto.Alert_pb2 import Alert
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+APP = Path(__file__).with_name("app.py")
+
+MASTER_DATA = {
+    "exp_name": "ABC Export Ltd.", "exp_addr": "123 Business Street",
+    "exp_city": "Mumbai, India", "con_name": "XYZ Imports Inc.",
+    "con_addr": "456 Import Avenue", "con_city": "New York, USA",
+    "inv_number": "INV-LOAD-{n}", "port_loading": "Mumbai Port",
+    "port_discharge": "New York Port", "country_origin": "India",
+}
+DOCUMENTS = ["certificate_origin", "shipping_bill"]   # on top of the default two
+GENERATE = "🚀 Generate Selected Documents"
+
+
+# ── Server process ────────────────────────────────────────────────────────────
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", str(APP),
+         "--server.headless", "true", "--server.port", str(port),
+         "--browser.gatherUsageStats", "false"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1)
+            return proc
+        except OSError:
+            time.sleep(0.3)
+    proc.kill()
+    raise RuntimeError("streamlit server did not become healthy within 60s")
+
+
+def server_stats(pid) -> dict:
+    """RSS (MiB) and cumulative CPU seconds of the server process."""
+    if not pid:
+        return {"rss_mb": float("nan"), "cpu_s": float("nan")}
+    with open(f"/proc/{pid}/statm") as f:
+        rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    return {"rss_mb": rss, "cpu_s": cpu}
+
+
+# ── Simulated browser session ────────────────────────────────────────────────
+class Session:
+    def __init__(self, url: str, n: int):
+        self.url = url
+        self.n = n
+        self.ws = None
+        self.ids = {}          # widget key, or label for unkeyed buttons → widget id
+        self.states = {}       # widget id → WidgetState sent on every rerun
+        self.latencies = []
+        self.errors = []       # exceptions and st.error messages seen
+        self.generated = False
+
+    async def __aenter__(self):
+        self.ws = await websockets.connect(self.url, max_size=None)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.ws.close()
+
+    async def rerun(self, *triggers):
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.widget_states.widgets.extend(list(self.states.values()) + list(triggers))
+        t0 = time.perf_counter()
+        await self.ws.send(msg.SerializeToString())
+        while True:
+            fm = ForwardMsg()
+            fm.ParseFromString(await self.ws.recv())
+            kind = fm.WhichOneof("type")
+            if kind == "delta" and fm.delta.WhichOneof("type") == "new_element":
+                self._see(fm.delta.new_element)
+            elif kind == "script_finished":
+                break
+        self.latencies.append(time.perf_counter() - t0)
+
+    def _see(self, element):
+        kind = element.WhichOneof("type")
+        if kind == "exception":
+            self.errors.append(element.exception.message)
+            return
+        if kind == "alert":
+            if element.alert.format == Alert.ERROR:
+                self.errors.append(element.alert.body)
+            elif element.alert.body.startswith("Generated"):
+                self.generated = True
+            return
+        widget = getattr(element, kind)
+        wid = getattr(widget, "id", "")
+        if wid:
+            key = wid.split("-", 2)[-1]
+            self.ids[widget.label if key == "None" else key] = wid
+
+    def set(self, key: str, **value):
+        self.states[self.ids[key]] = WidgetState(id=self.ids[key], **value)
+
+    def set_grid(self, grid: dict):
+        # The item grid's key carries its page and revision; use the latest one seen
+        key = [k for k in self.ids if k.startswith("items_editor")][-1]
+        self.set(key, string_value=json.dumps(grid))
+
+    def click(self, label: str) -> WidgetState:
+        return WidgetState(id=self.ids[label], trigger_value=True)
+
+    async def run(self, items: int, edits: int):
+        await self.rerun()
+        for key, value in MASTER_DATA.items():
+            self.set(key, string_value=value.format(n=self.n))
+            await self.rerun()
+
+        # The grid state is cumulative, as the browser sends it
+        grid = {"edited_rows": {}, "added_rows": [], "deleted_rows": []}
+        grid["edited_rows"]["0"] = {"Description": "Item 0", "HS Code": "8471",
+                                    "Quantity": 1.0, "Unit Price": 10.0}
+        grid["added_rows"] = [
+            {"Description": f"Item {i}", "HS Code": str(8000 + i % 500), "Quantity": 1.0 + i % 9,
+             "Unit": "PCS", "Unit Price": round(1 + (i * 7919 % 5000) / 100, 2)}
+            for i in range(1, items)
+        ]
+        self.set_grid(grid)
+        await self.rerun()
+        for e in range(edits):
+            # The browser keeps edits to new rows inside added_rows
+            row = e % items
+            target = grid["added_rows"][row - 1] if row else grid["edited_rows"]["0"]
+            target["Quantity"] = 2.0 + e
+            self.set_grid(grid)
+            await self.rerun()
+
+        for key in DOCUMENTS:
+            self.set(f"doc_{key}", bool_value=True)
+            await self.rerun()
+        await self.rerun(self.click(GENERATE))
+
+
+async def run_level(url: str, pid, sessions: int, items: int, edits: int) -> dict:
+    before, t0 = server_stats(pid), time.perf_counter()
+    clients = [Session(url, n) for n in range(sessions)]
+
+    async def one(s):
+        async with s:
+            await s.run(items, edits)
+
+    await asyncio.gather(*(one(s) for s in clients))
+    wall, after = time.perf_counter() - t0, server_stats(pid)
+    lat = sorted(x for s in clients for x in s.latencies)
+    return {
+        "sessions":       sessions,
+        "reruns":         len(lat),
+        "errors":         sum(len(s.errors) for s in clients),
+        "generated":      sum(s.generated for s in clients),
+        "p50_ms":         round(1000 * statistics.median(lat), 1),
+        "p99_ms":         round(1000 * lat[min(len(lat) - 1, int(0.99 * len(lat)))], 1),
+        "max_ms":         round(1000 * lat[-1], 1),
+        "rss_mb":         round(after["rss_mb"], 1),
+        "rss_delta_mb":   round(after["rss_mb"] - before["rss_mb"], 1),
+        "cpu_s_per_sess": round((after["cpu_s"] - before["cpu_s"]) / sessions, 3),
+        "wall_s":         round(wall, 2),
+    }
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    p.add_argument("--levels", default="1,5,10,25", help="comma-separated session counts")
+    p.add_argument("--items", type=int, default=100, help="item rows per session")
+    p.add_argument("--edits", type=int, default=3, help="grid edits per session")
+    p.add_argument("--url", help="ws://host:port of a running instance (default: start one)")
+    p.add_argument("--pid", type=int, help="server pid for memory/CPU figures with --url")
+    p.add_argument("--json", action="store_true", help="print results as JSON lines")
+    args = p.parse_args(argv)
+    if websockets is None:
+        sys.exit("loadtest.py needs the 'websockets' package")
+
+    proc = None
+    if args.url:
+        base, pid = args.url.rstrip("/"), args.pid
+    else:
+        port = _free_port()
+        proc = start_server(port)
+        base, pid = f"ws://127.0.0.1:{port}", proc.pid
+    url = base + "/_stcore/stream"
+
+    cols = ["sessions", "reruns", "errors", "generated", "p50_ms", "p99_ms", "max_ms",
+            "rss_mb", "rss_delta_mb", "cpu_s_per_sess", "wall_s"]
+    try:
+        if not args.json:
+            print(" ".join(f"{c:>14}" for c in cols))
+        for level in (int(x) for x in args.levels.split(",")):
+            row = asyncio.run(run_level(url, pid, level, args.items, args.edits))
+            print(json.dumps(row) if args.json else " ".join(f"{row[c]:>14}" for c in cols),
+                  flush=True)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
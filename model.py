@@ -0,0 +1,318 @@
+"""Typed shipment model
+Slot-based classes for the exporter, consignee, shipment details and items.
+Items are held column-wise: qty / price / total and the packing master data
+(unit weights, units per package, package dimensions) in float64 arrays, the
+text columns in object arrays. Every class converts to and from the dict schema
+produced by collect_data(), and an ItemTable iterates as that schema's list
+of item dicts, so the document generators accept either form.
+"""
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+
+class Party:
+    __slots__ = ("name", "address", "city", "contact", "email")
+
+    def __init__(self, **fields):
+        for f in self.fields():
+            setattr(self, f, str(fields.pop(f, "") or ""))
+        if fields:
+            raise TypeError(f"{type(self).__name__}: unknown field(s) {sorted(fields)}")
+
+    @classmethod
+    def fields(cls) -> tuple:
+        return tuple(f for k in reversed(cls.__mro__) for f in getattr(k, "__slots__", ()))
+
+    @classmethod
+    def from_dict(cls, d: dict):
+        return cls(**{f: d.get(f, "") for f in cls.fields()})
+
+    def to_dict(self) -> dict:
+        return {f: getattr(self, f) for f in self.fields()}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r})"
+
+
+class Exporter(Party):
+    __slots__ = ("iec", "gst")
+
+
+class Consignee(Party):
+    # Language code of the consignee's document labels (see i18n.py); "" is English only
+    __slots__ = ("language",)
+
+
+class ShipmentDetails:
+    # attribute → key in the dict schema
+    KEYS = {
+        "invoice_number": "invoiceNumber", "invoice_date":   "invoiceDate",
+        "po_number":      "poNumber",      "port_loading":   "portLoading",
+        "port_discharge": "portDischarge", "country_origin": "countryOrigin",
+        "incoterms":      "incoterms",     "payment_terms":  "paymentTerms",
+        "vessel_name":    "vesselName",    "package_type":   "packageType",
+        "num_packages":   "numPackages",   "gross_weight":   "grossWeight",
+        "net_weight":     "netWeight",     "currency":       "currency",
+        "reporting_currency": "reportingCurrency",
+        "reporting_rate":     "reportingRate",
+        "rate_version":       "rateVersion",
+        # Worked out from the items' packing data (see packing.py)
+        "volume":             "volume",
+        "volumetric_weight":  "volumetricWeight",
+        "chargeable_weight":  "chargeableWeight",
+    }
+    __slots__ = tuple(KEYS)
+
+    def __init__(self, **fields):
+        for f in self.__slots__:
+            setattr(self, f, fields.pop(f, ""))
+        if fields:
+            raise TypeError(f"ShipmentDetails: unknown field(s) {sorted(fields)}")
+
+    @classmethod
+    def from_dict(cls, d: dict):
+        return cls(**{attr: d.get(key, "") for attr, key in cls.KEYS.items()})
+
+    def to_dict(self) -> dict:
+        return {key: getattr(self, attr) for attr, key in self.KEYS.items()}
+
+
+class ItemTable:
+    """Column store for item rows; indexing or iterating yields item dicts."""
+
+    __slots__ = ("desc", "hs", "unit", "qty", "price", "total",
+                 "net_wt", "gross_wt", "per_pkg", "pkg_l", "pkg_w", "pkg_h",
+                 "_digest", "_row_digests")
+
+    TEXT    = ("desc", "hs", "unit")
+    NUMERIC = ("qty", "price", "total")
+    # Packing master data: net and gross kg per unit, units per package and the
+    # package's outer length / width / height in cm; 0 where not known
+    PACKING = ("net_wt", "gross_wt", "per_pkg", "pkg_l", "pkg_w", "pkg_h")
+    COLUMNS = TEXT + NUMERIC + PACKING
+
+    # Editor frame column → packing column
+    FRAME_PACKING = {"Net Wt": "net_wt", "Gross Wt": "gross_wt", "Units/Pkg": "per_pkg",
+                     "Length": "pkg_l", "Width": "pkg_w", "Height": "pkg_h"}
+
+    def __init__(self, desc=(), hs=(), unit=(), qty=(), price=(), total=None,
+                 net_wt=None, gross_wt=None, per_pkg=None, pkg_l=None, pkg_w=None, pkg_h=None):
+        self.desc  = np.asarray(desc, dtype=object)
+        self.hs    = np.asarray(hs, dtype=object)
+        self.unit  = np.asarray(unit, dtype=object)
+        self.qty   = np.asarray(qty, dtype=np.float64)
+        self.price = np.asarray(price, dtype=np.float64)
+        self.total = (np.round(self.qty * self.price, 2) if total is None
+                      else np.asarray(total, dtype=np.float64))
+        for c, values in zip(self.PACKING, (net_wt, gross_wt, per_pkg, pkg_l, pkg_w, pkg_h)):
+            setattr(self, c, np.zeros(len(self.desc)) if values is None
+                    else np.asarray(values, dtype=np.float64))
+        n = len(self.desc)
+        if any(len(getattr(self, c)) != n for c in self.COLUMNS):
+            raise ValueError("ItemTable: columns must all have the same length")
+        # Columns are shared between tables (see replace), so none may change in place
+        for c in self.COLUMNS:
+            getattr(self, c).flags.writeable = False
+        self._digest = None
+        self._row_digests = None
+
+    # — Conversion ———————————————————————————————————————————
+    @classmethod
+    def from_records(cls, items) -> "ItemTable":
+        # Tables, and file-backed tables (itemfile.ItemFile), are used as they are
+        if hasattr(items, "chunks"):
+            return items
+        items = list(items)
+        return cls(
+            desc=[str(it["desc"]) for it in items],
+            hs=[str(it["hs"]) for it in items],
+            unit=[str(it["unit"]) for it in items],
+            qty=[it["qty"] for it in items],
+            price=[it["price"] for it in items],
+            # total is optional in files from other systems; computed when absent
+            total=([it["total"] for it in items]
+                   if all("total" in it for it in items) else None),
+            # so is packing data, which is 0 where a row lacks it
+            **{c: [it.get(c) or 0 for it in items]
+               for c in cls.PACKING if any(it.get(c) for it in items)},
+        )
+
+    @classmethod
+    def from_frame(cls, df) -> "ItemTable":
+        """Items from the editor frame, dropping rows with no description, qty or price."""
+        desc  = df["Description"].fillna("").astype(str).to_numpy(dtype=object)
+        qty   = df["Quantity"].fillna(0).to_numpy(dtype=np.float64)
+        price = df["Unit Price"].fillna(0).to_numpy(dtype=np.float64)
+        keep  = (desc != "") | (qty != 0) | (price != 0)
+        return cls(
+            desc=desc[keep],
+            hs=df["HS Code"].fillna("").astype(str).to_numpy(dtype=object)[keep],
+            unit=df["Unit"].fillna("").astype(str).to_numpy(dtype=object)[keep],
+            qty=qty[keep],
+            price=np.round(price[keep], 2),
+            total=np.round(qty[keep] * price[keep], 2),
+            **{c: df[name].fillna(0).to_numpy(dtype=np.float64)[keep]
+               for name, c in cls.FRAME_PACKING.items() if name in df},
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        """The editor frame of this table (the inverse of from_frame)."""
+        frame = {"Description": self.desc, "HS Code": self.hs, "Quantity": self.qty,
+                 "Unit": self.unit, "Unit Price": self.price}
+        frame.update({name: getattr(self, c) for name, c in self.FRAME_PACKING.items()})
+        # Copied: the columns are read-only and may be shared with other tables,
+        # and pandas before 3 would otherwise let edits write through to them
+        return pd.DataFrame(frame, copy=True)
+
+    def to_records(self) -> list:
+        return list(self)
+
+    # — Sequence protocol ————————————————————————————————————
+    def __len__(self):
+        return len(self.desc)
+
+    def __getitem__(self, i):
+        if isinstance(i, (int, np.integer)):
+            return {
+                "desc": self.desc[i], "hs": self.hs[i],
+                "qty": float(self.qty[i]), "unit": self.unit[i],
+                "price": float(self.price[i]), "total": float(self.total[i]),
+                **{c: float(getattr(self, c)[i]) for c in self.PACKING},
+            }
+        return self.take(i)
+
+    def __iter__(self):
+        keys = ("desc", "hs", "qty", "unit", "price", "total") + self.PACKING
+        for row in zip(self.desc, self.hs, self.qty.tolist(), self.unit,
+                       self.price.tolist(), self.total.tolist(),
+                       *(getattr(self, c).tolist() for c in self.PACKING)):
+            yield dict(zip(keys, row))
+
+    def replace(self, **columns) -> "ItemTable":
+        """A table with the given columns replaced. The other columns are shared
+        with this table, not copied, so clones of a template cost almost nothing
+        until they diverge. total is recomputed when qty or price change
+        without one."""
+        unknown = set(columns) - set(self.COLUMNS)
+        if unknown:
+            raise TypeError(f"ItemTable: unknown column(s) {sorted(unknown)}")
+        if not columns:
+            return self
+        merged = {c: getattr(self, c) for c in self.COLUMNS}
+        merged.update(columns)
+        if ("qty" in columns or "price" in columns) and "total" not in columns:
+            merged["total"] = None
+        return ItemTable(**merged)
+
+    def chunks(self, rows: int = None):
+        """The table in slices of at most `rows` rows (views, not copies); the
+        whole table at once by default. File-backed tables are only ever
+        read this way, so code that loops over chunks handles both."""
+        if rows is None or len(self) <= rows:
+            yield self
+            return
+        for start in range(0, len(self), rows):
+            yield self.take(slice(start, start + rows))
+
+    def take(self, index) -> "ItemTable":
+        """Rows selected by a slice, boolean mask or index array."""
+        return ItemTable(**{c: getattr(self, c)[index] for c in self.COLUMNS})
+
+    def aggregate_hs(self) -> "ItemTable":
+        """One row per (HS code, unit) with summed quantity and value, in first-seen order.
+
+        Unit weights become the group's quantity-weighted averages, so line
+        weights still add up; package sizes do not carry over to a group.
+        """
+        if not len(self):
+            return self
+        codes, _ = pd.factorize(pd.Series(self.hs.astype(str)) + "\x1f" + self.unit.astype(str))
+        n = codes.max() + 1
+        first = np.full(n, len(self), dtype=np.int64)
+        np.minimum.at(first, codes, np.arange(len(self)))
+        count = np.bincount(codes, minlength=n)
+        qty   = np.bincount(codes, weights=self.qty, minlength=n)
+        total = np.round(np.bincount(codes, weights=self.total, minlength=n), 2)
+        weights = {c: np.bincount(codes, weights=self.qty * getattr(self, c), minlength=n)
+                   for c in ("net_wt", "gross_wt")}
+        with np.errstate(divide="ignore", invalid="ignore"):
+            price = np.where(qty != 0, np.round(total / qty, 2), 0.0)
+            weights = {c: np.where(qty != 0, w / qty, 0.0) for c, w in weights.items()}
+        desc = [d if c == 1 else f"{d} (+{c - 1} more)"
+                for d, c in zip(self.desc[first], count.tolist())]
+        return ItemTable(desc=desc, hs=self.hs[first], unit=self.unit[first],
+                         qty=qty, price=price, total=total, **weights)
+
+    def digest(self) -> str:
+        """Content hash of the table, used when it is part of a store key."""
+        if self._digest is None:
+            h = hashlib.sha256()
+            for c in self.TEXT:
+                h.update("\x1f".join(getattr(self, c)).encode())
+                h.update(b"\x1e")
+            for c in self.NUMERIC + self.PACKING:
+                h.update(getattr(self, c).tobytes())
+            self._digest = h.hexdigest()
+        return self._digest
+
+    def row_digests(self) -> np.ndarray:
+        """16-byte content digest of every row (a void array), computed once per table."""
+        if self._row_digests is None:
+            numeric = self.NUMERIC + self.PACKING
+            numbers = np.column_stack([getattr(self, c) for c in numeric]).astype("<f8").tobytes()
+            width = 8 * len(numeric)
+            out = np.empty(len(self), dtype="V16")
+            for i, (desc, hs, unit) in enumerate(zip(self.desc, self.hs, self.unit)):
+                h = hashlib.blake2b(f"{desc}\x1f{hs}\x1f{unit}".encode(), digest_size=16)
+                h.update(numbers[i * width:(i + 1) * width])
+                out[i] = h.digest()
+            out.flags.writeable = False
+            self._row_digests = out
+        return self._row_digests
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the table, strings included."""
+        n = sum(getattr(self, c).nbytes for c in self.COLUMNS)
+        seen = set()
+        for c in self.TEXT:
+            for s in getattr(self, c):
+                if id(s) not in seen:
+                    seen.add(id(s))
+                    n += s.__sizeof__()
+        return n
+
+    def __repr__(self):
+        return f"ItemTable({len(self)} rows)"
+
+
+class Shipment:
+    __slots__ = ("exporter", "consignee", "details", "items")
+
+    def __init__(self, exporter: Exporter, consignee: Consignee,
+                 details: ShipmentDetails, items: ItemTable):
+        self.exporter  = exporter
+        self.consignee = consignee
+        self.details   = details
+        self.items     = items
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Shipment":
+        return cls(
+            exporter=Exporter.from_dict(d["exporter"]),
+            consignee=Consignee.from_dict(d["consignee"]),
+            details=ShipmentDetails.from_dict(d["shipment"]),
+            items=ItemTable.from_records(d["items"]),
+        )
+
+    def to_dict(self, records: bool = False) -> dict:
+        """The dict schema; items stay an ItemTable unless records=True."""
+        return {
+            "exporter":  self.exporter.to_dict(),
+            "consignee": self.consignee.to_dict(),
+            "shipment":  self.details.to_dict(),
+            "items":     self.items.to_records() if records else self.items,
+        }
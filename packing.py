@@ -0,0 +1,106 @@
+"""Package counts and weights from per-item packing data
+An item row may carry its net and gross weight per unit (kg), the number of
+units packed per package and the package's outer dimensions (cm). The
+shipment's packages, net and gross weight, volume, volumetric weight and
+chargeable weight are worked out from those columns with whole-array
+operations, so a table of a million rows costs a few array passes.
+
+Every figure is additive over rows, so totals of a table can be kept up to
+date from the totals of the rows that changed (see the app's item editor).
+A figure is taken from the items when any row supplies it, and replaces
+whatever was typed into the form; rows that lack it count as zero, and
+validation flags them.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+from model import ItemTable
+
+# Air-freight volumetric weight: cm³ per kg (IATA)
+VOLUMETRIC_DIVISOR = 6000.0
+
+# Additive per-row figures, in the order of sums()
+FIGURES = ("packages", "net", "gross", "volume_cm3")
+
+
+class Totals(NamedTuple):
+    packages: int
+    net: float           # kg
+    gross: float         # kg
+    volume: float        # m³
+    volumetric: float    # kg
+    chargeable: float    # kg: the greater of gross and volumetric weight
+
+
+def packages(items: ItemTable) -> np.ndarray:
+    """Packages needed for every row; 0 where units per package is not known."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Rounded first so that e.g. 1.1 / 0.1 (11.000000000000002) is 11 packages, not 12
+        need = np.ceil(np.round(items.qty / items.per_pkg, 9))
+    return np.where(items.per_pkg > 0, need, 0.0)
+
+
+def line_figures(items: ItemTable) -> dict:
+    """FIGURES → per-row array."""
+    count = packages(items)
+    return {
+        "packages":   count,
+        "net":        items.qty * items.net_wt,
+        "gross":      items.qty * items.gross_wt,
+        "volume_cm3": count * items.pkg_l * items.pkg_w * items.pkg_h,
+    }
+
+
+def sums(items) -> np.ndarray:
+    """Column sums of line_figures(), in FIGURES order, a chunk of rows at a time."""
+    out = np.zeros(len(FIGURES))
+    for chunk in ItemTable.from_records(items).chunks():
+        lines = line_figures(chunk)
+        out += [lines[f].sum() for f in FIGURES]
+    return out
+
+
+def totals(figure_sums) -> Totals:
+    packages_, net, gross, volume_cm3 = (float(v) for v in figure_sums)
+    volumetric = volume_cm3 / VOLUMETRIC_DIVISOR
+    return Totals(int(round(packages_)), round(net, 3), round(gross, 3),
+                  round(volume_cm3 / 1e6, 3), round(volumetric, 2),
+                  round(max(gross, volumetric), 2))
+
+
+def _number(value):
+    try:
+        return float(str(value).replace(",", ""))
+    except ValueError:
+        return None
+
+
+def apply_packing(ship: dict, items) -> Totals:
+    """Fill in the shipment's package and weight fields from the items.
+
+    Sets numPackages, netWeight, grossWeight and volume from the items that
+    supply them, and always sets chargeableWeight: the greater of the gross
+    and volumetric weights, or the gross weight as given when there are no
+    package dimensions.
+    """
+    s = sums(items)
+    t = totals(s)
+    packages_, net, gross, volume_cm3 = s > 0
+    if packages_:
+        ship["numPackages"] = str(t.packages)
+    if net:
+        ship["netWeight"] = f"{t.net:.2f}"
+    if gross:
+        ship["grossWeight"] = f"{t.gross:.2f}"
+    ship["volume"] = f"{t.volume:.3f}" if volume_cm3 else ""
+    ship["volumetricWeight"] = f"{t.volumetric:.2f}" if volume_cm3 else ""
+    given = _number(ship.get("grossWeight", ""))
+    if volume_cm3 and given is not None:
+        ship["chargeableWeight"] = f"{max(given, t.volumetric):.2f}"
+    elif volume_cm3 and not str(ship.get("grossWeight", "")).strip():
+        ship["chargeableWeight"] = f"{t.volumetric:.2f}"
+    else:
+        ship["chargeableWeight"] = ship.get("grossWeight", "")
+    return t
@@ -0,0 +1,69 @@
+"""Exchange-rate tables for reporting-currency conversion
+A rate table is a local JSON file:
+    {"version": "2026-10-01", "base": "USD", "rates": {"USD": 1.0, "EUR": 0.92, ...}}
+where each rate is units of that currency per one unit of the base. Tables
+are parsed once and cached in memory until the file changes on disk.
+"""
+
+import json
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+import config
+
+
+class RateTable:
+    __slots__ = ("version", "base", "rates")
+
+    def __init__(self, version: str, base: str, rates: dict):
+        self.version = version
+        self.base = base
+        self.rates = {k: float(v) for k, v in rates.items()}
+
+    def rate(self, src: str, dst: str):
+        """Units of dst per unit of src, or None if either currency is missing."""
+        if src == dst:
+            return 1.0
+        if src not in self.rates or dst not in self.rates:
+            return None
+        return self.rates[dst] / self.rates[src]
+
+
+@lru_cache(maxsize=4)
+def _load(path: str, mtime_ns: int) -> RateTable:
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    return RateTable(str(raw["version"]), raw["base"], raw["rates"])
+
+
+def load_rates(path=None) -> RateTable:
+    path = Path(path or config.RATES_FILE)
+    return _load(str(path), path.stat().st_mtime_ns)
+
+
+def convert(amounts, rate: float):
+    """Amount column(s) in the reporting currency, rounded to cents."""
+    return np.round(np.asarray(amounts, dtype=np.float64) * rate, 2)
+
+
+def apply_reporting(ship: dict, table: RateTable = None):
+    """Fill reportingRate / rateVersion on a shipment dict that asks for a reporting currency.
+
+    The rate is left empty when the table has no rate for the pair, which
+    validation reports as an error.
+    """
+    rep = ship.get("reportingCurrency")
+    if not rep or rep == ship.get("currency"):
+        ship["reportingCurrency"], ship["reportingRate"], ship["rateVersion"] = "", "", ""
+        return ship
+    try:
+        table = table or load_rates()
+    except (OSError, ValueError, KeyError):
+        ship["reportingRate"], ship["rateVersion"] = "", ""
+        return ship
+    rate = table.rate(ship.get("currency", ""), rep)
+    ship["reportingRate"] = rate if rate is not None else ""
+    ship["rateVersion"] = table.version
+    return ship
@@ -0,0 +1,273 @@
+"""Cross-document reconciliation
+Reads the key figures back out of generated documents (invoice number,
+invoice total and its amount in words, sum insured, packages, weights,
+volume, country of origin) and checks every occurrence against the shipment data
+they were rendered from. Extraction is one regex pass per document; the
+comparison runs over all figures of a whole batch of shipments at once.
+
+    python reconcile.py shipment1.json shipment2.json ...
+"""
+
+import bisect
+import json
+import re
+import sys
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from documents import DOC_REGISTRY, PAGE_DIVIDER, na, number_to_words, render_documents
+from i18n import labels
+from model import ItemTable
+
+# Figure → how it is compared ("number" also checks the text in front of it,
+# e.g. the currency code; "text" compares whitespace-normalized text)
+FIGURES = {
+    "invoice":     "text",
+    "total":       "number",
+    "total_words": "text",
+    "insured":     "number",
+    "packages":    "number",
+    "gross":       "number",
+    "net":         "number",
+    "chargeable":  "number",
+    "volume":      "number",
+    "origin":      "text",
+}
+_FIGURE_INDEX = {name: i for i, name in enumerate(FIGURES)}
+
+# Label id (see i18n) → figure stated next to that label
+LABEL_FIGURES = {
+    "invoice_no":        "invoice",
+    "total":             "total",
+    "invoice_value":     "total",
+    "total_fob_value":   "total",
+    "amount":            "total",
+    "total_in_words":    "total_words",
+    "in_words":          "total_words",
+    "sum_insured":       "insured",
+    "no_of_packages":    "packages",
+    "no_of_pieces":      "packages",
+    "gross_weight":      "gross",
+    "net_weight":        "net",
+    "chargeable_weight": "chargeable",
+    "volume":            "volume",
+    "country_of_origin": "origin",
+}
+
+# Figures stated in running text rather than next to a label, by document
+_PHRASES = {
+    # The English wording, which ends at the paragraph or, when bilingual, at the separator
+    "certificate_origin": [("origin", re.compile(r"originated in ([^<]*?)\.(?:</div>| / )"))],
+    "free_sale":          [("origin", re.compile(r"distributed in\s+([^<]*?)\s+without"))],
+    "bill_exchange":      [("total",  re.compile(r"The sum of <strong>([^<]*)</strong>"))],
+}
+
+# End of a label and the value after it: "<span class="doc-label">Label:</span> value",
+# "<strong>Label:</strong> value" and table footers "<th ...>Label:</th> <th>value</th>".
+# Patterns that start with a literal are scanned for far faster than ones that don't.
+_LABEL_END = re.compile(r":</(?:span|strong|th)>\s*(?:<th>)?([^<]*)")
+
+_NUMBER = r"^\s*(?P<prefix>[^\d<]*?)\s*(?P<number>-?\d[\d,]*(?:\.\d+)?)"
+
+# Amounts are printed to the cent
+TOLERANCE = 0.005
+
+
+class Mismatch(NamedTuple):
+    document: str
+    figure: str
+    expected: str
+    found: str            # "" when the document does not state the figure at all
+
+
+class ReconciliationReport:
+    __slots__ = ("mismatches", "checked")
+
+    def __init__(self, mismatches=None, checked: int = 0):
+        self.mismatches = mismatches or []
+        self.checked = checked
+
+    @property
+    def ok(self) -> bool:
+        return not self.mismatches
+
+    def to_dict(self) -> dict:
+        return {"ok": self.ok, "checked": self.checked,
+                "mismatches": [m._asdict() for m in self.mismatches]}
+
+
+@lru_cache(maxsize=None)
+def _label_figures(lang: str) -> dict:
+    # Label text as rendered for `lang` → figure
+    t = labels(lang)
+    return {t[key]: figure for key, figure in LABEL_FIGURES.items() if key in t}
+
+
+def extract(html: str, keys: list, lang: str = "") -> list:
+    """(document key, figure, text) for every figure stated in the combined
+    HTML of the documents `keys`, as returned by render_documents()."""
+    by_label = _label_figures(lang or "")
+    # One scan of the whole shipment; a figure belongs to the document its position falls in
+    bounds = [m.start() for m in re.finditer(re.escape(PAGE_DIVIDER), html)]
+    found = []
+    for m in _LABEL_END.finditer(html):
+        end = m.start()
+        figure = by_label.get(html[html.rfind(">", 0, end) + 1:end])
+        if figure:
+            found.append((keys[bisect.bisect(bounds, end)], figure, m[1]))
+    starts = [0] + [b + len(PAGE_DIVIDER) for b in bounds]
+    for key, start, end in zip(keys, starts, bounds + [len(html)]):
+        for figure, pattern in _PHRASES.get(key, ()):
+            found += [(key, figure, m[1]) for m in pattern.finditer(html, start, end)]
+    return found
+
+
+@lru_cache(maxsize=None)
+def document_figures(key: str) -> frozenset:
+    """Figures the `key` template states when every shipment field is filled in."""
+    probe = {
+        "exporter":  {"name": "E"},
+        "consignee": {"name": "C"},
+        "shipment":  {"invoiceNumber": "1", "invoiceDate": "2000-01-01", "currency": "USD",
+                      "countryOrigin": "X", "numPackages": "1", "grossWeight": "1",
+                      "netWeight": "1"},
+        "items":     [{"desc": "x", "hs": "1", "qty": 1, "unit": "PCS", "price": 1, "total": 1}],
+    }
+    gen = {k: fn for k, _, fn, _ in DOC_REGISTRY}[key]
+    return frozenset(figure for _, figure, _ in extract(gen(probe), [key]))
+
+
+def _to_float(value) -> float:
+    try:
+        return float(str(value).replace(",", ""))
+    except ValueError:
+        return np.nan
+
+
+def _expected(shipments: list) -> tuple:
+    """(numbers, prefixes, texts): figure × shipment arrays of what the documents must state."""
+    tables = [ItemTable.from_records(d["items"]) for d in shipments]
+    # Memory-mapped item files are summed where they lie; only in-memory tables are concatenated
+    in_memory = [isinstance(t, ItemTable) for t in tables]
+    lengths = np.array([len(t) if m else 0 for t, m in zip(tables, in_memory)], dtype=np.int64)
+    owner = np.repeat(np.arange(len(tables)), lengths)
+    line_totals = (np.concatenate([t.total for t, m in zip(tables, in_memory) if m])
+                   if lengths.sum() else np.zeros(0))
+    # float64 even when there are no in-memory lines: bincount of nothing comes back as integers
+    totals = np.bincount(owner, weights=line_totals, minlength=len(tables)).astype(np.float64)
+    for i, m in enumerate(in_memory):
+        if not m:
+            totals[i] = float(tables[i].total.sum())
+
+    ships = [d["shipment"] for d in shipments]
+    cur = np.array([s.get("currency", "") for s in ships], dtype=object)
+    raw = {f: [s.get(key, "") for s in ships]
+           for f, key in [("packages", "numPackages"), ("gross", "grossWeight"),
+                          ("net", "netWeight"), ("volume", "volume")]}
+    # Shipments from before packing.py have no chargeable weight; the AWB prints gross then
+    raw["chargeable"] = [s.get("chargeableWeight") or g for s, g in zip(ships, raw["gross"])]
+
+    n = len(shipments)
+    numbers = np.full((len(FIGURES), n), np.nan)
+    prefixes = np.full((len(FIGURES), n), "", dtype=object)
+    texts = np.full((len(FIGURES), n), "", dtype=object)
+    idx = _FIGURE_INDEX
+    numbers[idx["total"]], prefixes[idx["total"]] = totals, cur
+    numbers[idx["insured"]], prefixes[idx["insured"]] = np.round(totals * 1.1, 2), cur
+    for figure, values in raw.items():
+        numbers[idx[figure]] = [_to_float(v) if str(v).strip() else np.nan for v in values]
+        texts[idx[figure]] = [na(v) for v in values]
+    texts[idx["total"]] = [f"{c} {t:.2f}" for c, t in zip(cur, totals)]
+    texts[idx["insured"]] = [f"{c} {t:.2f}" for c, t in zip(cur, numbers[idx["insured"]])]
+    texts[idx["invoice"]] = [str(s.get("invoiceNumber", "")) for s in ships]
+    only = [labels(d["consignee"].get("language") or "")["only"] for d in shipments]
+    texts[idx["total_words"]] = [f"{number_to_words(t)} {c} {o}" for c, t, o in zip(cur, totals, only)]
+    texts[idx["origin"]] = [na(s.get("countryOrigin")) for s in ships]
+    return numbers, prefixes, texts
+
+
+def reconcile_batch(shipments: list, keys: list, htmls: list) -> list:
+    """One ReconciliationReport per shipment.
+
+    keys[i] lists the documents rendered for shipments[i] and htmls[i] is
+    their combined HTML as returned by render_documents().
+    """
+    rows = [(i, *row) for i, (d, doc_keys, html) in enumerate(zip(shipments, keys, htmls))
+            for row in extract(html, doc_keys, d["consignee"].get("language", ""))]
+    found = pd.DataFrame(rows, columns=["ship", "document", "figure", "text"])
+    want = pd.DataFrame(
+        [(i, key, figure) for i, doc_keys in enumerate(keys)
+         for key in doc_keys for figure in sorted(document_figures(key))],
+        columns=["ship", "document", "figure"])
+    numbers, prefixes, texts = _expected(shipments)
+
+    # Every occurrence against the source value, all shipments at once
+    ship = found["ship"].to_numpy(dtype=np.int64)
+    fig = found["figure"].map(_FIGURE_INDEX).to_numpy(dtype=np.int64)
+    text = found["text"].str.replace(r"\s+", " ", regex=True).str.strip()
+    parsed = text.str.extract(_NUMBER)
+    got = pd.to_numeric(parsed["number"].str.replace(",", ""), errors="coerce").to_numpy()
+    want_num, want_prefix, want_text = numbers[fig, ship], prefixes[fig, ship], texts[fig, ship]
+    is_number = np.array([FIGURES[f] == "number" for f in FIGURES])[fig]
+    blank = np.isnan(want_num)
+    text = text.to_numpy(dtype=object)
+    ok = np.where(
+        is_number & ~blank,
+        np.isclose(got, want_num, rtol=0, atol=TOLERANCE)
+        & (parsed["prefix"].fillna("").to_numpy(dtype=object) == want_prefix),
+        False)
+    # Blank or unparseable source numbers are printed as given, e.g. "N/A KG"
+    loose = np.flatnonzero(is_number & blank)
+    ok[loose] = [text[j].startswith(want_text[j]) for j in loose]
+    strict = ~is_number
+    ok[strict] = text[strict] == want_text[strict]
+
+    reports = [ReconciliationReport() for _ in shipments]
+    for i, n in zip(*np.unique(ship, return_counts=True)):
+        reports[i].checked = int(n)
+    for j in np.flatnonzero(~ok):
+        reports[ship[j]].mismatches.append(Mismatch(
+            found["document"].iat[j], found["figure"].iat[j], str(want_text[j]), str(text[j])))
+
+    # Figures a template states but that are missing from its output
+    missing = want.merge(found[["ship", "document", "figure"]].drop_duplicates(),
+                         how="left", indicator=True)
+    missing = missing[missing["_merge"] == "left_only"]
+    for i, key, figure in missing[["ship", "document", "figure"]].itertuples(index=False):
+        reports[i].mismatches.append(
+            Mismatch(key, figure, str(texts[_FIGURE_INDEX[figure], i]), ""))
+    return reports
+
+
+def reconcile(d: dict, keys: list, html: str) -> ReconciliationReport:
+    return reconcile_batch([d], [keys], [html])[0]
+
+
+if __name__ == "__main__":
+    from model import Shipment
+    from packing import apply_packing
+    from rates import apply_reporting
+
+    paths = sys.argv[1:]
+    shipments, keys, htmls = [], [], []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            raw = json.load(f)
+        d = Shipment.from_dict(raw).to_dict()
+        apply_reporting(d["shipment"])
+        apply_packing(d["shipment"], d["items"])
+        doc_keys = list(raw.get("documents") or [k for k, *_ in DOC_REGISTRY])
+        shipments.append(d)
+        keys.append(doc_keys)
+        htmls.append(render_documents(d, doc_keys, raw.get("aggregate", ())))
+    failed = 0
+    for path, report in zip(paths, reconcile_batch(shipments, keys, htmls)):
+        failed += not report.ok
+        for m in report.mismatches:
+            print(f"{path}: {m.document}: {m.figure} should read {m.expected!r}, "
+                  f"found {m.found or 'nothing'!r}")
+    print(f"{len(paths)} shipment(s) reconciled, {failed} with mismatches")
+    sys.exit(1 if failed else 0)
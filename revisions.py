@@ -0,0 +1,522 @@
+"""Shipment revision history
+Every save of a shipment becomes a revision in a local SQLite database.
+Item rows are stored once, under a 16-byte digest of their content, and a
+revision holds its header fields (exporter, consignee, shipment) plus the
+digests of its rows in order, so amending a few lines of a long invoice
+adds a few rows and one short record.
+
+A shipment can also be saved as a named template. Cloning a template for a
+repeat order copies its header and shares its item table: ItemTable columns
+are read-only, so the template and every clone hold the same arrays (and
+the same row digests) until one of them replaces a column. Saving a batch
+of clones stores their shared rows once.
+
+A shipment whose items are an attached item file (itemfile.ItemFile) is
+stored by reference instead: the header records the file's path and content
+digest, and loading it re-opens the file, refusing one that has since gone
+or changed.
+
+Two revisions (or any two shipment dicts) are compared structurally: changed
+header fields, and added, removed and edited item rows. The diff is worked
+out on the digest arrays, and only rows that differ are read back.
+affected_documents() turns a diff into the documents that actually change,
+so those can be re-rendered and the rest reused.
+"""
+
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from documents import DOC_REGISTRY
+from itemfile import ItemFile
+from model import ItemTable
+
+SECTIONS = ("exporter", "consignee", "shipment")
+ROW_COLUMNS = ItemTable.COLUMNS
+DIGEST_SIZE = 16
+# Header key of an item-file reference
+ITEM_FILE = "itemFile"
+_DIGEST = np.dtype(f"V{DIGEST_SIZE}")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS item_rows (
+    digest BLOB PRIMARY KEY,
+    desc TEXT, hs TEXT, unit TEXT, qty REAL, price REAL, total REAL,
+    net_wt REAL NOT NULL DEFAULT 0, gross_wt REAL NOT NULL DEFAULT 0,
+    per_pkg REAL NOT NULL DEFAULT 0, pkg_l REAL NOT NULL DEFAULT 0,
+    pkg_w REAL NOT NULL DEFAULT 0, pkg_h REAL NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS revisions (
+    id        INTEGER PRIMARY KEY,
+    shipment  TEXT NOT NULL,
+    saved     TEXT NOT NULL,
+    invoice   TEXT,
+    consignee TEXT,
+    items     INTEGER,
+    header    TEXT NOT NULL,
+    rows      BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS revisions_shipment ON revisions(shipment, id);
+CREATE TABLE IF NOT EXISTS templates (
+    name   TEXT PRIMARY KEY,
+    saved  TEXT NOT NULL,
+    items  INTEGER,
+    header TEXT NOT NULL,
+    rows   BLOB NOT NULL
+);
+"""
+
+# Databases from before the packing columns get them added, as 0
+_ADDED_ROW_COLUMNS = ItemTable.PACKING
+
+# SQLite's default limit on host parameters per statement is 999
+_IN_CHUNK = 900
+
+
+def shipment_key(d: dict) -> str:
+    """Revisions of one shipment share its exporter and invoice number."""
+    return f"{d['exporter'].get('name', '')}\x1f{d['shipment'].get('invoiceNumber', '')}"
+
+
+def row_digests(items) -> np.ndarray:
+    """Content digest of every item row, as a 16-byte void array (cached on the table)."""
+    return ItemTable.from_records(items).row_digests()
+
+
+def _header(d: dict, ref: dict = None) -> str:
+    header = {s: dict(d[s]) for s in SECTIONS}
+    if ref:
+        header[ITEM_FILE] = ref
+    return json.dumps(header, sort_keys=True, default=str)
+
+
+def _item_file_ref(items) -> dict:
+    """Header reference to a file-backed item table; None for one held in memory."""
+    if isinstance(items, ItemFile):
+        return {"path": str(items.path), "digest": items.digest()}
+    return None
+
+
+def _open_item_file(ref: dict) -> ItemFile:
+    # FileNotFoundError once the file is gone, ValueError once its content changed
+    return ItemFile(ref["path"], ref["digest"])
+
+
+def clone_data(d: dict, changes: dict = None) -> dict:
+    """A new shipment dict from d for a repeat order.
+
+    Header sections are copied and updated from the same sections of
+    `changes`; the item table is shared with d unless `changes` has "items".
+    """
+    changes = changes or {}
+    out = {s: {**d.get(s, {}), **changes.get(s, {})} for s in SECTIONS}
+    out["items"] = ItemTable.from_records(changes["items"] if "items" in changes else d["items"])
+    return out
+
+
+# ── Diff ──────────────────────────────────────────────────────────────────────
+class Diff:
+    """Structural difference between two versions of a shipment.
+
+    fields:  {"section.field": (old, new)}
+    added:   [(row number in new, row dict)]
+    removed: [(row number in old, row dict)]
+    edited:  [(row number in old, row number in new, {column: (old, new)})]
+    reordered: whether the rows both versions have are in a different order
+    """
+    __slots__ = ("fields", "added", "removed", "edited", "reordered")
+
+    def __init__(self, fields=None, added=None, removed=None, edited=None, reordered=False):
+        self.fields = fields or {}
+        self.added = added or []
+        self.removed = removed or []
+        self.edited = edited or []
+        self.reordered = reordered
+
+    @property
+    def empty(self) -> bool:
+        return not (self.fields or self.added or self.removed or self.edited or self.reordered)
+
+    def inputs(self) -> set:
+        """Names of the inputs that changed, as used by document_inputs()."""
+        changed = set(self.fields)
+        for _, _, columns in self.edited:
+            changed.update(f"items.{c}" for c in columns)
+        if self.added or self.removed or self.reordered:
+            changed.add("items.rows")
+        return changed
+
+    def to_dict(self) -> dict:
+        return {"fields": {k: list(v) for k, v in self.fields.items()},
+                "added": self.added, "removed": self.removed, "edited": self.edited,
+                "reordered": self.reordered}
+
+    def __repr__(self):
+        return (f"Diff({len(self.fields)} field(s), +{len(self.added)} -{len(self.removed)} "
+                f"~{len(self.edited)} row(s){', reordered' if self.reordered else ''})")
+
+
+def _field_changes(old: dict, new: dict) -> dict:
+    changes = {}
+    for section in SECTIONS:
+        a, b = old.get(section, {}), new.get(section, {})
+        for field in sorted(set(a) | set(b)):
+            if str(a.get(field, "")) != str(b.get(field, "")):
+                changes[f"{section}.{field}"] = (a.get(field, ""), b.get(field, ""))
+    return changes
+
+
+def _digest_ids(digests: np.ndarray) -> np.ndarray:
+    """Per row, a number shared by equal digests (hashed by 64-bit words, much
+    faster than sorting 16-byte values)."""
+    words = np.ascontiguousarray(digests).view("<u8").reshape(-1, 2)
+    ids, uniques = pd.factorize(words[:, 0])
+    # The first word alone nearly always tells digests apart; check the second
+    first = np.empty(len(uniques), dtype=np.int64)
+    first[ids[::-1]] = np.arange(len(ids))[::-1]
+    if (words[:, 1] == words[first[ids], 1]).all():
+        return ids
+    lo, lo_uniques = pd.factorize(words[:, 1])
+    return pd.factorize(ids * len(lo_uniques) + lo)[0]
+
+
+def _surplus(ids: np.ndarray, other_counts: np.ndarray) -> np.ndarray:
+    """Mask of the occurrences of each id beyond its count in the other version."""
+    rank = pd.Series(ids).groupby(ids).cumcount().to_numpy()
+    return rank >= other_counts[ids]
+
+
+def _row_changes(old_digests, new_digests, rows_of) -> tuple:
+    """(added, removed, edited, reordered) from two digest arrays.
+
+    Rows are compared as sequences: a row repeated fewer or more times counts
+    as removed or added, and rows both versions keep in a different order set
+    `reordered`. rows_of(side, positions) returns the row dicts at those
+    0-based positions of the old ("old") or new ("new") version; it is only
+    asked for rows that changed. A removed and an added row are taken as one
+    edited row when they share a description, or failing that, a position.
+    """
+    ids = _digest_ids(np.concatenate([old_digests, new_digests]))
+    old_ids, new_ids = ids[:len(old_digests)], ids[len(old_digests):]
+    n = int(ids.max()) + 1 if len(ids) else 0
+    old_extra = _surplus(old_ids, np.bincount(new_ids, minlength=n))
+    new_extra = _surplus(new_ids, np.bincount(old_ids, minlength=n))
+    reordered = not np.array_equal(old_ids[~old_extra], new_ids[~new_extra])
+    gone, came = np.flatnonzero(old_extra), np.flatnonzero(new_extra)
+    old_rows = dict(zip(gone.tolist(), rows_of("old", gone)))
+    new_rows = dict(zip(came.tolist(), rows_of("new", came)))
+
+    pairs = []
+    by_desc = {}
+    for j in came.tolist():
+        by_desc.setdefault(new_rows[j]["desc"], []).append(j)
+    unpaired = []
+    for i in gone.tolist():
+        match = by_desc.get(old_rows[i]["desc"])
+        if match:
+            pairs.append((i, match.pop(0)))
+        else:
+            unpaired.append(i)
+    left = {j for js in by_desc.values() for j in js}
+    for i in unpaired:
+        if i in left:
+            pairs.append((i, i))
+            left.discard(i)
+
+    edited = []
+    for i, j in sorted(pairs):
+        a, b = old_rows.pop(i), new_rows.pop(j)
+        columns = {c: (a[c], b[c]) for c in ROW_COLUMNS if a[c] != b[c]}
+        # Rows stored before a column was added hash differently but read back the same
+        if columns:
+            edited.append((i + 1, j + 1, columns))
+    added = [(j + 1, row) for j, row in sorted(new_rows.items())]
+    removed = [(i + 1, row) for i, row in sorted(old_rows.items())]
+    return added, removed, edited, reordered
+
+
+def diff_data(old: dict, new: dict) -> Diff:
+    """Structural diff between two shipment dicts."""
+    old_items, new_items = ItemTable.from_records(old["items"]), ItemTable.from_records(new["items"])
+    if old_items is new_items or old_items.digest() == new_items.digest():
+        return Diff(_field_changes(old, new))
+    tables = {"old": old_items, "new": new_items}
+    added, removed, edited, reordered = _row_changes(
+        row_digests(old_items), row_digests(new_items),
+        lambda side, at: [tables[side][int(i)] for i in at])
+    return Diff(_field_changes(old, new), added, removed, edited, reordered)
+
+
+# ── Affected documents ────────────────────────────────────────────────────────
+_PROBE = {
+    "exporter":  {"name": "Exporter", "address": "1 Road", "city": "Town", "contact": "123",
+                  "email": "e@x", "iec": "IEC1", "gst": "GST1"},
+    "consignee": {"name": "Consignee", "address": "2 Road", "city": "City", "contact": "456",
+                  "email": "c@x", "language": ""},
+    "shipment":  {"invoiceNumber": "INV1", "invoiceDate": "2000-01-01", "poNumber": "PO1",
+                  "portLoading": "POL", "portDischarge": "POD", "countryOrigin": "Origin",
+                  "incoterms": "CIF", "paymentTerms": "L/C", "vesselName": "Vessel",
+                  "packageType": "Carton", "numPackages": "3", "grossWeight": "12",
+                  "netWeight": "10", "currency": "USD", "reportingCurrency": "EUR",
+                  "reportingRate": 0.9, "rateVersion": "v1", "volume": "0.5",
+                  "volumetricWeight": "80", "chargeableWeight": "80"},
+}
+_PROBE_ITEMS = [
+    {"desc": "Widget", "hs": "8471", "unit": "PCS", "qty": 2.0, "price": 3.0, "total": 6.0,
+     "net_wt": 4.0, "gross_wt": 5.0, "per_pkg": 2.0, "pkg_l": 50.0, "pkg_w": 40.0, "pkg_h": 30.0},
+    {"desc": "Gadget", "hs": "8473", "unit": "PCS", "qty": 1.0, "price": 5.0, "total": 5.0,
+     "net_wt": 1.0, "gross_wt": 2.0, "per_pkg": 1.0, "pkg_l": 20.0, "pkg_w": 20.0, "pkg_h": 20.0},
+]
+
+
+def _changed(value):
+    if isinstance(value, float):
+        return value + 1.5
+    return "es" if value == "" else f"{value}9"
+
+
+@lru_cache(maxsize=None)
+def document_inputs() -> dict:
+    """Document key → the inputs ("section.field", "items.<column>", "items.rows")
+    its output depends on, found by rendering a probe shipment with one input
+    changed at a time."""
+    base = dict(_PROBE, items=_PROBE_ITEMS)
+    variants = {}
+    for section in SECTIONS:
+        for field, value in _PROBE[section].items():
+            variants[f"{section}.{field}"] = dict(
+                base, **{section: dict(_PROBE[section], **{field: _changed(value)})})
+    for column in ROW_COLUMNS:
+        rows = [dict(_PROBE_ITEMS[0], **{column: _changed(_PROBE_ITEMS[0][column])}),
+                *_PROBE_ITEMS[1:]]
+        variants[f"items.{column}"] = dict(base, items=rows)
+    variants["items.rows"] = dict(base, items=_PROBE_ITEMS[:1])
+
+    inputs = {}
+    for key, _, gen, _ in DOC_REGISTRY:
+        html = gen(base)
+        inputs[key] = frozenset(name for name, d in variants.items() if gen(d) != html)
+    return inputs
+
+
+def affected_documents(diff: Diff, keys, aggregate=()) -> list:
+    """The documents among `keys` whose output the diff changes.
+
+    Documents in `aggregate` group items by HS code, so any item change
+    affects them.
+    """
+    changed = diff.inputs()
+    items_changed = any(name.startswith("items.") for name in changed)
+    inputs = document_inputs()
+    return [k for k in keys if inputs[k] & changed or (k in aggregate and items_changed)]
+
+
+# ── Store ─────────────────────────────────────────────────────────────────────
+class RevisionStore:
+    def __init__(self, path):
+        self.path = Path(path)
+        self._ready = False
+        self._lock = threading.Lock()
+        # Template name → ((header, row digests), shipment dict): loaded once, shared
+        # by every clone; keyed on the stored content, so a re-saved template is reloaded
+        self._templates = {}
+
+    @contextmanager
+    def _connect(self):
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    with sqlite3.connect(self.path) as con:
+                        con.execute("PRAGMA journal_mode=WAL")
+                        con.executescript(_SCHEMA)
+                        have = {r[1] for r in con.execute("PRAGMA table_info(item_rows)")}
+                        for c in _ADDED_ROW_COLUMNS:
+                            if c not in have:
+                                con.execute(f"ALTER TABLE item_rows ADD COLUMN {c} "
+                                            "REAL NOT NULL DEFAULT 0")
+                    self._ready = True
+        con = sqlite3.connect(self.path, timeout=30)
+        try:
+            yield con
+        finally:
+            con.close()
+
+    # — Write ————————————————————————————————————————————————
+    @staticmethod
+    def _put_rows(con, items: ItemTable, stored: set) -> np.ndarray:
+        """Insert the rows of items, unless this transaction already did (`stored`
+        holds the ids of tables written so far); their digests."""
+        digests = items.row_digests()
+        if id(items) not in stored:
+            stored.add(id(items))
+            done = 0
+            for chunk in items.chunks():
+                con.executemany(
+                    f"INSERT OR IGNORE INTO item_rows (digest, {', '.join(ROW_COLUMNS)}) "
+                    f"VALUES (?{',?' * len(ROW_COLUMNS)})",
+                    zip(digests[done:done + len(chunk)].tolist(),
+                        *(getattr(chunk, c).tolist() for c in ROW_COLUMNS)))
+                done += len(chunk)
+        return digests
+
+    def save(self, d: dict) -> tuple:
+        """Store d as a new revision; (revision id, whether one was created).
+
+        Saving a shipment unchanged since its latest revision creates
+        nothing and returns that revision.
+        """
+        return self.save_many([d])[0]
+
+    def save_many(self, shipments: list) -> list:
+        """save() a batch of shipments in one transaction.
+
+        Shipments sharing an item table (clones of one template) have its
+        rows hashed and stored once.
+        """
+        saved = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        tables = [ItemTable.from_records(d["items"]) for d in shipments]
+        stored, out = set(), []
+        with self._connect() as con, con:
+            con.execute("BEGIN IMMEDIATE")
+            for d, items in zip(shipments, tables):
+                ref = _item_file_ref(items)
+                header = _header(d, ref)
+                blob = b"" if ref else items.row_digests().tobytes()
+                key = shipment_key(d)
+                last = con.execute("SELECT id, header, rows FROM revisions WHERE shipment = ? "
+                                   "ORDER BY id DESC LIMIT 1", (key,)).fetchone()
+                if last and last[1] == header and last[2] == blob:
+                    out.append((last[0], False))
+                    continue
+                if not ref:
+                    self._put_rows(con, items, stored)
+                cur = con.execute(
+                    "INSERT INTO revisions (shipment, saved, invoice, consignee, items, header, rows) "
+                    "VALUES (?,?,?,?,?,?,?)",
+                    (key, saved, d["shipment"].get("invoiceNumber", ""),
+                     d["consignee"].get("name", ""), len(items), header, blob))
+                out.append((cur.lastrowid, True))
+        return out
+
+    def save_template(self, name: str, d: dict):
+        """Store d as the template `name`, replacing any template of that name."""
+        name = name.strip()
+        if not name:
+            raise ValueError("a template needs a name")
+        items = ItemTable.from_records(d["items"])
+        ref = _item_file_ref(items)
+        header = _header(d, ref)
+        with self._connect() as con, con:
+            con.execute("BEGIN IMMEDIATE")
+            blob = b"" if ref else self._put_rows(con, items, set()).tobytes()
+            con.execute("INSERT OR REPLACE INTO templates VALUES (?,?,?,?,?)",
+                        (name, datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                         len(items), header, blob))
+        self._templates.pop(name, None)
+
+    # — Read —————————————————————————————————————————————————
+    def history(self, d: dict = None, limit: int = 100) -> list:
+        """Revisions, newest first: of d's shipment when given, else of all shipments."""
+        sql = "SELECT id, saved, invoice, consignee, items FROM revisions"
+        args = []
+        if d is not None:
+            sql += " WHERE shipment = ?"
+            args.append(shipment_key(d))
+        with self._connect() as con:
+            rows = con.execute(sql + " ORDER BY id DESC LIMIT ?", (*args, limit)).fetchall()
+        return [dict(zip(("id", "saved", "invoice", "consignee", "items"), r)) for r in rows]
+
+    def _load(self, con, rev_id: int) -> tuple:
+        row = con.execute("SELECT header, rows FROM revisions WHERE id = ?", (rev_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"no revision {rev_id}")
+        return json.loads(row[0]), np.frombuffer(row[1], dtype=_DIGEST)
+
+    @staticmethod
+    def _rows(con, digests) -> list:
+        """Row dicts for digests, in the same order."""
+        wanted = list(dict.fromkeys(digests.tolist()))
+        found = {}
+        for start in range(0, len(wanted), _IN_CHUNK):
+            chunk = wanted[start:start + _IN_CHUNK]
+            for digest, *values in con.execute(
+                    f"SELECT digest, {', '.join(ROW_COLUMNS)} FROM item_rows "
+                    f"WHERE digest IN ({','.join('?' * len(chunk))})", chunk):
+                found[digest] = dict(zip(ROW_COLUMNS, values))
+        return [found[dg] for dg in digests.tolist()]
+
+    def get(self, rev_id: int) -> dict:
+        """The shipment dict saved as revision rev_id. A revision saved with an
+        item file raises FileNotFoundError or ValueError if the file has since
+        been removed or changed."""
+        with self._connect() as con:
+            header, digests = self._load(con, rev_id)
+            ref = header.pop(ITEM_FILE, None)
+            if ref is not None:
+                return dict(header, items=_open_item_file(ref))
+            rows = self._rows(con, digests)
+        return dict(header, items=ItemTable(**{c: [r[c] for r in rows] for c in ROW_COLUMNS}))
+
+    def templates(self) -> list:
+        """Saved templates, by name."""
+        with self._connect() as con:
+            rows = con.execute("SELECT name, saved, items, header FROM templates "
+                               "ORDER BY name").fetchall()
+        out = []
+        for name, saved, items, header in rows:
+            header = json.loads(header)
+            out.append({"name": name, "saved": saved, "items": items,
+                        "consignee": header["consignee"].get("name", "")})
+        return out
+
+    def template(self, name: str) -> dict:
+        """The template `name` as a shipment dict. Its item table is loaded once
+        and shared by every call (and so by every clone); an item file is
+        re-opened, and checked, on every call instead."""
+        with self._connect() as con:
+            row = con.execute("SELECT header, rows FROM templates WHERE name = ?",
+                              (name,)).fetchone()
+            if row is None:
+                raise KeyError(f"no template {name!r}")
+            cached = self._templates.get(name)
+            if cached is None or cached[0] != row:
+                header = json.loads(row[0])
+                ref = header.pop(ITEM_FILE, None)
+                if ref is not None:
+                    return dict(header, items=_open_item_file(ref))
+                rows = self._rows(con, np.frombuffer(row[1], dtype=_DIGEST))
+                items = ItemTable(**{c: [r[c] for r in rows] for c in ROW_COLUMNS})
+                cached = row, dict(header, items=items)
+                self._templates[name] = cached
+        return cached[1]
+
+    def clone(self, name: str, changes: dict = None) -> dict:
+        """A new shipment from the template `name`; see clone_data()."""
+        return clone_data(self.template(name), changes)
+
+    def diff(self, old_id: int, new_id: int) -> Diff:
+        """What changed from revision old_id to revision new_id."""
+        with self._connect() as con:
+            headers, digests, files = {}, {}, {}
+            for side, rev_id in (("old", old_id), ("new", new_id)):
+                headers[side], digests[side] = self._load(con, rev_id)
+                ref = headers[side].pop(ITEM_FILE, None)
+                if ref is not None:
+                    files[side] = _open_item_file(ref)
+                    digests[side] = files[side].row_digests()
+
+            def rows_of(side, at):
+                if side in files:
+                    return [files[side][int(i)] for i in at]
+                return self._rows(con, digests[side][at])
+
+            added, removed, edited, reordered = _row_changes(digests["old"], digests["new"], rows_of)
+        return Diff(_field_changes(headers["old"], headers["new"]), added, removed, edited, reordered)
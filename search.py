@@ -0,0 +1,197 @@
+"""Full-text index of generated documents
+Every generation (from the app or the watch-folder daemon) adds one row to
+a local SQLite database: key fields, the documents produced, HS codes and
+item descriptions, indexed with FTS5. Rows are written in batches inside a
+single transaction, and queries are answered from the inverted index, so
+they stay fast with hundreds of thousands of rows.
+
+    python search.py "consignee:acme hs:8471" --from 2026-04-01 --to 2026-06-30
+"""
+
+import argparse
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import config
+from documents import DOC_REGISTRY
+from model import ItemTable
+from validation import parse_date
+
+DOC_LABELS = {key: label for key, label, _, _ in DOC_REGISTRY}
+
+# Columns of the FTS table; "field:term" in a query searches one of them
+FIELDS = ("invoice", "exporter", "consignee", "documents", "hs", "items")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    id           INTEGER PRIMARY KEY,
+    generated    TEXT NOT NULL,
+    invoice_date TEXT,
+    invoice      TEXT,
+    exporter     TEXT,
+    consignee    TEXT,
+    documents    TEXT,
+    items        INTEGER,
+    source       TEXT
+);
+CREATE INDEX IF NOT EXISTS generations_invoice_date ON generations(invoice_date);
+CREATE VIRTUAL TABLE IF NOT EXISTS generations_fts USING fts5(
+    invoice, exporter, consignee, documents, hs, items,
+    content='', tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+_TERM = re.compile(r"(?:(\w+):)?(\S+)")
+_WORD = re.compile(r"\w+")
+
+
+def _hs_terms(codes) -> str:
+    # HS codes are indexed as bare digits, so 8471, 8471.30 and 847130 all match
+    return " ".join(sorted({re.sub(r"\D", "", str(c)) for c in codes} - {""}))
+
+
+def _iso_date(value) -> str:
+    # Stored ISO so the date range filters compare correctly; kept as given when unparseable
+    parsed = parse_date(value)
+    return parsed.isoformat() if parsed else str(value or "")
+
+
+def index_record(d: dict, keys: list, source: str = "") -> dict:
+    """One index row for a generated shipment dict and the document keys it produced."""
+    items = ItemTable.from_records(d["items"])
+    ship = d["shipment"]
+    return {
+        "generated":    datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "invoice_date": _iso_date(ship.get("invoiceDate", "")),
+        "invoice":      ship.get("invoiceNumber", ""),
+        "exporter":     d["exporter"].get("name", ""),
+        "consignee":    d["consignee"].get("name", ""),
+        "documents":    ",".join(keys),
+        "items":        len(items),
+        "source":       source,
+        "_labels":      " ".join(DOC_LABELS.get(k, k) for k in keys),
+        "_hs":          _hs_terms(hs for chunk in items.chunks() for hs in chunk.hs),
+        "_desc":        "\n".join(str(x) for chunk in items.chunks() for x in chunk.desc),
+    }
+
+
+def match_expr(query: str) -> str:
+    """An FTS5 MATCH expression from a user query; every word is a prefix term.
+
+    Words may be scoped as field:word (e.g. consignee:acme); quoting every
+    term keeps FTS5 operators in user input from being interpreted.
+    """
+    terms = []
+    for field, text in _TERM.findall(query):
+        field = field.lower()
+        if field == "hs":
+            words = [re.sub(r"\D", "", text)]
+        else:
+            words = _WORD.findall(text)
+        words = [w for w in words if w]
+        if not words:
+            continue
+        # Words of one token stay together as a phrase
+        phrase = '"' + " ".join(words) + '"*'
+        terms.append(f"{field} : {phrase}" if field in FIELDS else phrase)
+    return " AND ".join(terms)
+
+
+class SearchIndex:
+    # Column order of the rows returned by search()
+    COLUMNS = ("generated", "invoice_date", "invoice", "exporter", "consignee",
+               "documents", "items", "source")
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._ready = False
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _connect(self):
+        # Short-lived connections: cheap to open, and safe across Streamlit threads
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    with sqlite3.connect(self.path) as con:
+                        con.execute("PRAGMA journal_mode=WAL")
+                        con.executescript(_SCHEMA)
+                    self._ready = True
+        con = sqlite3.connect(self.path, timeout=30)
+        try:
+            yield con
+        finally:
+            con.close()
+
+    def add(self, records: list):
+        """Index a batch of index_record() rows in one transaction."""
+        if not records:
+            return
+        with self._connect() as con, con:
+            # Take the write lock first: row ids are assigned here, not by SQLite
+            con.execute("BEGIN IMMEDIATE")
+            cur = con.execute("SELECT COALESCE(MAX(id), 0) FROM generations")
+            first = cur.fetchone()[0] + 1
+            ids = range(first, first + len(records))
+            con.executemany(
+                "INSERT INTO generations (id, generated, invoice_date, invoice, exporter, "
+                "consignee, documents, items, source) VALUES (?,?,?,?,?,?,?,?,?)",
+                [(i, *(r[c] for c in self.COLUMNS)) for i, r in zip(ids, records)],
+            )
+            con.executemany(
+                "INSERT INTO generations_fts (rowid, invoice, exporter, consignee, documents, hs, items) "
+                "VALUES (?,?,?,?,?,?,?)",
+                [(i, r["invoice"], r["exporter"], r["consignee"], r["_labels"], r["_hs"], r["_desc"])
+                 for i, r in zip(ids, records)],
+            )
+
+    def search(self, query: str = "", date_from: str = None, date_to: str = None,
+               limit: int = 200) -> list:
+        """Matching generations, newest first.
+
+        date_from / date_to bound the invoice date (ISO strings, inclusive).
+        """
+        where, args = [], []
+        expr = match_expr(query)
+        if date_from:
+            where.append("g.invoice_date >= ?")
+            args.append(str(date_from))
+        if date_to:
+            where.append("g.invoice_date <= ?")
+            args.append(str(date_to))
+        cols = ", ".join(f"g.{c}" for c in self.COLUMNS)
+        if expr:
+            sql = (f"SELECT {cols} FROM generations_fts f JOIN generations g ON g.id = f.rowid "
+                   f"WHERE generations_fts MATCH ? {''.join(' AND ' + w for w in where)} "
+                   "ORDER BY f.rowid DESC LIMIT ?")
+            args = [expr, *args, limit]
+        elif where:
+            sql = f"SELECT {cols} FROM generations g WHERE {' AND '.join(where)} ORDER BY g.id DESC LIMIT ?"
+            args.append(limit)
+        else:
+            sql = f"SELECT {cols} FROM generations g ORDER BY g.id DESC LIMIT ?"
+            args = [limit]
+        with self._connect() as con:
+            rows = con.execute(sql, args).fetchall()
+        return [dict(zip(self.COLUMNS, row)) for row in rows]
+
+    def count(self) -> int:
+        with self._connect() as con:
+            return con.execute("SELECT COUNT(*) FROM generations").fetchone()[0]
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    p.add_argument("query", nargs="?", default="", help=f"words, or field:word with field in {FIELDS}")
+    p.add_argument("--from", dest="date_from", help="earliest invoice date (YYYY-MM-DD)")
+    p.add_argument("--to", dest="date_to", help="latest invoice date (YYYY-MM-DD)")
+    p.add_argument("--limit", type=int, default=50)
+    args = p.parse_args()
+    for row in SearchIndex(config.SEARCH_DB).search(args.query, args.date_from, args.date_to, args.limit):
+        print(f"{row['invoice_date']}  {row['invoice']:<16} {row['consignee']:<30} "
+              f"{row['documents']}  [{row['source']}]")
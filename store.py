@@ -0,0 +1,160 @@
+"""Content-addressed output store
+Rendered output is kept on local disk in two layers:
+  blobs/  one file per distinct content, named by its SHA-256 — identical
+          fragments from different documents or shipments are stored once
+  refs/   one file per render input (see key_for), listing the blobs that
+          make up its output in order
+Least-recently-used blobs are evicted once the store grows past max_bytes.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+
+def _encode(obj):
+    # Column tables hash their own contents instead of expanding into rows
+    if hasattr(obj, "digest"):
+        return obj.digest()
+    return str(obj)
+
+
+def key_for(*parts) -> str:
+    """Stable hash of JSON-able render inputs."""
+    raw = json.dumps(parts, sort_keys=True, default=_encode, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _write_atomic(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _touch(path: Path) -> bool:
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+class ContentStore:
+    # Evict down to this fraction of max_bytes so a full store does not
+    # rescan itself on every write.
+    LOW_WATER = 0.9
+
+    def __init__(self, root, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._blobs = self.root / "blobs"
+        self._refs = self.root / "refs"
+        self._lock = threading.Lock()
+        self._size = None   # bytes in blobs/, measured on first write
+
+    def _blob_path(self, digest: str) -> Path:
+        return self._blobs / digest[:2] / digest
+
+    def _ref_path(self, key: str) -> Path:
+        return self._refs / key[:2] / key
+
+    # — Blobs ————————————————————————————————————————————————
+    def put(self, data: bytes) -> str:
+        """Store data once and return its digest."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if _touch(path):
+            return digest
+        _write_atomic(path, data)
+        self._grow(len(data))
+        return digest
+
+    def get(self, digest: str):
+        path = self._blob_path(digest)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        _touch(path)
+        return data
+
+    # — Refs —————————————————————————————————————————————————
+    def link(self, key: str, digests: list):
+        _write_atomic(self._ref_path(key), "\n".join(digests).encode())
+
+    def lookup(self, key: str):
+        """Stored output for key, or None if it was never stored or got evicted."""
+        ref = self._ref_path(key)
+        try:
+            digests = ref.read_text().split()
+        except FileNotFoundError:
+            return None
+        chunks = []
+        for digest in digests:
+            data = self.get(digest)
+            if data is None:
+                ref.unlink(missing_ok=True)
+                return None
+            chunks.append(data)
+        _touch(ref)
+        return b"".join(chunks)
+
+    def fetch(self, key: str, render) -> tuple:
+        """(digest, bytes) stored for a single-blob key; render() runs only on a miss."""
+        ref = self._ref_path(key)
+        try:
+            digests = ref.read_text().split()
+        except FileNotFoundError:
+            digests = []
+        if len(digests) == 1:
+            data = self.get(digests[0])
+            if data is not None:
+                _touch(ref)
+                return digests[0], data
+        data = render()
+        digest = self.put(data)
+        self.link(key, [digest])
+        return digest, data
+
+    # — Eviction —————————————————————————————————————————————
+    def _grow(self, n: int):
+        with self._lock:
+            if self._size is None:
+                self._size = sum(p.stat().st_size for p in self._blobs.glob("*/*"))
+            else:
+                self._size += n
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        blobs = []
+        for p in self._blobs.glob("*/*"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            blobs.append((st.st_mtime, st.st_size, p))
+        blobs.sort()
+        size, cutoff = sum(b[1] for b in blobs), None
+        target = self.max_bytes * self.LOW_WATER
+        for mtime, nbytes, p in blobs:
+            if size <= target:
+                break
+            p.unlink(missing_ok=True)
+            size -= nbytes
+            cutoff = mtime
+        self._size = size
+        # Refs idle since the newest evicted blob are most likely stale; dropping
+        # a live one only costs a re-render on its next lookup.
+        if cutoff is not None:
+            for p in self._refs.glob("*/*"):
+                try:
+                    if p.stat().st_mtime <= cutoff:
+                        p.unlink(missing_ok=True)
+                except FileNotFoundError:
+                    pass
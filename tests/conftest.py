@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# The modules live at the repository root; keep anything they write out of the tree
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("EXPORTDOCGEN_HOME", tempfile.mkdtemp(prefix="exportdocgen-tests-"))
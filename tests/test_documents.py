@@ -0,0 +1,30 @@
+import re
+
+from documents import gen_commercial_invoice, gen_shipping_bill
+from model import ItemTable
+
+
+def _shipment() -> dict:
+    # 3 × 1.00 USD at 0.333: each line converts to 0.33 (0.99 together), while
+    # converting the 3.00 total in one go would give 1.00
+    items = [{"desc": f"Part {i}", "hs": "8471", "unit": "PCS", "qty": 1, "price": 1.0, "total": 1.0}
+             for i in range(3)]
+    return {
+        "exporter": {"name": "Ex Co"},
+        "consignee": {"name": "Buyer"},
+        "shipment": {"invoiceNumber": "INV-1", "invoiceDate": "2026-05-31", "currency": "USD",
+                     "reportingCurrency": "EUR", "reportingRate": 0.333, "rateVersion": "test"},
+        "items": ItemTable.from_records(items),
+    }
+
+
+def test_reporting_total_adds_up_with_its_column():
+    html = gen_commercial_invoice(_shipment())
+    lines = [float(v) for v in re.findall(r"<td>1\.0</td><td>(\d+\.\d\d)</td></tr>", html)]
+    assert lines == [0.33, 0.33, 0.33]
+    assert "<th>EUR 0.99</th>" in html
+    assert "EUR 0.99 at 1 USD = 0.3330 EUR" in html
+
+
+def test_shipping_bill_note_uses_the_same_total():
+    assert "EUR 0.99 at 1 USD = 0.3330 EUR" in gen_shipping_bill(_shipment())
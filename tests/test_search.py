@@ -0,0 +1,24 @@
+from search import SearchIndex, index_record
+
+
+def _shipment(invoice: str, invoice_date: str) -> dict:
+    return {
+        "exporter": {"name": "Ex Co"},
+        "consignee": {"name": "Buyer"},
+        "shipment": {"invoiceNumber": invoice, "invoiceDate": invoice_date},
+        "items": [{"desc": "Widget", "hs": "8471", "unit": "PCS", "qty": 1, "price": 2, "total": 2}],
+    }
+
+
+def test_non_iso_invoice_date_is_indexed_as_iso(tmp_path):
+    index = SearchIndex(tmp_path / "search.sqlite3")
+    index.add([index_record(_shipment("INV-1", "31/05/2026"), ["invoice"]),
+               index_record(_shipment("INV-2", "2026-07-02"), ["invoice"])])
+
+    found = index.search(date_from="2026-05-01", date_to="2026-06-30")
+    assert [r["invoice"] for r in found] == ["INV-1"]
+    assert found[0]["invoice_date"] == "2026-05-31"
+
+
+def test_unparseable_invoice_date_is_kept_as_given():
+    assert index_record(_shipment("INV-3", "end of May"), ["invoice"])["invoice_date"] == "end of May"
@@ -0,0 +1,297 @@
+"""Pre-generation validation
+Item rules run over whole columns at once; validate_batch() concatenates
+the item tables of many shipments and checks them in a single pass, so a
+batch of thousands of shipments is validated before anything is rendered.
+Memory-mapped item files are checked a chunk at a time instead.
+
+    python validation.py shipment1.json shipment2.json ...
+"""
+
+import json
+import sys
+from datetime import date, datetime
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from model import ItemTable
+
+ERROR, WARNING = "error", "warning"
+
+# A price further than this many scaled MADs from the shipment median is flagged
+OUTLIER_MADS = 6.0
+OUTLIER_MIN_ITEMS = 4
+# For file-backed item tables: rows the median / MAD are estimated from, and
+# rows listed per issue (the message still counts them all)
+OUTLIER_SAMPLE = 100_000
+MAX_ROWS = 1000
+
+# Incoterms under which the seller arranges insurance
+SELLER_INSURES = {"CIF", "CIP", "DDP", "DAP"}
+
+# Invoice dates as the app writes them (ISO) and as ERP exports commonly do; day first
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%d/%m/%Y", "%d.%m.%Y", "%d-%m-%Y",
+                "%d %b %Y", "%d %B %Y")
+
+# Fields the L/C document needs when payment is by letter of credit
+LC_REQUIRED = {
+    "poNumber":      "PO / Contract No.",
+    "portLoading":   "Port of Loading",
+    "portDischarge": "Port of Discharge",
+    "vesselName":    "Vessel / Flight Name",
+    "incoterms":     "Incoterms",
+}
+
+
+class Issue(NamedTuple):
+    rule: str
+    severity: str
+    field: str
+    message: str
+    rows: tuple = ()      # 1-based item rows, as numbered in the documents
+
+
+class ValidationReport:
+    __slots__ = ("issues",)
+
+    def __init__(self, issues=None):
+        self.issues = issues or []
+
+    @property
+    def errors(self) -> list:
+        return [i for i in self.issues if i.severity == ERROR]
+
+    @property
+    def warnings(self) -> list:
+        return [i for i in self.issues if i.severity == WARNING]
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def to_dict(self) -> dict:
+        return {"ok": self.ok, "issues": [i._asdict() for i in self.issues]}
+
+
+def _rows_text(rows, count: int = None) -> str:
+    count = len(rows) if count is None else count
+    shown = ", ".join(str(r) for r in rows[:10])
+    more = f" and {count - 10} more" if count > 10 else ""
+    return ("row " if count == 1 else "rows ") + shown + more
+
+
+def _to_float(value):
+    try:
+        return float(str(value).replace(",", "")) if str(value).strip() else None
+    except ValueError:
+        return np.nan
+
+
+def parse_date(value):
+    """The date `value` states, or None when it is blank or in none of DATE_FORMATS."""
+    if isinstance(value, date):
+        return value
+    text = str(value or "").strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            pass
+    return None
+
+
+# ── Item rules (vectorized over all shipments) ───────────────────────────────
+def _known(packing: dict) -> dict:
+    """Packing data present, per row: unit weights, units per package, all three dimensions."""
+    return {"net_wt":  packing["net_wt"] > 0,
+            "gross_wt": packing["gross_wt"] > 0,
+            "per_pkg": packing["per_pkg"] > 0,
+            "dims":    (packing["pkg_l"] > 0) & (packing["pkg_w"] > 0) & (packing["pkg_h"] > 0)}
+
+
+def _rules(qty, price, hs, packing, outlier, some) -> list:
+    """(rule, severity, field, row mask, message) of every item rule. some[k]
+    says, per row or for all rows, whether the row's shipment has any row
+    with the packing data k of _known(); rows lacking it are then flagged."""
+    known = _known(packing)
+    partial = {k: ~known[k] & some[k] for k in known}
+    return [
+        ("qty_positive", ERROR, "Quantity", qty <= 0,
+         "Quantity must be greater than zero"),
+        ("hs_missing", WARNING, "HS Code", np.char.str_len(np.char.strip(hs)) == 0,
+         "HS Code is missing"),
+        ("price_outlier", WARNING, "Unit Price", outlier,
+         "Unit Price is far from the other items' prices — please double-check"),
+        ("net_gt_gross_unit", ERROR, "Net Wt",
+         known["gross_wt"] & (packing["net_wt"] > packing["gross_wt"]),
+         "Net weight per unit exceeds gross weight per unit"),
+        ("net_wt_partial", WARNING, "Net Wt", partial["net_wt"],
+         "Net weight per unit is missing, so the total net weight leaves these rows out"),
+        ("gross_wt_partial", WARNING, "Gross Wt", partial["gross_wt"],
+         "Gross weight per unit is missing, so the total gross weight leaves these rows out"),
+        ("packages_partial", WARNING, "Units/Pkg", partial["per_pkg"],
+         "Units per package is missing, so the package count leaves these rows out"),
+        ("dims_partial", WARNING, "Length", partial["dims"],
+         "Package dimensions are incomplete, so the volume leaves these rows out"),
+    ]
+
+
+def _item_issues(tables: list) -> list:
+    """Per-shipment lists of item-level issues."""
+    out = [[] for _ in tables]
+    # File-backed tables are checked on their own, a chunk at a time
+    for i, t in enumerate(tables):
+        if not isinstance(t, ItemTable):
+            out[i] = _file_issues(t)
+    tables = [t if isinstance(t, ItemTable) else ItemTable() for t in tables]
+    lengths = np.array([len(t) for t in tables], dtype=np.int64)
+    if not lengths.sum():
+        return out
+    owner  = np.repeat(np.arange(len(tables)), lengths)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    qty    = np.concatenate([t.qty for t in tables])
+    price  = np.concatenate([t.price for t in tables])
+    hs     = np.concatenate([t.hs for t in tables]).astype(str)
+    packing = {c: np.concatenate([getattr(t, c) for t in tables]) for c in ItemTable.PACKING}
+    # Shipments with any row that has the data
+    some = {k: (np.bincount(owner, weights=known, minlength=len(tables)) > 0)[owner]
+            for k, known in _known(packing).items()}
+
+    by_owner = pd.Series(price).groupby(owner)
+    median = by_owner.transform("median").to_numpy()
+    mad    = pd.Series(np.abs(price - median)).groupby(owner).transform("median").to_numpy()
+    counts = lengths[owner]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        score = np.abs(price - median) / (1.4826 * mad)
+    outlier = (counts >= OUTLIER_MIN_ITEMS) & (mad > 0) & (score > OUTLIER_MADS)
+
+    for rule, severity, field, mask, text in _rules(qty, price, hs, packing, outlier, some):
+        hit = np.flatnonzero(mask)
+        if not hit.size:
+            continue
+        # hit is sorted, so each shipment's rows form one contiguous run
+        who = owner[hit]
+        ships, first = np.unique(who, return_index=True)
+        for s, run in zip(ships.tolist(), np.split(hit, first[1:])):
+            rows = tuple((run - starts[s] + 1).tolist())
+            out[s].append(Issue(rule, severity, field,
+                                f"{text} ({_rows_text(rows)})", rows))
+    return out
+
+
+def _file_issues(items) -> list:
+    """Item issues of a file-backed table (itemfile.py), in two passes over
+    its chunks: the first finds which packing data the file has, the second
+    applies the rules. The price median and MAD come from an evenly spaced
+    sample of rows, and each issue lists at most MAX_ROWS of its rows."""
+    n = len(items)
+    if not n:
+        return []
+    some = dict.fromkeys(("net_wt", "gross_wt", "per_pkg", "dims"), False)
+    for chunk in items.chunks():
+        for k, known in _known({c: getattr(chunk, c) for c in ItemTable.PACKING}).items():
+            some[k] = some[k] or bool(known.any())
+    sample = np.asarray(items.price[np.linspace(0, n - 1, min(n, OUTLIER_SAMPLE)).astype(np.int64)])
+    median = np.median(sample)
+    mad = np.median(np.abs(sample - median))
+
+    found, start = {}, 0
+    for chunk in items.chunks():
+        with np.errstate(divide="ignore", invalid="ignore"):
+            score = np.abs(chunk.price - median) / (1.4826 * mad)
+        outlier = (n >= OUTLIER_MIN_ITEMS) & (mad > 0) & (score > OUTLIER_MADS)
+        packing = {c: getattr(chunk, c) for c in ItemTable.PACKING}
+        rules = _rules(chunk.qty, chunk.price, chunk.hs.astype(str), packing, outlier, some)
+        for rule, severity, field, mask, text in rules:
+            hit = np.flatnonzero(mask)
+            if hit.size:
+                entry = found.setdefault(rule, [severity, field, text, 0, []])
+                entry[3] += hit.size
+                entry[4] += (hit[:MAX_ROWS - len(entry[4])] + start + 1).tolist()
+        start += len(chunk)
+    order = [r[0] for r in rules]
+    return [Issue(rule, severity, field, f"{text} ({_rows_text(rows, count)})", tuple(rows))
+            for rule, (severity, field, text, count, rows)
+            in sorted(found.items(), key=lambda kv: order.index(kv[0]))]
+
+
+# ── Shipment rules ────────────────────────────────────────────────────────────
+def _shipment_issues(d: dict, docs) -> list:
+    exp, con, ship = d["exporter"], d["consignee"], d["shipment"]
+    issues = []
+    for field, label, value in [("exporter.name", "Exporter Name", exp.get("name")),
+                                ("consignee.name", "Consignee Name", con.get("name")),
+                                ("shipment.invoiceNumber", "Invoice Number",
+                                 ship.get("invoiceNumber"))]:
+        if not value:
+            issues.append(Issue("required", ERROR, field, f"{label} is required"))
+    if not len(d["items"]):
+        issues.append(Issue("items_required", ERROR, "items", "Add at least one item"))
+
+    invoiced = ship.get("invoiceDate")
+    if str(invoiced or "").strip() and parse_date(invoiced) is None:
+        issues.append(Issue("date_format", WARNING, "shipment.invoiceDate",
+                            f"Invoice Date {invoiced!r} is not a date this tool reads "
+                            "(e.g. 2026-01-31 or 31/01/2026)"))
+
+    gross, net = _to_float(ship.get("grossWeight")), _to_float(ship.get("netWeight"))
+    for field, label, value in [("shipment.grossWeight", "Gross Weight", gross),
+                                ("shipment.netWeight", "Net Weight", net)]:
+        if value is not None and np.isnan(value):
+            issues.append(Issue("weight_number", ERROR, field, f"{label} must be a number"))
+    if gross and net and not np.isnan(gross) and not np.isnan(net) and net > gross:
+        issues.append(Issue("net_gt_gross", ERROR, "shipment.netWeight",
+                            f"Net Weight ({net:g} kg) exceeds Gross Weight ({gross:g} kg)"))
+
+    term = ship.get("incoterms", "")
+    if docs is not None and term:
+        insured = "insurance_certificate" in docs
+        if term in SELLER_INSURES and not insured:
+            issues.append(Issue("incoterm_insurance", WARNING, "shipment.incoterms",
+                                f"{term} makes the seller responsible for insurance, "
+                                "but no Insurance Certificate is selected"))
+        elif term not in SELLER_INSURES and insured:
+            issues.append(Issue("incoterm_insurance", WARNING, "shipment.incoterms",
+                                f"Under {term} the buyer insures the goods; "
+                                "check that an Insurance Certificate is needed"))
+
+    if ship.get("reportingCurrency") and not ship.get("reportingRate"):
+        issues.append(Issue("reporting_rate", ERROR, "shipment.reportingCurrency",
+                            f"No exchange rate from {ship.get('currency')} to "
+                            f"{ship['reportingCurrency']} in the rate table"))
+
+    if ship.get("paymentTerms") == "L/C":
+        missing = [label for key, label in LC_REQUIRED.items() if not ship.get(key)]
+        if missing:
+            issues.append(Issue("lc_required", ERROR, "shipment.paymentTerms",
+                                "Payment by L/C requires: " + ", ".join(missing)))
+    return issues
+
+
+# ── Entry points ──────────────────────────────────────────────────────────────
+def validate_batch(shipments: list, docs=None) -> list:
+    """One ValidationReport per shipment dict; docs is the list of selected document keys."""
+    tables = [ItemTable.from_records(d["items"]) for d in shipments]
+    item_issues = _item_issues(tables)
+    return [ValidationReport(_shipment_issues(d, docs) + found)
+            for d, found in zip(shipments, item_issues)]
+
+
+def validate(d: dict, docs=None) -> ValidationReport:
+    return validate_batch([d], docs)[0]
+
+
+if __name__ == "__main__":
+    paths = sys.argv[1:]
+    shipments = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            shipments.append(json.load(f))
+    failed = 0
+    for path, report in zip(paths, validate_batch(shipments)):
+        failed += not report.ok
+        for issue in report.issues:
+            print(f"{path}: {issue.severity}: {issue.message}")
+    print(f"{len(paths)} shipment(s) checked, {failed} with errors")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,414 @@
+"""Watch-folder ingestion daemon
+Turns shipment files dropped into an inbox directory into documents, with
+no one at the form:
+
+    python watcher.py /srv/erp/outbox --out /srv/erp/docs --workers 4
+
+Each *.json file holds one shipment in the app's dict schema (exporter,
+consignee, shipment, items), optionally with a "documents" list of document
+keys and an "aggregate" list of documents that group items by HS code. A
+file may instead name a saved template ("template": name, see revisions.py)
+and give only what differs from it, typically the invoice number and date;
+its items replace the template's only when present. Bulk line data can be
+kept out of the JSON: "itemFile" names a CSV file or converted item directory
+(itemfile.py), relative to the shipment file, whose rows are read in chunks
+through a memory map and replace any "items". A
+file is taken once its size and mtime have been stable for --settle seconds,
+rendered by a bounded pool of worker processes and then moved to
+inbox/processed (or inbox/failed), so the inbox only ever holds new work.
+A file in flight when a worker process dies is retried on its own, and fails
+once that has happened MAX_CRASHES times.
+
+For every file the output directory gets <name>.html (when the shipment is
+valid) and <name>.status.json; manifest.jsonl there has one line per file.
+The figures in the output are reconciled against the shipment (reconcile.py);
+a file whose documents disagree is reported as "mismatch" and goes to failed/.
+Generated shipments are added to the search index (search.py) and the
+analytics rollups (analytics.py) in batches. Whenever the inbox drains, a
+summary line goes to stderr: files by outcome, and the hits and misses of
+the workers' fragment caches (documents.fragment_cache_info()).
+
+On Linux the inbox is watched with inotify, so new files are noticed without
+listing the directory. Elsewhere the directory is listed only when its mtime
+changes.
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import json
+import os
+import signal
+import struct
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+from pathlib import Path
+
+import config
+from analytics import Analytics, shipment_facts
+from documents import (DOC_REGISTRY, HS_AGGREGATE_DEFAULT, build_full_html, fragment_cache_info,
+                       render_documents)
+from itemfile import open_items
+from model import Shipment
+from packing import apply_packing
+from rates import apply_reporting
+from reconcile import reconcile
+from revisions import RevisionStore
+from search import SearchIndex, index_record
+from store import ContentStore, _write_atomic
+from validation import validate
+
+DEFAULT_DOCS = [key for key, _, _, default in DOC_REGISTRY if default]
+KNOWN_DOCS = {key for key, _, _, _ in DOC_REGISTRY}
+
+TICK = 0.25       # seconds between checks of the pending files
+MANIFEST = "manifest.jsonl"
+INDEX_BATCH = 500   # search-index / analytics rows written per transaction
+INDEX_EVERY = 5.0   # ... or at least this often (seconds) while busy
+MAX_CRASHES = 3     # times a file may be in flight when a worker dies before it fails
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _publish(path: Path, data: bytes):
+    # Outputs are read by other systems; temp files are created private
+    _write_atomic(path, data)
+    os.chmod(path, 0o644)
+
+
+# ── Worker side ───────────────────────────────────────────────────────────────
+_store = None
+
+
+def _get_store() -> ContentStore:
+    # One store per worker process; the directory is shared with the app
+    global _store
+    if _store is None:
+        _store = ContentStore(config.STORE_DIR, config.STORE_MAX_BYTES)
+    return _store
+
+
+_revisions = None
+
+
+def _get_revisions() -> RevisionStore:
+    # Per worker as well, so each template's item table is loaded once per process
+    global _revisions
+    if _revisions is None:
+        _revisions = RevisionStore(config.REVISIONS_DB)
+    return _revisions
+
+
+def process(src: str, out_dir: str) -> dict:
+    """Render one shipment file; returns its status record."""
+    t0 = time.perf_counter()
+    name = Path(src).name
+    status = {"file": name, "started": _now()}
+    with open(src, encoding="utf-8") as f:
+        raw = json.load(f)
+    if raw.get("template"):
+        status["template"] = raw["template"]
+        raw = dict(raw, **_get_revisions().clone(raw["template"], raw))
+    if raw.get("itemFile"):
+        # Relative to the shipment file; an absolute path is taken as it is
+        path = Path(src).parent / raw["itemFile"]
+        status["itemFile"] = str(path)
+        raw = dict(raw, items=open_items(path))
+    data = Shipment.from_dict(raw).to_dict()
+    apply_reporting(data["shipment"])
+    apply_packing(data["shipment"], data["items"])
+
+    keys = list(raw.get("documents") or DEFAULT_DOCS)
+    unknown = sorted(set(keys) - KNOWN_DOCS)
+    if unknown:
+        raise ValueError(f"unknown document key(s) {unknown}")
+    aggregate = raw.get("aggregate", HS_AGGREGATE_DEFAULT)
+    status["documents"] = keys
+
+    report = validate(data, keys)
+    status["issues"] = [i._asdict() for i in report.issues]
+    if report.ok:
+        docs_html = render_documents(data, keys, aggregate, _get_store())
+        recon = reconcile(data, keys, docs_html)
+        status["reconciliation"] = recon.to_dict()
+        output = Path(out_dir) / (Path(name).stem + ".html")
+        _publish(output, build_full_html(docs_html).encode())
+        status["output"] = output.name
+        if recon.ok:
+            status["status"] = "ok"
+            status["index"] = index_record(data, keys, source=name)
+            status["rollup"] = shipment_facts(data)
+        else:
+            # Written for inspection, but not filed: the file goes to failed/
+            status["status"] = "mismatch"
+    else:
+        status["status"] = "invalid"
+    status["seconds"] = round(time.perf_counter() - t0, 3)
+    # This worker's running totals; the watcher keeps the latest per process
+    status["fragments"] = dict(fragment_cache_info(), pid=os.getpid())
+    return status
+
+
+# ── Change detection ─────────────────────────────────────────────────────────
+IN_MODIFY, IN_CLOSE_WRITE, IN_MOVED_TO, IN_Q_OVERFLOW = 0x2, 0x8, 0x80, 0x4000
+_EVENT = struct.Struct("iIII")
+
+
+class _Inotify:
+    """Names of entries written or moved into one directory (Linux only)."""
+
+    def __init__(self, path: Path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(path),
+                                  IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"cannot watch {path}")
+
+    def changed(self):
+        """(names, overflowed) since the last call."""
+        names, overflow = set(), False
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return names, overflow
+            pos = 0
+            while pos < len(buf):
+                _, mask, _, length = _EVENT.unpack_from(buf, pos)
+                pos += _EVENT.size
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                elif length:
+                    names.add(buf[pos:pos + length].rstrip(b"\0").decode(errors="surrogateescape"))
+                pos += length
+
+
+class Watcher:
+    def __init__(self, inbox, out=None, workers: int = None, settle: float = None):
+        self.inbox = Path(inbox)
+        self.out = Path(out) if out else self.inbox / "out"
+        self.done = self.inbox / "processed"
+        self.failed = self.inbox / "failed"
+        for d in (self.out, self.done, self.failed):
+            d.mkdir(parents=True, exist_ok=True)
+        self.workers = workers or config.WATCH_WORKERS
+        self.settle = config.WATCH_SETTLE if settle is None else settle
+        self.pending = {}      # name → ((size, mtime_ns), stable since)
+        self.running = {}      # future → name
+        self.crashes = {}      # name → worker deaths while it was in flight
+        self.pool = ProcessPoolExecutor(self.workers)
+        self.stopping = False
+        try:
+            self.notify = _Inotify(self.inbox)
+        except (OSError, AttributeError):
+            self.notify = None
+        self._dir_mtime = None
+        self.index = SearchIndex(config.SEARCH_DB)
+        self.analytics = Analytics(config.ANALYTICS_DB)
+        self.to_index, self.to_rollup = [], []
+        self._indexed_at = time.monotonic()
+        self.batch = {}        # status → files finished since the last summary
+        self.fragments = {}    # worker pid → its fragment cache counters
+
+    @staticmethod
+    def wanted(name: str) -> bool:
+        # Editors and copy tools write to dotfiles / temporary names first
+        return name.endswith(".json") and not name.startswith(".")
+
+    def _scan(self):
+        with os.scandir(self.inbox) as it:
+            return {e.name for e in it if e.is_file()}
+
+    def discover(self, initial: bool = False):
+        if self.notify is None or initial:
+            mtime = self.inbox.stat().st_mtime_ns
+            names = self._scan() if initial or mtime != self._dir_mtime else ()
+            self._dir_mtime = mtime
+        else:
+            names, overflow = self.notify.changed()
+            if overflow:
+                names = self._scan()
+        now = time.monotonic()
+        busy = set(self.running.values())
+        for name in names:
+            # Files already pending keep their state: _ready() restarts the settle
+            # period when one is written again, and other entries coming and going
+            # (e.g. moves to processed/) must not hold it back
+            if self.wanted(name) and name not in busy and name not in self.pending:
+                self.pending[name] = (None, now)
+
+    # — Scheduling ———————————————————————————————————————————
+    def _ready(self) -> list:
+        """Pending names whose size and mtime have held still for the settle period."""
+        now, ready = time.monotonic(), []
+        for name, (sig, since) in list(self.pending.items()):
+            try:
+                st = (self.inbox / name).stat()
+            except FileNotFoundError:
+                del self.pending[name]
+                continue
+            cur = (st.st_size, st.st_mtime_ns)
+            if cur != sig:
+                self.pending[name] = (cur, now)
+            elif now - since >= self.settle:
+                ready.append((since, name))
+        return [name for _, name in sorted(ready)]
+
+    def schedule(self):
+        # At most two files per worker are handed to the pool; the rest wait here
+        ready = self._ready()
+        suspects = [name for name in ready if self.crashes.get(name)]
+        if suspects:
+            # A file that was in flight when a worker died runs on its own, once the
+            # pool is idle, so a file that kills workers is told apart from the rest
+            if not self.running:
+                self._submit(suspects[0])
+            return
+        if any(self.crashes.get(name) for name in self.running.values()):
+            return
+        room = 2 * self.workers - len(self.running)
+        busy = set(self.running.values())
+        for name in ready[:max(room, 0)]:
+            if name not in busy:
+                self._submit(name)
+
+    def _submit(self, name: str):
+        del self.pending[name]
+        future = self.pool.submit(process, str(self.inbox / name), str(self.out))
+        self.running[future] = name
+
+    def collect(self):
+        broken = False
+        done = [f for f in self.running if f.done()]
+        while done:
+            for future in done:
+                name = self.running.pop(future)
+                try:
+                    status = future.result()
+                except BrokenProcessPool:
+                    # A worker died, failing every file in flight; they are retried one
+                    # at a time, and a file fails for good after MAX_CRASHES deaths
+                    broken = True
+                    self.crashes[name] = self.crashes.get(name, 0) + 1
+                    if self.crashes[name] < MAX_CRASHES:
+                        self.pending[name] = (None, time.monotonic())
+                        continue
+                    status = {"file": name, "status": "failed",
+                              "error": f"worker process died {MAX_CRASHES} times while "
+                                       "processing this file"}
+                except Exception as exc:
+                    status = {"file": name, "status": "failed",
+                              "error": f"{type(exc).__name__}: {exc}"}
+                self.crashes.pop(name, None)
+                self.finish(name, status)
+            # Everything still in flight belongs to the broken pool and is about to
+            # fail as well; take it all before the pool is replaced
+            done = list(wait(self.running)[0]) if broken and self.running else []
+        if broken:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = ProcessPoolExecutor(self.workers)
+
+    def finish(self, name: str, status: dict):
+        record, facts = status.pop("index", None), status.pop("rollup", None)
+        fragments = status.pop("fragments", None)
+        if fragments:
+            self.fragments[fragments.pop("pid")] = fragments
+        self.batch[status["status"]] = self.batch.get(status["status"], 0) + 1
+        if record:
+            self.to_index.append(record)
+        if facts:
+            self.to_rollup.append(facts)
+        status["finished"] = _now()
+        stem = Path(name).stem
+        _publish(self.out / f"{stem}.status.json",
+                 json.dumps(status, indent=2, default=str).encode())
+        with open(self.out / MANIFEST, "a", encoding="utf-8") as f:
+            f.write(json.dumps(status, default=str) + "\n")
+        target = self.done if status["status"] == "ok" else self.failed
+        try:
+            os.replace(self.inbox / name, target / name)
+        except FileNotFoundError:
+            pass
+
+    def flush_index(self, force: bool = False):
+        # Rows go to the search index and the rollups in batches; one transaction each
+        due = time.monotonic() - self._indexed_at >= INDEX_EVERY
+        if self.to_index and (force or due or len(self.to_index) >= INDEX_BATCH):
+            self.index.add(self.to_index)
+            self.analytics.record(self.to_rollup)
+            self.to_index, self.to_rollup = [], []
+            self._indexed_at = time.monotonic()
+
+    def summary(self) -> str:
+        """Files finished since the last summary, by status, and the fragment cache
+        counters summed over every worker process so far."""
+        files = ", ".join(f"{n} {status}" for status, n in sorted(self.batch.items()))
+        hits = sum(f["hits"] for f in self.fragments.values())
+        misses = sum(f["misses"] for f in self.fragments.values())
+        rate = f"{hits / (hits + misses):.0%}" if hits + misses else "n/a"
+        return (f"{sum(self.batch.values())} file(s): {files or 'none'}; fragment cache "
+                f"{hits} hit(s), {misses} miss(es), hit rate {rate}")
+
+    def report(self):
+        print(self.summary(), file=sys.stderr, flush=True)
+        self.batch = {}
+
+    # — Main loop ————————————————————————————————————————————
+    def run(self, once: bool = False):
+        """Process files until stopped; with once=True, until the inbox is drained."""
+        self.discover(initial=True)
+        try:
+            while not self.stopping:
+                self.discover()
+                self.schedule()
+                # Wake as soon as a worker finishes, so the pool never idles a whole tick
+                wait(self.running, timeout=TICK, return_when=FIRST_COMPLETED)
+                self.collect()
+                self.flush_index(force=not self.running)
+                if self.batch and not self.running and not self.pending:
+                    self.report()
+                if once and not self.pending and not self.running:
+                    break
+                if not self.running:
+                    time.sleep(TICK)
+            wait(self.running)
+            self.collect()
+            if self.batch:
+                self.report()
+        finally:
+            self.flush_index(force=True)
+            self.pool.shutdown(wait=True)
+
+    def stop(self, *_):
+        self.stopping = True
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    p.add_argument("inbox", help="directory the shipment files are dropped into")
+    p.add_argument("--out", help="output directory (default: INBOX/out)")
+    p.add_argument("--workers", type=int, help=f"worker processes (default: {config.WATCH_WORKERS})")
+    p.add_argument("--settle", type=float,
+                   help=f"seconds a file must be unchanged before it is taken (default: {config.WATCH_SETTLE:g})")
+    p.add_argument("--once", action="store_true", help="process what is there and exit")
+    args = p.parse_args(argv)
+
+    watcher = Watcher(args.inbox, args.out, args.workers, args.settle)
+    signal.signal(signal.SIGTERM, watcher.stop)
+    signal.signal(signal.SIGINT, watcher.stop)
+    mode = "inotify" if watcher.notify else "polling"
+    print(f"watching {watcher.inbox} ({mode}, {watcher.workers} workers) → {watcher.out}",
+          file=sys.stderr, flush=True)
+    watcher.run(once=args.once)
+
+
+if __name__ == "__main__":
+    main()
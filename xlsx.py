@@ -0,0 +1,272 @@
+"""Streaming XLSX export
+Writes the commercial invoice and packing list as an Excel workbook, one
+sheet per document, with typed numeric cells and SUM formulas for totals.
+Sheets are streamed row by row into the zip archive with inline strings
+(no shared-string table), so memory use does not grow with the item count
+and nothing beyond the standard library is needed.
+"""
+
+import io
+import re
+import zipfile
+from typing import NamedTuple
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+import packing
+from model import ItemTable
+from rates import convert
+
+_NS  = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PKG = "http://schemas.openxmlformats.org/package/2006/relationships"
+_CT  = "application/vnd.openxmlformats-officedocument.spreadsheetml"
+
+# Cell formats, as indexes into cellXfs in _STYLES
+STYLES = {"bold": 1, "money": 2, "price": 3, "qty": 4, "total": 5}
+
+_STYLES = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="{_NS}">
+<numFmts count="1"><numFmt numFmtId="164" formatCode="#,##0.0000"/></numFmts>
+<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>
+<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>
+<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="6">
+<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>
+<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>
+<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="4" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1" applyNumberFormat="1"/>
+</cellXfs>
+<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>
+</styleSheet>"""
+
+# Characters XML 1.0 does not allow, even escaped
+_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+# Rows are buffered and written to the archive in chunks of this many
+_FLUSH_ROWS = 1000
+
+
+def _criterion(text: str) -> str:
+    """A SUMIF criterion, as a formula string literal, matching cells equal to text:
+    wildcards escaped, "=" in front so text such as ">5" is not a comparison."""
+    text = re.sub(r"([~*?])", r"~\1", _ILLEGAL.sub("", str(text)))
+    return '"=' + text.replace('"', '""') + '"'
+
+
+class Formula(NamedTuple):
+    expr: str              # without the leading "="
+    value: float = None    # cached result, shown by viewers that do not recalculate
+
+
+class Styled(NamedTuple):
+    value: object
+    style: str
+
+
+def _col(n: int) -> str:
+    """Column letters for a 0-based index: 0 → A, 26 → AA."""
+    name = ""
+    n += 1
+    while n:
+        n, r = divmod(n - 1, 26)
+        name = chr(65 + r) + name
+    return name
+
+
+def _cell(ref: str, value) -> str:
+    style = ""
+    if isinstance(value, Styled):
+        value, style = value.value, f' s="{STYLES[value.style]}"'
+    if value is None or value == "":
+        return f'<c r="{ref}"{style}/>' if style else ""
+    if isinstance(value, Formula):
+        cached = "" if value.value is None else f"<v>{float(value.value)!r}</v>"
+        return f'<c r="{ref}"{style}><f>{escape(value.expr)}</f>{cached}</c>'
+    if isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, bool):
+        if value != value:     # NaN
+            return ""
+        return f'<c r="{ref}"{style}><v>{float(value)!r}</v></c>'
+    text = escape(_ILLEGAL.sub("", str(value)))
+    return f'<c r="{ref}"{style} t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _write_sheet(zf: zipfile.ZipFile, name: str, rows, widths=()):
+    with zf.open(name, "w", force_zip64=True) as out:
+        cols = "".join(f'<col min="{i}" max="{i}" width="{w}" customWidth="1"/>'
+                       for i, w in enumerate(widths, 1))
+        out.write((f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                   f'<worksheet xmlns="{_NS}">' + (f"<cols>{cols}</cols>" if cols else "")
+                   + "<sheetData>").encode())
+        buf = []
+        for r, row in enumerate(rows, 1):
+            cells = "".join(_cell(f"{_col(c)}{r}", v) for c, v in enumerate(row))
+            buf.append(f'<row r="{r}">{cells}</row>')
+            if len(buf) >= _FLUSH_ROWS:
+                out.write("".join(buf).encode())
+                buf = []
+        out.write(("".join(buf) + "</sheetData></worksheet>").encode())
+
+
+def write_workbook(fileobj, sheets: list):
+    """Write (title, rows, column widths) sheets to fileobj as an .xlsx workbook.
+
+    rows is any iterable of lists; it is consumed once, as the sheet is written.
+    """
+    with zipfile.ZipFile(fileobj, "w", zipfile.ZIP_DEFLATED) as zf:
+        n = len(sheets)
+        zf.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            f'<Override PartName="/xl/workbook.xml" ContentType="{_CT}.sheet.main+xml"/>'
+            f'<Override PartName="/xl/styles.xml" ContentType="{_CT}.styles+xml"/>'
+            + "".join(f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+                      f'ContentType="{_CT}.worksheet+xml"/>' for i in range(1, n + 1))
+            + "</Types>"))
+        zf.writestr("_rels/.rels", (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<Relationships xmlns="{_PKG}">'
+            f'<Relationship Id="rId1" Type="{_REL}/officeDocument" Target="xl/workbook.xml"/>'
+            "</Relationships>"))
+        zf.writestr("xl/_rels/workbook.xml.rels", (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<Relationships xmlns="{_PKG}">'
+            + "".join(f'<Relationship Id="rId{i}" Type="{_REL}/worksheet" '
+                      f'Target="worksheets/sheet{i}.xml"/>' for i in range(1, n + 1))
+            + f'<Relationship Id="rId{n + 1}" Type="{_REL}/styles" Target="styles.xml"/>'
+            "</Relationships>"))
+        zf.writestr("xl/workbook.xml", (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<workbook xmlns="{_NS}" xmlns:r="{_REL}"><sheets>'
+            + "".join(f'<sheet name="{escape(title[:31])}" sheetId="{i}" r:id="rId{i}"/>'
+                      for i, (title, _, _) in enumerate(sheets, 1))
+            + '</sheets><calcPr fullCalcOnLoad="1"/></workbook>'))
+        zf.writestr("xl/styles.xml", _STYLES)
+        for i, (_, rows, widths) in enumerate(sheets, 1):
+            _write_sheet(zf, f"xl/worksheets/sheet{i}.xml", rows, widths)
+
+
+# ── Document sheets ───────────────────────────────────────────────────────────
+def _party_rows(title: str, party: dict, fields) -> list:
+    rows = [[Styled(title, "bold")]]
+    rows += [[label, party[f]] for f, label in fields if party.get(f)]
+    return rows + [[]]
+
+
+_EXPORTER = [("name", "Name"), ("address", "Address"), ("city", "City"),
+             ("contact", "Tel"), ("email", "Email"), ("iec", "IEC"), ("gst", "GST")]
+_CONSIGNEE = _EXPORTER[:5]
+
+
+def _fields(ship: dict, fields) -> list:
+    return [[label, ship.get(key) or "N/A"] for key, label in fields] + [[]]
+
+
+def invoice_rows(d: dict):
+    """Rows of the Commercial Invoice sheet."""
+    ship, items = d["shipment"], ItemTable.from_records(d["items"])
+    cur, rcur = ship["currency"], ship.get("reportingCurrency")
+    rep = (convert(items.total, ship["reportingRate"])
+           if rcur and ship.get("reportingRate") else None)
+
+    head = [[Styled("COMMERCIAL INVOICE", "bold")], []]
+    head += _party_rows("Exporter / Shipper", d["exporter"], _EXPORTER)
+    head += _party_rows("Consignee / Buyer", d["consignee"], _CONSIGNEE)
+    head += _fields(ship, [("invoiceNumber", "Invoice No"), ("invoiceDate", "Date"),
+                           ("poNumber", "PO / Contract No"), ("incoterms", "Incoterms"),
+                           ("portLoading", "Port of Loading"), ("portDischarge", "Port of Discharge"),
+                           ("countryOrigin", "Country of Origin"), ("paymentTerms", "Payment Terms"),
+                           ("currency", "Currency")])
+    header = ["#", "Description of Goods", "HS Code", "Quantity", "Unit", "Unit Price",
+              f"Amount ({cur})"] + ([f"Amount ({rcur})"] if rep is not None else [])
+    head.append([Styled(h, "bold") for h in header])
+    yield from head
+
+    first = len(head) + 1
+    i = 0
+    for chunk in items.chunks():
+        cols = (chunk.desc.tolist(), chunk.hs.tolist(), chunk.qty.tolist(), chunk.unit.tolist(),
+                chunk.price.tolist(), chunk.total.tolist(),
+                rep[i:i + len(chunk)].tolist() if rep is not None else [None] * len(chunk))
+        for i, (desc, hs, qty, unit, price, total, r) in enumerate(zip(*cols), i + 1):
+            row = [i, desc, hs, Styled(qty, "qty"), unit, Styled(price, "price"),
+                   Styled(total, "money")]
+            if rep is not None:
+                row.append(Styled(r, "money"))
+            yield row
+
+    last = first + len(items) - 1
+    total = [Styled("TOTAL", "bold"),
+             Styled(Formula(f"SUM(G{first}:G{last})", float(items.total.sum())), "total")]
+    if rep is not None:
+        total.append(Styled(Formula(f"SUM(H{first}:H{last})", float(rep.sum())), "total"))
+    yield [None] * 5 + total
+    if rep is not None:
+        yield []
+        yield ["Rate", f"1 {cur} = {ship['reportingRate']:.4f} {rcur} "
+                       f"(rate table {ship.get('rateVersion', '')})"]
+
+
+def packing_rows(d: dict):
+    """Rows of the Packing List sheet; quantities are totalled per unit, line
+    weights (when the items carry unit weights) overall."""
+    ship, items = d["shipment"], ItemTable.from_records(d["items"])
+    pkg = ship.get("packageType") or "N/A"
+    _, net, gross, _ = packing.sums(items)
+    weighed = bool(net or gross)
+
+    head = [[Styled("PACKING LIST", "bold")], []]
+    head += _party_rows("Exporter / Shipper", d["exporter"], _EXPORTER)
+    head += _party_rows("Consignee", d["consignee"], _CONSIGNEE)
+    head += _fields(ship, [("invoiceNumber", "Invoice No"), ("invoiceDate", "Date"),
+                           ("vesselName", "Vessel / Flight"), ("numPackages", "No. of Packages"),
+                           ("grossWeight", "Gross Weight (KG)"), ("netWeight", "Net Weight (KG)"),
+                           ("volume", "Volume (CBM)"),
+                           ("chargeableWeight", "Chargeable Weight (KG)")])
+    header = ["#", "Description", "Quantity", "Unit", "Packing Type", "HS Code"]
+    if weighed:
+        header += ["Net Weight (KG)", "Gross Weight (KG)"]
+    head.append([Styled(h, "bold") for h in header])
+    yield from head
+
+    first = len(head) + 1
+    i, per_unit = 0, {}
+    for chunk in items.chunks():
+        cols = (chunk.desc.tolist(), chunk.qty.tolist(), chunk.unit.tolist(), chunk.hs.tolist(),
+                chunk.net_wt.tolist(), chunk.gross_wt.tolist())
+        for i, (desc, qty, unit, hs, n, g) in enumerate(zip(*cols), i + 1):
+            row = [i, desc, Styled(qty, "qty"), unit, pkg, hs]
+            if weighed:
+                row += [Styled(qty * n, "qty"), Styled(qty * g, "qty")]
+            per_unit[str(unit)] = per_unit.get(str(unit), 0.0) + qty
+            yield row
+
+    last = first + len(items) - 1
+    if weighed:
+        yield [None] * 5 + [Styled("TOTAL", "bold"),
+                            Styled(Formula(f"SUM(G{first}:G{last})", float(net)), "total"),
+                            Styled(Formula(f"SUM(H{first}:H{last})", float(gross)), "total")]
+    yield []
+    for unit, qty in sorted(per_unit.items()):
+        yield [Styled(f"Total {unit}", "bold"), None,
+               Styled(Formula(f"SUMIF(D{first}:D{last},{_criterion(unit)},C{first}:C{last})", qty), "total"),
+               unit]
+
+
+def export_xlsx(d: dict, fileobj=None):
+    """Commercial invoice and packing list as a workbook.
+
+    Writes to fileobj when given; otherwise returns the workbook bytes.
+    """
+    sheets = [("Commercial Invoice", invoice_rows(d), (6, 48, 12, 12, 8, 14, 16, 16)),
+              ("Packing List", packing_rows(d), (14, 48, 12, 8, 16, 12, 16, 16))]
+    if fileobj is not None:
+        write_workbook(fileobj, sheets)
+        return None
+    buf = io.BytesIO()
+    write_workbook(buf, sheets)
+    return buf.getvalue()